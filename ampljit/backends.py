@@ -0,0 +1,206 @@
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+import asyncio
+import os
+
+from ampljit import linprog, model, native
+from ampljit.result_cache import ResultCache
+from amplwrapper.ampl_pool import AMPLPool
+
+
+class SolverBackend(ABC):
+    """
+    Solver of canonical JIT instances, i.e. instances whose expected finish times are minute offsets.
+    Every backend returns a dictionary with the same keys of ampljit.model.solve_canonical(), plus the name
+    of the backend under the 'solver' key.
+    """
+
+    @property
+    @abstractmethod
+    def name(self) -> str:
+        """
+        :return: name of the backend, as requested by the `solver` property of a JIT request
+        """
+        pass
+
+    @abstractmethod
+    async def solve(self, n_batches: int, wrong_time_fee: int, duration_lst: list, expected_finish_lst: list,
+                    warm_start_key: str = None, deadline: float = None, profile: bool = False,
+                    background: bool = False) -> dict:
+        """
+        :param warm_start_key: key of the schedule whose last optimal basis may be used to warm start the solve.
+                               Backends that can't be warm started ignore it
+        :param deadline: UNIX time by which the solver must stop and return the best schedule found so far,
+                         with the 'time_limit' status. Backends that are always fast enough ignore it
+        :param profile: whether the solver collects its own timing statistics, returned under the 'profile' key.
+                        Backends whose only stage is the solve ignore it
+        :param background: whether the solve is a background job, which waits for the solver as long as needed
+                           instead of being rejected when the solver is saturated.
+                           Backends without admission control ignore it
+        """
+        pass
+
+    async def warm_up(self):
+        """
+        Prepares the backend at startup, so that the first request doesn't pay for starting the solver.
+        """
+        pass
+
+    @property
+    def parallelism(self) -> int:
+        """
+        :return: number of solves that the backend runs at the same time, i.e. the number of independent blocks
+                 a large instance is worth splitting into
+        """
+        return 1
+
+    def close(self):
+        """
+        Releases the resources of the backend on server shutdown.
+        """
+        pass
+
+
+class AMPLBackend(SolverBackend):
+    """
+    Solves the LP model with AMPL and CPLEX, in the first idle session of a pool of AMPL worker processes.
+    """
+
+    def __init__(self, pool: AMPLPool, solver: Callable = model.solve_canonical, bases: ResultCache = None):
+        """
+        :param pool: pool of AMPL sessions running in worker processes
+        :param solver: function that solves the canonical JIT problem using AMPL. It must be a module level
+                       function, because it's sent to the worker processes
+        :param bases: cache of the optimal bases of the last solve of each client-supplied `warm_start_key`.
+                      If it's None, warm starts are disabled
+        """
+        self._pool = pool
+        self._solver = solver
+        self._bases = bases
+
+    @property
+    def name(self) -> str:
+        return 'ampl'
+
+    @property
+    def pool(self) -> AMPLPool:
+        return self._pool
+
+    @property
+    def parallelism(self) -> int:
+        return self._pool.size
+
+    async def solve(self, n_batches: int, wrong_time_fee: int, duration_lst: list, expected_finish_lst: list,
+                    warm_start_key: str = None, deadline: float = None, profile: bool = False,
+                    background: bool = False) -> dict:
+        solver = self._solver
+        solver_kwargs = {
+            'n_batches': n_batches,
+            'wrong_time_fee': wrong_time_fee,
+            'duration_lst': duration_lst,
+            'expected_finish_lst': expected_finish_lst,
+        }
+        if deadline is not None:
+            solver_kwargs['deadline'] = deadline
+        if profile:
+            solver_kwargs['profile'] = True
+
+        if warm_start_key is not None and self._bases is not None:
+            # warm starts need the statuses declared in the persistent model.
+            # The last basis of the same schedule can only be reused if the number of batches didn't change.
+            solver = model.solve_persistent
+            last_basis = self._bases.get(warm_start_key)
+            if last_basis is not None and last_basis[0] == n_batches:
+                solver_kwargs['warm_start_basis'] = last_basis[1]
+            solver_kwargs['return_basis'] = True
+
+        # solve the problem in the first idle AMPL session.
+        # The solve runs in a worker process, so the event loop is free to serve other requests meanwhile.
+        # Background jobs are already queued by the server, so they're never shed by the pool
+        run = self._pool.run_background if background else self._pool.run
+        result = await run(solver, **solver_kwargs)
+
+        basis = result.pop('basis', None)
+        if basis is not None:
+            self._bases.put(warm_start_key, (n_batches, basis))
+
+        result['solver'] = self.name
+        return result
+
+    async def warm_up(self):
+        # every session starts AMPL and CPLEX and, with the persistent model, loads jit_ordered.mod
+        await self._pool.warm_up(self._solver, **model.warm_up_instance)
+
+    def close(self):
+        self._pool.close()
+
+
+class NativeBackend(SolverBackend):
+    """
+    Solves the JIT problem with the exact O(n log n) algorithm in ampljit.native.
+    It takes about 100 ms for the largest instances, so the solves run in a thread, like the ones of HiGHSBackend,
+    and the event loop keeps serving the other requests meanwhile. The algorithm is pure Python, which holds
+    the GIL, so a single thread solves the instances one at a time.
+    """
+
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='native')
+
+    @property
+    def name(self) -> str:
+        return 'native'
+
+    async def solve(self, n_batches: int, wrong_time_fee: int, duration_lst: list, expected_finish_lst: list,
+                    warm_start_key: str = None, deadline: float = None, profile: bool = False,
+                    background: bool = False) -> dict:
+        loop = asyncio.get_event_loop()
+        result = await loop.run_in_executor(self._executor, native.solve_canonical, n_batches, wrong_time_fee,
+                                            duration_lst, expected_finish_lst)
+        result['solver'] = self.name
+        return result
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+class HiGHSBackend(SolverBackend):
+    """
+    Solves the LP model in-process with the HiGHS solver of scipy.optimize.linprog, without the AMPL translator,
+    the .nl file exchange and the CPLEX subprocess, and without the problem size limits of the AMPL license.
+    The solves run in a thread pool, so that the event loop isn't blocked.
+    """
+
+    def __init__(self, threads: int = 0):
+        """
+        :param threads: number of solves that run at the same time, 0 means one per CPU core
+        :raise RuntimeError: if SciPy isn't installed
+        """
+        if not linprog.is_available():
+            raise RuntimeError('The highs solver needs SciPy 1.6 or newer')
+        self._threads = threads or os.cpu_count() or 1
+        self._executor = ThreadPoolExecutor(max_workers=self._threads, thread_name_prefix='highs')
+
+    @property
+    def name(self) -> str:
+        return 'highs'
+
+    async def solve(self, n_batches: int, wrong_time_fee: int, duration_lst: list, expected_finish_lst: list,
+                    warm_start_key: str = None, deadline: float = None, profile: bool = False,
+                    background: bool = False) -> dict:
+        loop = asyncio.get_event_loop()
+        result = await loop.run_in_executor(self._executor, linprog.solve_canonical, n_batches, wrong_time_fee,
+                                            duration_lst, expected_finish_lst, deadline)
+        result['solver'] = self.name
+        return result
+
+    async def warm_up(self):
+        # the first solve imports scipy.optimize
+        await self.solve(**model.warm_up_instance)
+
+    @property
+    def parallelism(self) -> int:
+        return self._threads
+
+    def close(self):
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,122 @@
+from typing import List, Tuple
+import math
+import numpy as np
+
+from ampljit import native
+
+
+def independent_blocks(duration_lst: list, expected_finish_lst: list, max_blocks: int,
+                       min_block_size: int) -> List[Tuple[int, int]]:
+    """
+    Splits a JIT instance into blocks of consecutive batches that can be solved independently,
+    i.e. whose optimal schedules, once concatenated, are an optimal schedule of the whole instance.
+
+    Let P_i be the sum of the durations of the batches 1..i. As in ampljit.native, the problem is an
+    L1 isotonic regression of the targets t_i = expected_finish_i - P_i: every optimal
+    y_i = start_time_i + duration_i - P_i of a block lies between the minimum and the maximum target of the block,
+    otherwise moving it there would lower the fee. Hence, if every target before a cut is <= every target
+    after it, the ordering constraint across the cut holds for any pair of optimal block schedules, and the sum
+    of their fees is optimal, since it's the optimum of a relaxation of the whole problem.
+
+    Among the valid cuts, the ones that make blocks of about n / max_blocks batches are chosen.
+    :param duration_lst: list of durations of each batch
+    :param expected_finish_lst: list of expected finish minute offsets of each batch
+    :param max_blocks: maximum number of blocks, e.g. the number of solves that can run in parallel
+    :param min_block_size: minimum number of batches of a block
+    :return: list of the (start, end) indexes of each block, end excluded. It has a single block if the instance
+             can't be split usefully
+    """
+    n_batches = len(duration_lst)
+    if max_blocks <= 1 or n_batches < 2 * min_block_size:
+        return [(0, n_batches)]
+
+    targets = np.asarray(expected_finish_lst, dtype=np.int64) - np.cumsum(duration_lst, dtype=np.int64)
+    prefix_max = np.maximum.accumulate(targets)
+    suffix_min = np.minimum.accumulate(targets[::-1])[::-1]
+
+    # ends of the blocks that may be cut, i.e. the batch at index `end` may start a new block
+    cut_ends = np.flatnonzero(prefix_max[:-1] <= suffix_min[1:]) + 1
+
+    block_size = max(min_block_size, math.ceil(n_batches / max_blocks))
+    blocks = []
+    start = 0
+    while len(blocks) < max_blocks - 1:
+        # the first valid cut that makes a block of at least block_size batches
+        i = np.searchsorted(cut_ends, start + block_size)
+        if i == len(cut_ends) or n_batches - cut_ends[i] < min_block_size:
+            break
+        end = int(cut_ends[i])
+        blocks.append((start, end))
+        start = end
+    blocks.append((start, n_batches))
+    return blocks
+
+
+def reusable_prefix(target_lst: list, prefix_max_lst: list, start: int, changed_min: int) -> int:
+    """
+    Finds the longest prefix of an already solved instance whose optimal schedule stays optimal when the targets
+    from index `start` on change, e.g. because batches are appended or one of them is updated.
+    The targets are t_i = expected_finish_i - P_i, as in independent_blocks(). The schedule of the batches before
+    a cut is kept if the cut is valid both before and after the change: the old schedule of the prefix is then
+    optimal for the prefix alone, and the prefix is independent of the new suffix.
+    :param target_lst: targets of the solved instance
+    :param prefix_max_lst: running maximum of target_lst
+    :param start: index of the first target that changes, or the number of batches if batches are appended
+    :param changed_min: minimum of the targets from index `start` on, both before and after the change
+    :return: number of batches whose schedule is kept; the ones from this index on must be solved again
+    """
+    end = start
+    suffix_min = changed_min
+    while end > 0 and prefix_max_lst[end - 1] > suffix_min:
+        end -= 1
+        suffix_min = min(suffix_min, target_lst[end])
+    return end
+
+
+def merge_results(results: List[dict], wrong_time_fee: int, duration_lst: list, expected_finish_lst: list) -> dict:
+    """
+    Merges the results of the independent blocks of an instance, in the order of the blocks,
+    into the result of the whole instance.
+    The iterations and the durations of the stages are summed, so they measure the total work of the solvers.
+    The blocks are only independent if their schedules are optimal: a block whose solver hit its time limit has
+    been repaired by delaying its batches, which may then overlap the first batches of the next block. If any
+    block isn't optimal, the merged schedule is repaired again as a whole.
+    :param results: dictionaries returned by the solver of each block, as by ampljit.model.solve_canonical()
+    :param wrong_time_fee: fee of the whole instance
+    :param duration_lst: list of durations of each batch of the whole instance
+    :param expected_finish_lst: list of expected finish minute offsets of each batch of the whole instance
+    :return: dictionary with the same keys, plus the number of blocks under the 'blocks' key
+    """
+    merged = {
+        'total_fee': sum(result['total_fee'] for result in results),
+        'start_minutes': [start for result in results for start in result['start_minutes']],
+        'delta_time': [delta for result in results for delta in result['delta_time']],
+        'iterations': sum(result['iterations'] for result in results),
+        'status': 'optimal' if all(result.get('status', 'optimal') == 'optimal' for result in results)
+        else 'time_limit',
+        'computation_duration': sum(result['computation_duration'] for result in results),
+        'stages': _sum_dicts([result.get('stages', {}) for result in results]),
+        'blocks': len(results),
+    }
+    if merged['status'] != 'optimal':
+        merged.update(native.repair_schedule(wrong_time_fee, duration_lst, expected_finish_lst,
+                                             merged['start_minutes']))
+
+    profiles = [result['profile'] for result in results if 'profile' in result]
+    if profiles:
+        merged['profile'] = _sum_dicts(profiles)
+    return merged
+
+
+def _sum_dicts(dicts: List[dict]) -> dict:
+    """
+    :return: dictionary with the sum of the numbers under the same keys, recursively
+    """
+    total = {}
+    for d in dicts:
+        for key, value in d.items():
+            if isinstance(value, dict):
+                total[key] = _sum_dicts([total.get(key, {}), value])
+            else:
+                total[key] = total.get(key, 0) + value
+    return total
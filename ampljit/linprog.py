@@ -0,0 +1,103 @@
+from time import time
+import numpy as np
+
+from ampljit import native
+
+# time limit given to HiGHS when a deadline has already passed or is about to, in seconds
+min_time_limit = 0.01
+
+
+def is_available() -> bool:
+    """
+    Only the version of SciPy is checked, because importing scipy.optimize takes about half a second:
+    it's imported by the first solve, usually the warm up at startup.
+    :return: whether SciPy, an optional dependency, is installed in a version with the HiGHS solvers
+    """
+    try:
+        import scipy
+    except ImportError:
+        return False
+    major, minor = scipy.__version__.split('.')[:2]
+    return (int(major), int(minor)) >= (1, 6)
+
+
+def solve_canonical(n_batches: int, wrong_time_fee: int, duration_lst: list, expected_finish_lst: list,
+                    deadline: float = None) -> dict:
+    """
+    Solves the LP model in jit.mod in-process with the HiGHS dual simplex of scipy.optimize.linprog,
+    with the same interface of ampljit.model.solve_canonical().
+    The absolute value in the objective is split into the early and late minutes of each batch:
+    start_time + duration - expected_finish = late - early, with delta_time = early + late.
+    This formulation has n equality rows instead of the 2n inequality rows of delta_time_abs_1 and
+    delta_time_abs_2, and it takes about half the simplex iterations.
+    The constraint matrix is built in sparse form, so that its size is linear in the number of batches.
+    The matrix is totally unimodular and the data is integral, so the optimal vertex found by the simplex
+    is integral too, and its values are only rounded to remove the floating point noise.
+    :param deadline: UNIX time by which HiGHS must stop. If it's hit, the result is a feasible schedule
+                     repaired from the interrupted solution and its status is 'time_limit'
+    :return: dictionary with the total fee, the start minutes and the delta times of each batch,
+             the number of simplex iterations, the status of the solution ('optimal' or 'time_limit'),
+             the computation duration and the duration of the 'solve' stage
+    :raise RuntimeError: if HiGHS neither finds an optimal solution nor hits its time limit
+    """
+    from scipy import sparse
+    from scipy.optimize import linprog
+
+    start = time()
+
+    n = n_batches
+    duration_arr = np.asarray(duration_lst, dtype=np.float64)
+    expected_finish_arr = np.asarray(expected_finish_lst, dtype=np.float64)
+
+    # the variables are x = (start_time_1..n, early_1..n, late_1..n)
+    identity = sparse.identity(n, format='csr')
+    no_coefficients = sparse.csr_matrix((n - 1, n))
+
+    # start_time + early - late = expected_finish - duration
+    a_eq = sparse.hstack([identity, identity, -identity], format='csr')
+    b_eq = expected_finish_arr - duration_arr
+
+    # ordering: start_time[i] - start_time[i + 1] <= - duration[i]
+    ordering = sparse.eye(n - 1, n, k=0, format='csr') - sparse.eye(n - 1, n, k=1, format='csr')
+    a_ub = sparse.hstack([ordering, no_coefficients, no_coefficients], format='csr')
+    b_ub = -duration_arr[:-1]
+
+    c = np.concatenate([np.zeros(n), np.full(2 * n, float(wrong_time_fee))])
+    bounds = np.array([(-np.inf, np.inf)] * n + [(0, np.inf)] * (2 * n))
+
+    options = {}
+    if deadline is not None:
+        options['time_limit'] = max(deadline - time(), min_time_limit)
+
+    result = linprog(c, A_ub=a_ub, b_ub=b_ub, A_eq=a_eq, b_eq=b_eq, bounds=bounds, method='highs-ds',
+                     options=options)
+    if result.status == 0:
+        status = 'optimal'
+        solution = np.rint(result.x).astype(np.int64)
+        start_minutes = solution[:n].tolist()
+        delta_time_lst = (solution[n:2 * n] + solution[2 * n:]).tolist()
+        total_fee = wrong_time_fee * sum(delta_time_lst)
+    elif result.status == 1 and deadline is not None:
+        # the dual simplex only reaches a feasible schedule at the optimum, so the interrupted one is repaired
+        status = 'time_limit'
+        interrupted_start_minutes = None
+        if result.x is not None and np.all(np.isfinite(result.x[:n])):
+            interrupted_start_minutes = result.x[:n].tolist()
+        repaired = native.repair_schedule(wrong_time_fee, duration_lst, expected_finish_lst,
+                                          interrupted_start_minutes)
+        start_minutes = repaired['start_minutes']
+        delta_time_lst = repaired['delta_time']
+        total_fee = repaired['total_fee']
+    else:
+        raise RuntimeError(f'HiGHS couldn\'t solve the JIT instance: {result.message}')
+
+    computation_duration = time() - start
+    return {
+        'total_fee': total_fee,
+        'start_minutes': start_minutes,
+        'delta_time': delta_time_lst,
+        'iterations': int(result.nit),
+        'status': status,
+        'computation_duration': computation_duration,
+        'stages': {'solve': computation_duration},
+    }
@@ -1,20 +1,115 @@
 from os import path
+from time import time
 import logging
-from amplpy import DataFrame
+from typing import Callable, TYPE_CHECKING
+import numpy as np
 
-from ampljit import utils
-from amplwrapper.ampl_wrapper import AMPLWrapper
+from ampljit import native, utils
+
+# amplpy is only imported by the functions that run in the AMPL sessions, so that the preprocessing and
+# the response building functions can be used on machines without AMPL
+if TYPE_CHECKING:
+    from amplpy import DataFrame
+    from amplwrapper.ampl_wrapper import AMPLWrapper
 
 models_directory = path.join(path.dirname(__file__), 'model')
 model_filename = path.join(models_directory, 'jit.mod')
 
+ordered_model_name = 'jit_ordered'
+ordered_model_filename = path.join(models_directory, f'{ordered_model_name}.mod')
+
 model_statements: str
 with open(model_filename) as model_content:
     model_statements = model_content.read()
 
+ordered_model_statements: str
+with open(ordered_model_filename) as ordered_model_content:
+    ordered_model_statements = ordered_model_content.read()
+
+# entities of jit_ordered.mod whose basis statuses are kept to warm start the next solve
+basis_variables = ['start_time', 'delta_time']
+basis_constraints = ['delta_time_abs_1', 'delta_time_abs_2', 'ordering']
+
+# copies the statuses stored in the *_sstatus params to the variables and constraints of jit_ordered.mod
+warm_start_statements = '''
+let {b in BATCH} start_time[b].sstatus := start_time_sstatus[b];
+let {b in BATCH} delta_time[b].sstatus := delta_time_sstatus[b];
+let {b in BATCH} delta_time_abs_1[b].sstatus := delta_time_abs_1_sstatus[b];
+let {b in BATCH} delta_time_abs_2[b].sstatus := delta_time_abs_2_sstatus[b];
+let {b in BATCH: ord(b) < card(BATCH)} ordering[b].sstatus := ordering_sstatus[b];
+'''
+
+# statuses of the JIT results, by AMPL solve_result. Any other solve_result is an error
+solve_statuses = {
+    'solved': 'optimal',
+    'limit': 'time_limit',
+}
+
+# tiny JIT instance solved by each AMPL session at startup, so that the first request doesn't pay for
+# starting AMPL and CPLEX and for parsing the model
+warm_up_instance = {
+    'n_batches': 2,
+    'wrong_time_fee': 1,
+    'duration_lst': [1, 1],
+    'expected_finish_lst': [0, 1],
+}
+
+# time limit given to CPLEX when a deadline has already passed or is about to, in seconds
+min_time_limit = 0.01
+
+
+def preprocess(expected_finish_datetime_str_lst: list, datetime_format: str = utils.iso_datetime_format):
+    """
+    Converts the expected finish datetimes of a JIT instance into the minute offsets used by the AMPL model.
+    The first expected finish datetime is the reference epoch of the whole instance.
+    :param expected_finish_datetime_str_lst: list of datetime strings in the given datetime format
+    :param datetime_format: format of the datetime
+    :return: tuple (epoch as a datetime64[m] value, UTC offset in minutes of the input or None if it's naive,
+             list of minute time deltas with respect to the epoch)
+    :raise ValueError: if a datetime string can't be parsed
+    """
+    # converts strings in the ISO8601 format to datetime64 values
+    expected_finish_datetime_arr, utc_offset = utils.strings_to_datetimes(expected_finish_datetime_str_lst,
+                                                                          datetime_format)
+
+    # converts the datetime64 values into minute time deltas with respect to the first item
+    expected_finish_lst = utils.minute_timedeltas_wrt_first(expected_finish_datetime_arr).tolist()
+
+    return expected_finish_datetime_arr[0], utc_offset, expected_finish_lst
+
+
+def preprocess_epoch_minutes(expected_finish_epoch_minutes_lst: list):
+    """
+    Like preprocess(), but the expected finish datetimes are given as minutes since the Unix epoch (UTC),
+    as they're sent by the clients that use a binary format.
+    :param expected_finish_epoch_minutes_lst: list of integer minutes since 1970-01-01 00:00 UTC
+    :return: tuple (epoch as a datetime64[m] value, None, list of minute time deltas with respect to the epoch)
+    :raise ValueError: if a value doesn't fit in a 64 bit integer
+    """
+    try:
+        epoch_minutes_arr = np.asarray(expected_finish_epoch_minutes_lst, dtype=np.int64)
+    except OverflowError as ex:
+        raise ValueError(str(ex))
+
+    expected_finish_lst = (epoch_minutes_arr - epoch_minutes_arr[0]).tolist()
+    return epoch_minutes_arr[0].astype('datetime64[m]'), None, expected_finish_lst
+
+
+def solve_canonical(ampl: 'AMPLWrapper', n_batches: int, wrong_time_fee: int, duration_lst: list,
+                    expected_finish_lst: list, deadline: float = None, profile: bool = False) -> dict:
+    """
+    Solves a JIT instance whose expected finish times are already expressed as minute offsets.
+    The result only contains plain Python values, so that it can be sent between processes and cached.
+    :param deadline: UNIX time by which CPLEX must stop. If it's hit, the result is the best schedule found
+                     so far and its status is 'time_limit'
+    :param profile: if True, the timing statistics of AMPL and CPLEX are collected during the solve and
+                    returned under the 'profile' key, as returned by AMPLWrapper.stop_profile()
+    :return: dictionary with the total fee, the start minutes and the delta times of each batch,
+             the number of dual simplex iterations, the status of the solution ('optimal' or 'time_limit'),
+             the computation duration and the duration of each stage
+    """
+    started_at = time()
 
-def solve(ampl: AMPLWrapper, n_batches: int, wrong_time_fee: int, duration_lst: list,
-          expected_finish_datetime_str_lst: list, datetime_format: str = '%Y-%m-%d %H:%M'):
     # clear every data from the AMPL model
     ampl.reset()
     ampl.eval(model_statements)
@@ -26,25 +121,111 @@ def solve(ampl: AMPLWrapper, n_batches: int, wrong_time_fee: int, duration_lst:
         create_constraints=utils.create_multiple_ordering_constraints
     )
 
-    # converts strings in the ISO8601 format to datetime objects
-    expected_finish_datetime_lst = utils.strings_to_datetimes(expected_finish_datetime_str_lst, datetime_format)
-
-    # converts a list of datetime objects into a list of minute time deltas with respect to the first item
-    expected_finish_lst = utils.minute_timedeltas_wrt_first(expected_finish_datetime_lst)
-
     logging.log(logging.DEBUG, f'Constraints: {ordering_st_constraints}')
     ampl.eval(ordering_st_constraints)
 
+    return _set_data_and_solve(ampl, n_batches=n_batches, wrong_time_fee=wrong_time_fee, duration_lst=duration_lst,
+                               expected_finish_lst=expected_finish_lst, started_at=started_at, deadline=deadline,
+                               profile=profile)
+
+
+def solve_persistent(ampl: 'AMPLWrapper', n_batches: int, wrong_time_fee: int, duration_lst: list,
+                     expected_finish_lst: list, warm_start_basis: dict = None, return_basis: bool = False,
+                     deadline: float = None, profile: bool = False) -> dict:
+    """
+    Same as solve_canonical(), but the model in jit_ordered.mod is loaded only once per AMPL session.
+    Its ordering constraints are indexed over the ordered BATCH set, so between two solves
+    only the set and param data are replaced.
+    :param warm_start_basis: basis statuses returned by a previous solve of an instance with the same
+                             number of batches. If given, they're sent to CPLEX as the starting basis
+    :param return_basis: if True, the result also contains the basis statuses of the optimal solution,
+                         under the 'basis' key
+    """
+    started_at = time()
+    ampl.load_model(ordered_model_name, ordered_model_statements)
+    ampl.reset_data()
+
+    def set_warm_start():
+        if warm_start_basis is not None:
+            ampl.set_data(_basis_to_data_frame(warm_start_basis, n_batches))
+            ampl.eval(warm_start_statements)
+
+    result = _set_data_and_solve(ampl, n_batches=n_batches, wrong_time_fee=wrong_time_fee,
+                                 duration_lst=duration_lst, expected_finish_lst=expected_finish_lst,
+                                 before_solve=set_warm_start, started_at=started_at, deadline=deadline,
+                                 profile=profile)
+    result['warm_start'] = warm_start_basis is not None
+
+    if return_basis and result['status'] == 'optimal':
+        result['basis'] = _get_basis(ampl)
+
+    return result
+
+
+def _basis_to_data_frame(basis: dict, n_batches: int) -> 'DataFrame':
+    """
+    Converts a basis returned by _get_basis() into a columnar DataFrame indexed by BATCH, whose columns
+    are the *_sstatus params of jit_ordered.mod.
+    The ordering constraint isn't defined for the last batch, whose status is set to 'none'.
+    """
+    from amplpy import DataFrame
+
+    columns = [(f'{name}_sstatus', statuses + ['none'] * (n_batches - len(statuses)))
+               for name, statuses in basis.items()]
+    return DataFrame(index=('BATCH', utils.create_batch_list(n_batches)), columns=columns)
+
+
+def _get_basis(ampl: 'AMPLWrapper') -> dict:
+    """
+    :return: dictionary that maps each variable and constraint of jit_ordered.mod to the list of its
+             basis statuses, sorted by batch
+    """
+    batch_entities = basis_variables + basis_constraints[:-1]
+    basis = _get_columns(ampl, [f'{name}.sstatus' for name in batch_entities])
+    ordering = _get_columns(ampl, ['ordering.sstatus'])
+
+    basis = {name: statuses for name, statuses in zip(batch_entities, basis)}
+    basis['ordering'] = ordering[0]
+    return basis
+
+
+def _get_columns(ampl: 'AMPLWrapper', expressions: list) -> list:
+    """
+    Reads the values of the given AMPL expressions, which must share the same indexing set, with a single
+    round trip to AMPL.
+    :return: list with the values of each expression, sorted by index
+    """
+    data: 'DataFrame' = ampl.get_data(*expressions)
+    return [list(data.getColumn(expression)) for expression in expressions]
+
+
+def _set_data_and_solve(ampl: 'AMPLWrapper', n_batches: int, wrong_time_fee: int, duration_lst: list,
+                        expected_finish_lst: list, before_solve: Callable[[], None] = None,
+                        started_at: float = None, deadline: float = None, profile: bool = False) -> dict:
+    """
+    Sends the instance data to the already declared model, solves it and reads its solution.
+    The result contains the duration of the 'model_build', 'solve' and 'extraction' stages, under the 'stages' key.
+    :param before_solve: function called right before solving, once the instance data has been set
+    :param started_at: time when the model build started, by default when this function is called
+    :param deadline: UNIX time by which CPLEX must stop, None for no limit
+    :param profile: whether the timing statistics of AMPL and CPLEX are collected during the solve
+    :raise RuntimeError: if CPLEX neither solved the instance nor hit its time limit
+    """
+    from amplpy import DataFrame
+
+    if started_at is None:
+        started_at = time()
+
+    # the data is transferred to AMPL column by column, which is much faster than row by row for large instances
     batch_lst = utils.create_batch_list(n_batches)
-    batch_dict = utils.create_batch_dictionary(
-        batch_lst,
-        duration_lst=duration_lst,
-        expected_finish_lst=expected_finish_lst
-    )
-    batch_data = DataFrame.fromDict(batch_dict, index_names=['BATCH'], column_names=['duration', 'expected_finish'])
+    batch_data = DataFrame(index=('BATCH', batch_lst),
+                           columns=[('duration', duration_lst), ('expected_finish', expected_finish_lst)])
 
-    logging.log(logging.DEBUG, 'Setting Batch values')
-    logging.log(logging.DEBUG, f'batch_data: \n{batch_data}')
+    # the data frames are only printed in debug mode, since formatting them is as expensive as building them
+    debug = logging.getLogger().isEnabledFor(logging.DEBUG)
+    if debug:
+        logging.log(logging.DEBUG, 'Setting Batch values')
+        logging.log(logging.DEBUG, f'batch_data: \n{batch_data}')
 
     # update the wrong_time_fee AMPL parameter
     wrong_time_fee_parameter = ampl.get_parameter('wrong_time_fee')
@@ -53,39 +234,133 @@ def solve(ampl: AMPLWrapper, n_batches: int, wrong_time_fee: int, duration_lst:
     # write the values of the BATCH set on AMPL
     ampl.set_data(batch_data, set_name='BATCH')
 
+    if before_solve is not None:
+        before_solve()
+
+    model_build_duration = time() - started_at
+
+    # the time left once the model has been built becomes the CPLEX time limit.
+    # The option is set on every solve, so that the limit of a previous request doesn't apply to this one
+    time_limit = None
+    if deadline is not None:
+        time_limit = max(deadline - time(), min_time_limit)
+    ampl.set_time_limit(time_limit)
+
     # ask AMPL to solve the problem with the given data
-    computation_duration = ampl.solve()
+    if profile:
+        ampl.start_profile()
+    try:
+        computation_duration = ampl.solve()
+    finally:
+        solver_profile = ampl.stop_profile() if profile else None
+
+    solve_result = ampl.get_value('solve_result')
+    status = solve_statuses.get(solve_result)
+    if status is None:
+        raise RuntimeError(f'CPLEX didn\'t solve the JIT instance: its solve_result is {solve_result}')
 
     # retrieve computed values and parameters from AMPL
+    extraction_started_at = time()
     objective_value: int = ampl.get_value('total_fee')
-    start_time: DataFrame = ampl.get_variable_values('start_time')
-    delta_time: DataFrame = ampl.get_variable_values('delta_time')
+    start_minutes, delta_time_lst = _get_columns(ampl, ['start_time', 'delta_time'])
+    if status == 'time_limit':
+        # the dual simplex only reaches a feasible schedule at the optimum, so the interrupted one is repaired
+        repaired = native.repair_schedule(wrong_time_fee, duration_lst, expected_finish_lst, start_minutes)
+        objective_value = repaired['total_fee']
+        start_minutes = repaired['start_minutes']
+        delta_time_lst = repaired['delta_time']
+    extraction_duration = time() - extraction_started_at
 
-    start_minutes = utils.dict_to_list(start_time.toDict())
+    if debug:
+        result_batch_dict = utils.create_result_batch_dictionary(
+            batch_lst,
+            start_datetime_lst=start_minutes,
+            delta_time_lst=delta_time_lst
+        )
+        result_batch_data = DataFrame.fromDict(result_batch_dict, index_names=['BATCH'],
+                                               column_names=['start_datetime', 'delta_time'])
+        logging.log(logging.DEBUG, f'result_batch_data: \n{result_batch_data}')
 
-    # convert start_minutes to a list of datetime objects
-    start_datetime_lst = utils.set_minutes_to_datetimes(datetime_lst=expected_finish_datetime_lst,
-                                                        minutes_lst=start_minutes)
+    result = {
+        'total_fee': objective_value,
+        'start_minutes': start_minutes,
+        'delta_time': delta_time_lst,
+        'iterations': ampl.n_iterations,
+        'status': status,
+        'computation_duration': computation_duration,
+        'stages': {
+            'model_build': model_build_duration,
+            'solve': computation_duration,
+            'extraction': extraction_duration,
+        },
+    }
+    if solver_profile is not None:
+        result['profile'] = solver_profile
+    return result
 
-    delta_time_lst = utils.dict_to_list(delta_time.toDict())
 
-    result_batch_dict = utils.create_result_batch_dictionary(
-        batch_lst,
-        start_datetime_lst=start_minutes,
-        delta_time_lst=delta_time_lst
-    )
-    result_batch_data = DataFrame.fromDict(result_batch_dict, index_names=['BATCH'],
-                                           column_names=['start_datetime', 'delta_time'])
-    logging.log(logging.DEBUG, f'result_batch_data: \n{result_batch_data}')
+def build_response(result: dict, epoch: np.datetime64, utc_offset: int = None,
+                   datetime_format: str = utils.iso_datetime_format, start_minutes_offset: int = 0,
+                   cached: bool = False, coalesced: bool = False, epoch_minutes: bool = False,
+                   profile: dict = None, chunk_size: int = None) -> dict:
+    """
+    Builds the JSON response of the JIT problem from the result of solve_canonical().
+    :param result: dictionary returned by solve_canonical()
+    :param epoch: reference epoch of the caller's instance, as returned by preprocess()
+    :param utc_offset: UTC offset of the caller's instance, as returned by preprocess()
+    :param datetime_format: format of the datetime
+    :param start_minutes_offset: amount of minutes to add to each start minute of the result
+    :param cached: whether the result comes from the result cache
+    :param coalesced: whether the result has been shared with an identical request solved at the same time
+    :param epoch_minutes: whether the start datetimes are returned as minutes since the Unix epoch (UTC),
+                          as they're expected by the clients that use a binary format, instead of strings
+    :param profile: timing breakdown of the request, returned under the 'profile' key of the meta if given
+    :param chunk_size: if given, the start datetimes are converted lazily, chunk_size at a time, and
+                       `start_datetime` is an iterator of lists, as written by amplrestapi.codecs.stream_json()
+    """
+    # the start minutes are converted to datetimes with respect to the caller's epoch
+    start_epoch = epoch + np.timedelta64(int(start_minutes_offset), 'm')
+    start_minutes = result['start_minutes']
+    if chunk_size is None:
+        start_datetime_lst = _start_datetimes(start_epoch, start_minutes, utc_offset, datetime_format, epoch_minutes)
+    else:
+        start_datetime_lst = (_start_datetimes(start_epoch, start_minutes[i:i + chunk_size], utc_offset,
+                                               datetime_format, epoch_minutes)
+                              for i in range(0, len(start_minutes), chunk_size))
 
-    return {
+    response = {
         'data': {
-            'total_fee': objective_value,
-            'start_datetime': utils.datetimes_to_strings(start_datetime_lst, datetime_format),
-            'delta_time': delta_time_lst,
+            'total_fee': result['total_fee'],
+            'start_datetime': start_datetime_lst,
+            'delta_time': result['delta_time'],
         },
         'meta': {
-            'iterations': ampl.n_iterations,
-            'computation_duration': computation_duration,
+            'iterations': result['iterations'],
+            'computation_duration': result['computation_duration'],
+            'solver': result.get('solver', 'ampl'),
+            'status': result.get('status', 'optimal'),
+            'cached': cached,
+            'coalesced': coalesced,
+            'warm_start': result.get('warm_start', False),
+            'blocks': result.get('blocks', 1),
         },
     }
+    if profile is not None:
+        response['meta']['profile'] = profile
+    return response
+
+
+def _start_datetimes(start_epoch: np.datetime64, start_minutes: list, utc_offset: int, datetime_format: str,
+                     epoch_minutes: bool) -> list:
+    start_datetime_arr = utils.set_minutes_to_datetimes(start_epoch, start_minutes)
+    if epoch_minutes:
+        return start_datetime_arr.astype(np.int64).tolist()
+    return utils.datetimes_to_strings(start_datetime_arr, datetime_format, utc_offset)
+
+
+def solve(ampl: 'AMPLWrapper', n_batches: int, wrong_time_fee: int, duration_lst: list,
+          expected_finish_datetime_str_lst: list, datetime_format: str = utils.iso_datetime_format):
+    epoch, utc_offset, expected_finish_lst = preprocess(expected_finish_datetime_str_lst, datetime_format)
+    result = solve_canonical(ampl, n_batches=n_batches, wrong_time_fee=wrong_time_fee, duration_lst=duration_lst,
+                             expected_finish_lst=expected_finish_lst)
+    return build_response(result, epoch, utc_offset, datetime_format)
@@ -0,0 +1,43 @@
+/**
+ * Same JIT model of jit.mod, where the ordering constraints are expressed as a single
+ * indexed constraint over the ordered BATCH set.
+ * Since the model doesn't depend on the number of batches, it can be loaded once per AMPL session:
+ * between two solves only the data of the BATCH set and of the params needs to be replaced.
+ * The *_sstatus params hold the basis statuses of a previous solve, that are used to warm start the next one.
+ */
+
+# set declarations
+set BATCH ordered; # ordered set where each item maps to a single program
+
+# param declarations
+param duration{BATCH};        # duration of each program
+param expected_finish{BATCH}; # time each program should take to complete
+param wrong_time_fee;         # dollars to pay for each program result that
+                              # isn't computed in exactly the estimated time
+
+# variable declarations
+var start_time{BATCH}; # starting time of each program
+var delta_time{BATCH}; # quantity of time wrong with respect to expected arrival
+
+# objective function
+# minimize the fixed fee to pay for each computation started either early or late
+minimize total_fee:
+         wrong_time_fee * sum{b in BATCH} delta_time[b];
+
+# wrong delta time is at least the exact wrong time.
+# This is a linearization of a modulo equation
+s.t. delta_time_abs_1{b in BATCH}:
+     delta_time[b] >= - expected_finish[b] + (start_time[b] + duration[b]);
+s.t. delta_time_abs_2{b in BATCH}:
+     delta_time[b] >= + expected_finish[b] - (start_time[b] + duration[b]);
+
+# each program can start only after the previous one has been completed
+s.t. ordering{b in BATCH: ord(b) < card(BATCH)}:
+     start_time[next(b)] >= start_time[b] + duration[b];
+
+# basis statuses of a previous optimal solution, used to warm start the solver
+param start_time_sstatus{BATCH} symbolic default 'none';
+param delta_time_sstatus{BATCH} symbolic default 'none';
+param delta_time_abs_1_sstatus{BATCH} symbolic default 'none';
+param delta_time_abs_2_sstatus{BATCH} symbolic default 'none';
+param ordering_sstatus{BATCH} symbolic default 'none';
@@ -0,0 +1,85 @@
+from heapq import heappush, heapreplace
+from itertools import accumulate
+from time import time
+
+
+def solve_canonical(n_batches: int, wrong_time_fee: int, duration_lst: list, expected_finish_lst: list) -> dict:
+    """
+    Solves a JIT instance exactly, without AMPL, with the same interface of ampljit.model.solve_canonical().
+
+    Let C_i = start_time_i + duration_i be the completion time of batch i and P_i the sum of the durations of
+    the batches 1..i. The ordering constraints C_i+1 >= C_i + duration_i+1 become y_i+1 >= y_i with y_i = C_i - P_i,
+    and the objective becomes the sum of |y_i - (expected_finish_i - P_i)|.
+    This is an L1 isotonic regression, which is solved in O(n log n) by pooling adjacent violators
+    with a max-heap that keeps track of the median of the current block (slope trick).
+
+    :param n_batches: number of batches
+    :param wrong_time_fee: fee to pay for each minute early or late
+    :param duration_lst: list of durations of each batch
+    :param expected_finish_lst: list of expected finish minute offsets of each batch
+    :return: dictionary with the total fee, the start minutes and the delta times of each batch,
+             the number of iterations (always 0), the status of the solution (always 'optimal'),
+             the computation duration and the duration of the 'solve' stage
+    """
+    start = time()
+
+    prefix_durations = list(accumulate(duration_lst))
+    targets = [expected_finish - prefix for expected_finish, prefix in zip(expected_finish_lst, prefix_durations)]
+
+    # max-heap (values are negated) of the candidate medians of the blocks merged so far
+    heap = []
+    block_tops = []
+    for target in targets:
+        heappush(heap, -target)
+        if -heap[0] > target:
+            # the new target violates the ordering: it's merged into the previous block
+            heapreplace(heap, -target)
+        block_tops.append(-heap[0])
+
+    # the optimal y is the running minimum of the block medians, read backwards
+    y = block_tops
+    for i in range(n_batches - 2, -1, -1):
+        if y[i] > y[i + 1]:
+            y[i] = y[i + 1]
+
+    start_minutes = [y_i + prefix - duration for y_i, prefix, duration in zip(y, prefix_durations, duration_lst)]
+    delta_time_lst = [abs(y_i - target) for y_i, target in zip(y, targets)]
+
+    computation_duration = time() - start
+    return {
+        'total_fee': wrong_time_fee * sum(delta_time_lst),
+        'start_minutes': start_minutes,
+        'delta_time': delta_time_lst,
+        'iterations': 0,
+        'status': 'optimal',
+        'computation_duration': computation_duration,
+        'stages': {'solve': computation_duration},
+    }
+
+
+def repair_schedule(wrong_time_fee: int, duration_lst: list, expected_finish_lst: list,
+                    start_minutes: list = None) -> dict:
+    """
+    Turns the possibly infeasible start minutes returned by a solver that hit its time limit into a feasible
+    schedule, by delaying each batch until the previous one has finished.
+    The schedule that starts every batch as close as possible to its expected finish time is repaired too,
+    and the cheaper of the two is returned.
+    :param start_minutes: start minutes of the interrupted solver, if it returned any
+    :return: dictionary with the total fee, the start minutes and the delta times of each batch
+    """
+    candidates = [[expected_finish - duration for expected_finish, duration in zip(expected_finish_lst, duration_lst)]]
+    if start_minutes is not None:
+        candidates.append([int(round(start)) for start in start_minutes])
+
+    best = None
+    for candidate in candidates:
+        for i in range(1, len(candidate)):
+            earliest_start = candidate[i - 1] + duration_lst[i - 1]
+            if candidate[i] < earliest_start:
+                candidate[i] = earliest_start
+        delta_time_lst = [abs(start + duration - expected_finish)
+                          for start, duration, expected_finish in zip(candidate, duration_lst, expected_finish_lst)]
+        total_fee = wrong_time_fee * sum(delta_time_lst)
+        if best is None or total_fee < best['total_fee']:
+            best = {'total_fee': total_fee, 'start_minutes': candidate, 'delta_time': delta_time_lst}
+    return best
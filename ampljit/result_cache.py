@@ -0,0 +1,75 @@
+from collections import OrderedDict
+from time import monotonic
+from typing import Hashable, Union
+
+
+class ResultCache:
+    """
+    LRU cache with a time-to-live, used to store the results of already solved problems.
+    When the cache is full, the least recently used entry is evicted.
+    Entries older than `ttl` seconds are treated as missing and dropped on access.
+    """
+
+    def __init__(self, max_size: int, ttl: float, enabled: bool = True):
+        """
+        :param max_size: maximum number of entries kept in the cache
+        :param ttl: number of seconds after which an entry expires. If it's 0, entries never expire
+        :param enabled: if False, the cache never stores anything
+        """
+        self._max_size = max_size
+        self._ttl = ttl
+        self._enabled = enabled and max_size > 0
+        self._entries: OrderedDict = OrderedDict()
+
+        self._n_hits: int = 0
+        self._n_misses: int = 0
+        self._n_evictions: int = 0
+        self._n_expirations: int = 0
+
+    def get(self, key: Hashable) -> Union[object, None]:
+        """
+        :return: the value associated to key, or None if it isn't cached or it has expired
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self._n_misses += 1
+            return None
+
+        value, stored_at = entry
+        if self._ttl > 0 and monotonic() - stored_at > self._ttl:
+            del self._entries[key]
+            self._n_expirations += 1
+            self._n_misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self._n_hits += 1
+        return value
+
+    def put(self, key: Hashable, value: object):
+        if not self._enabled:
+            return
+
+        self._entries[key] = (value, monotonic())
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
+            self._n_evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        n_lookups = self._n_hits + self._n_misses
+        return {
+            'enabled': self._enabled,
+            'size': len(self._entries),
+            'max_size': self._max_size,
+            'ttl': self._ttl,
+            'hits': self._n_hits,
+            'misses': self._n_misses,
+            'hit_ratio': self._n_hits / n_lookups if n_lookups > 0 else 0.0,
+            'evictions': self._n_evictions,
+            'expirations': self._n_expirations,
+        }
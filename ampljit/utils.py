@@ -1,5 +1,17 @@
-from datetime import datetime, timedelta
-from typing import Callable
+from datetime import datetime
+from typing import Callable, Tuple, Union
+import re
+import numpy as np
+
+# default format of the datetimes in the JIT requests and responses, parsed natively by NumPy
+iso_datetime_format = '%Y-%m-%d %H:%M'
+
+# UTC offset at the end of an ISO8601 datetime string
+utc_offset_regex = re.compile(r'(Z|[+-]\d{2}:?\d{2})$')
+
+# layouts of the local part of the ISO8601 datetimes parsed by NumPy, by width: 'd' is a digit, '?' is either
+# a space or a 'T', and the other characters are literal. NumPy would also parse e.g. 'NaT', 'now' or dates alone
+iso_local_layouts = {16: 'dddd-dd-dd?dd:dd', 19: 'dddd-dd-dd?dd:dd:dd'}
 
 
 def create_batch_list(n_batches: int) -> list:
@@ -40,6 +52,22 @@ def create_multiple_constraints(start_index: int, last_index: int, create_constr
     return create_constraints(start_index, last_index)
 
 
+def canonical_instance(wrong_time_fee: int, duration_lst: list, expected_finish_lst: list) -> Tuple[tuple, int]:
+    """
+    Returns a hashable canonical form of a JIT instance.
+    The JIT problem is invariant to time translations, so the canonical form only contains the fee,
+    the durations and the expected finish offsets with respect to the first batch.
+    Two instances that differ only by a shift in time have the same canonical form.
+    :param wrong_time_fee: fee to pay for each minute early or late
+    :param duration_lst: list of durations of each batch
+    :param expected_finish_lst: list of minute time deltas, as returned by minute_timedeltas_wrt_first()
+    :return: tuple (canonical form, minute offset of the first batch that was removed from expected_finish_lst)
+    """
+    first_minutes = expected_finish_lst[0]
+    relative_finish_lst = tuple(m - first_minutes for m in expected_finish_lst)
+    return (wrong_time_fee, tuple(duration_lst), relative_finish_lst), first_minutes
+
+
 def dict_to_list(obj: dict) -> list:
     """
     Converts a dictionary to a list, extracting the values of the dictionary.
@@ -51,67 +79,175 @@ def dict_to_list(obj: dict) -> list:
     return list(obj.values())
 
 
-def strings_to_datetimes(str_date_lst: list, datetime_format: str) -> list:
+def strings_to_datetimes(str_date_lst: list, datetime_format: str) -> Tuple[np.ndarray, Union[int, None]]:
     """
-    Converts a list of strings into a list of datetime objects
+    Converts a list of strings into an array of datetime64[m] values.
+    Strings in the ISO8601 format (with either a space or a 'T' separator) are parsed by NumPy at once.
+    They may end with a UTC offset ('Z', '+HH:MM', '-HH:MM', '+HHMM' or '-HHMM'): in that case every string
+    must have one, and the datetimes are converted to UTC.
+    Strings in any other format are parsed one by one with datetime.strptime.
     :param str_date_lst: list of string objects compatible with the ISO8601 format
     :param datetime_format: format of the datetime
-    :return: list of datetime objects equivalent to the given str_date_lst
+    :return: tuple (array of datetime64[m] values, UTC offset in minutes of the first string or None if the
+             strings are naive)
+    :raise ValueError: if a string can't be parsed
     """
-    return [datetime.strptime(d, datetime_format) for d in str_date_lst]
-
-
-def minute_timedelta(first: datetime, second: datetime) -> int:
+    if datetime_format != iso_datetime_format:
+        datetime_lst = [datetime.strptime(d, datetime_format) for d in str_date_lst]
+        utc_offset = _utc_offset_minutes(datetime_lst[0])
+        if utc_offset is not None:
+            datetime_lst = [(d - d.utcoffset()).replace(tzinfo=None) for d in datetime_lst]
+        return np.array(datetime_lst, dtype='datetime64[m]'), utc_offset
+
+    str_date_arr = np.array(str_date_lst)
+    utc_offset_match = utc_offset_regex.search(str_date_lst[0])
+    if utc_offset_match is None:
+        # naive strings must share the same layout, so that no UTC offset is silently ignored
+        if np.any(np.char.str_len(str_date_arr) != len(str_date_lst[0])):
+            raise ValueError('Every datetime must have the same format')
+        return _parse_iso_local(str_date_arr, len(str_date_lst[0])), None
+
+    # every string must have the same layout of the first one. The UTC offsets are read from the
+    # code points of the strings, so that they're parsed at once, like the datetimes
+    local_width = utc_offset_match.start()
+    if np.any(np.char.str_len(str_date_arr) < local_width + 1):
+        raise ValueError('Either every datetime or none of them must have a UTC offset')
+
+    n_codes = str_date_arr.dtype.itemsize // 4
+    offset_codes = str_date_arr.view(np.uint32).reshape(len(str_date_lst), n_codes)[:, local_width:]
+    offset_codes = np.pad(offset_codes, ((0, 0), (0, max(0, 6 - offset_codes.shape[1]))), mode='constant')
+    sign_codes = offset_codes[:, 0]
+    if not np.all((sign_codes == ord('Z')) | (sign_codes == ord('+')) | (sign_codes == ord('-'))):
+        raise ValueError('Either every datetime or none of them must have a UTC offset')
+
+    # each string must end right after its UTC offset, whose layout is given by its sign and its colon,
+    # and the digits of the offset must be digits, since the codes past the end of a string are 0
+    is_utc = sign_codes == ord('Z')
+    has_colon = offset_codes[:, 3] == ord(':')
+    offset_width = np.where(is_utc, 1, np.where(has_colon, 6, 5))
+    if np.any(np.char.str_len(str_date_arr) != local_width + offset_width):
+        raise ValueError('Every datetime must have the same format')
+
+    digits = offset_codes.astype(np.int64) - ord('0')
+    hour_digits = digits[:, 1:3]
+    minute_digits = np.where(has_colon[:, np.newaxis], digits[:, 4:6], digits[:, 3:5])
+    offset_digits = np.concatenate([hour_digits, minute_digits], axis=1)[~is_utc]
+    if np.any((offset_digits < 0) | (offset_digits > 9)):
+        raise ValueError('The UTC offsets must be either \'Z\' or in the \'+HH:MM\' or \'+HHMM\' format')
+
+    offset_hours = hour_digits[:, 0] * 10 + hour_digits[:, 1]
+    offset_minutes = minute_digits[:, 0] * 10 + minute_digits[:, 1]
+    if np.any(((offset_hours > 23) | (offset_minutes > 59)) & ~is_utc):
+        raise ValueError('The UTC offsets must be between -23:59 and +23:59')
+    utc_offsets = np.where(sign_codes == ord('-'), -1, 1) * (offset_hours * 60 + offset_minutes)
+    utc_offsets[is_utc] = 0
+
+    local_datetime_arr = _parse_iso_local(str_date_arr, local_width)
+    datetime_arr = local_datetime_arr - utc_offsets.astype('timedelta64[m]')
+
+    # the order of strings with different UTC offsets isn't their chronological order,
+    # so request validation can't check it
+    if np.any(datetime_arr[1:] <= datetime_arr[:-1]):
+        raise ValueError('The datetimes must be ascendentally sorted')
+
+    return datetime_arr, int(utc_offsets[0])
+
+
+def _parse_iso_local(str_date_arr: np.ndarray, width: int) -> np.ndarray:
     """
-    Returns the difference expressed in minutes between 2 datetime objects
-    :param first: datetime object that comes before second
-    :param second: datetime object that comes after first
-    :return: difference in minutes between second and first
+    Parses at once the first `width` characters of each string, which must follow one of the iso_local_layouts.
+    The layout is checked on the code points of the strings, since NumPy alone accepts more than datetimes.
+    :param str_date_arr: array of strings that are at least `width` characters long
+    :return: array of datetime64[m] values
+    :raise ValueError: if a string doesn't follow the layout, isn't a valid datetime or has non-zero seconds
     """
-    delta: timedelta = second - first
-    return divmod(delta.total_seconds(), 60)[0]
-
-
-def minute_timedeltas_wrt_first(datetime_lst: list) -> list:
+    layout = iso_local_layouts.get(width)
+    if layout is None:
+        raise ValueError('The datetimes must be in the YYYY-MM-DD HH:MM format')
+
+    n_codes = str_date_arr.dtype.itemsize // 4
+    codes = str_date_arr.view(np.uint32).reshape(len(str_date_arr), n_codes)
+    for position, character in enumerate(layout):
+        column = codes[:, position]
+        if character == 'd':
+            valid = (column >= ord('0')) & (column <= ord('9'))
+        elif character == '?':
+            valid = (column == ord(' ')) | (column == ord('T'))
+        else:
+            valid = column == ord(character)
+        if not np.all(valid):
+            raise ValueError('The datetimes must be in the YYYY-MM-DD HH:MM format')
+
+    datetime_arr = str_date_arr.astype(f'U{width}').astype('datetime64[s]')
+    if np.any(np.isnat(datetime_arr)):
+        raise ValueError('The datetimes must be valid datetimes')
+    if np.any(datetime_arr.astype(np.int64) % 60 != 0):
+        raise ValueError('The datetimes must be whole minutes')
+    return datetime_arr.astype('datetime64[m]')
+
+
+def minute_timedeltas_wrt_first(datetime_arr: np.ndarray) -> np.ndarray:
     """
-    Converts a list of datetime objects into a list of minute time deltas with respect to the first item.
-    For example, given the input datetime_lst:
+    Converts an array of datetime64 values into an array of minute time deltas with respect to the first item,
+    which is the reference epoch of the whole instance.
+    For example, given the input datetime_arr:
     [
         '2019-08-22 14:32',
         '2019-08-22 14:38',
         '2019-08-22 14:42',
-        '2019-08-22 14:52',
-        '2019-08-22 14:57'
+        '2019-08-22 15:52',
+        '2019-08-23 00:57'
     ],
     the result would be:
-    [32, 38, 42, 52, 57]
+    [0, 6, 10, 80, 625]
 
-    :param datetime_lst: list of datetime objects
-    :return: minute time deltas with respect to the first item of datetime_lst
+    :param datetime_arr: array of datetime64 values
+    :return: minute time deltas with respect to the first item of datetime_arr
     """
-
-    first_datetime: datetime = datetime_lst[0]
-    partial_deltas = [minute_timedelta(first=first_datetime, second=v) for v in datetime_lst[1:]]
-    first_minutes = first_datetime.minute
-    return [first_minutes] + list(map(lambda x: x + first_minutes, partial_deltas))
+    return (datetime_arr - datetime_arr[0]).astype('timedelta64[m]').astype(np.int64)
 
 
-def set_minutes_to_datetimes(datetime_lst: list, minutes_lst: list) -> list:
+def set_minutes_to_datetimes(epoch: np.datetime64, minutes_lst: list) -> np.ndarray:
     """
-    Given a list of minutes and datetime objects, sets each amount of minutes to each datetime object with respect
-    to the list index. The two lists must have the same size.
-    :param datetime_lst: list of datetime objects
-    :param minutes_lst: list of minutes to set to a list of datetime objects
-    :return: list of datetime objects similar to datetime_lst but shifted according to minutes_lst
+    Converts a list of minute time deltas with respect to a common reference epoch into datetime64 values.
+    The minutes are rounded to the nearest integer, since the AMPL solver returns them as floats.
+    :param epoch: reference epoch of the minute time deltas, as a datetime64[m] value
+    :param minutes_lst: list of minutes to add to the epoch
+    :return: array of datetime64[m] values
     """
-    return [d.replace(minute=0) + timedelta(minutes=m) for d, m in zip(datetime_lst, minutes_lst)]
+    minutes_arr = np.rint(np.asarray(minutes_lst, dtype=np.float64)).astype(np.int64)
+    return epoch + minutes_arr.astype('timedelta64[m]')
 
 
-def datetimes_to_strings(datetime_lst: list, datetime_format: str) -> list:
+def datetimes_to_strings(datetime_arr: np.ndarray, datetime_format: str, utc_offset: int = None) -> list:
     """
-    Converts a list of datetime objects to strings, according to a certain datetime format.
-    :param datetime_lst: list of datetime objects to convert to string
+    Converts an array of datetime64 values to strings, according to a certain datetime format.
+    :param datetime_arr: array of datetime64[m] values to convert to string
     :param datetime_format: format of the datetime
+    :param utc_offset: if it isn't None, the datetimes are in UTC and they're converted to strings in the given
+                       UTC offset, expressed in minutes, which is appended to each string
     :return: the list of datetime objects converted to strings in the given datetime format
     """
-    return [d.strftime(datetime_format) for d in datetime_lst]
+    if utc_offset is not None:
+        datetime_arr = datetime_arr + np.timedelta64(utc_offset, 'm')
+
+    if datetime_format == iso_datetime_format:
+        str_date_arr = np.char.replace(np.datetime_as_string(datetime_arr, unit='m'), 'T', ' ')
+    else:
+        str_date_arr = np.array([d.strftime(datetime_format) for d in datetime_arr.astype(datetime)])
+
+    if utc_offset is not None:
+        str_date_arr = np.char.add(str_date_arr, _format_utc_offset(utc_offset))
+
+    return str_date_arr.tolist()
+
+
+def _utc_offset_minutes(d: datetime) -> Union[int, None]:
+    offset = d.utcoffset()
+    return None if offset is None else int(offset.total_seconds() // 60)
+
+
+def _format_utc_offset(utc_offset: int) -> str:
+    sign = '-' if utc_offset < 0 else '+'
+    hours, minutes = divmod(abs(utc_offset), 60)
+    return f'{sign}{hours:02d}:{minutes:02d}'
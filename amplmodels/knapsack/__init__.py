@@ -0,0 +1,33 @@
+"""
+0/1 knapsack problem: chooses the items with the largest total value whose total weight fits in the capacity.
+"""
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from amplwrapper.ampl_wrapper import AMPLWrapper
+
+# tiny instance solved by each AMPL session of the model at startup
+warm_up_input = {
+    'n_items': 1,
+    'value': [1],
+    'weight': [1],
+    'capacity': 1,
+}
+
+
+def set_data(ampl: 'AMPLWrapper', input_data: dict):
+    from amplpy import DataFrame
+
+    items = list(range(1, input_data['n_items'] + 1))
+    item_data = DataFrame(index=('ITEM', items),
+                          columns=[('value', input_data['value']), ('weight', input_data['weight'])])
+    ampl.get_parameter('capacity').set(input_data['capacity'])
+    ampl.set_data(item_data, set_name='ITEM')
+
+
+def extract(ampl: 'AMPLWrapper') -> dict:
+    take = ampl.get_data('take').getColumn('take')
+    return {
+        'total_value': ampl.get_value('total_value'),
+        'take': [round(t) == 1 for t in take],
+    }
@@ -0,0 +1,11 @@
+set ITEM;
+
+param value {ITEM} >= 0;
+param weight {ITEM} >= 0;
+param capacity >= 0;
+
+var take {ITEM} binary;
+
+maximize total_value: sum {i in ITEM} value[i] * take[i];
+
+s.t. capacity_limit: sum {i in ITEM} weight[i] * take[i] <= capacity;
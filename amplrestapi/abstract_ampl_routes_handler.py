@@ -1,16 +1,20 @@
 from abc import ABC, abstractmethod
 from aiohttp import web_request, web_response
+from typing import Dict
 
-from amplwrapper.ampl_wrapper import AMPLWrapper
+from ampljit.backends import SolverBackend
 
 
 class AbstractAMPLRoutesHandler(ABC):
-    def __init__(self, ampl: AMPLWrapper):
-        self._ampl: AMPLWrapper = ampl
+    def __init__(self, backends: Dict[str, SolverBackend]):
+        """
+        :param backends: solver backends available to the routes, by name
+        """
+        self._backends: Dict[str, SolverBackend] = backends
 
     @property
-    def ampl(self):
-        return self._ampl
+    def backends(self) -> Dict[str, SolverBackend]:
+        return self._backends
 
     @abstractmethod
     async def run(self, request: web_request.Request) -> web_response.Response:
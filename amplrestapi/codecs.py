@@ -0,0 +1,268 @@
+from aiohttp import web, web_request
+from typing import Iterator, Tuple
+import msgpack
+import orjson
+
+json_media_type = 'application/json'
+msgpack_media_type = 'application/msgpack'
+arrow_media_type = 'application/vnd.apache.arrow.stream'
+
+# media types that are accepted as synonyms of the supported ones
+media_type_aliases = {
+    'application/x-msgpack': msgpack_media_type,
+    'application/vnd.msgpack': msgpack_media_type,
+}
+
+# binary formats carry the expected finish and the start datetimes as int64 minutes since the Unix epoch (UTC),
+# instead of datetime strings
+binary_media_types = {msgpack_media_type, arrow_media_type}
+
+# properties of a JIT instance that are sent as the metadata of an Arrow record batch, instead of as columns
+arrow_metadata_properties = {
+    'wrong_time_fee': int,
+    'solver': str,
+    'warm_start_key': str,
+    'deadline': float,
+}
+
+
+def _import_pyarrow():
+    """
+    pyarrow is an optional dependency, only needed by the clients that use the Arrow IPC format.
+    :raise web.HTTPUnsupportedMediaType: if pyarrow isn't installed
+    """
+    try:
+        import pyarrow
+        return pyarrow
+    except ImportError:
+        raise web.HTTPUnsupportedMediaType(reason=f'The {arrow_media_type} format isn\'t supported by this server')
+
+
+def _canonical_media_type(media_type: str) -> str:
+    media_type = media_type.split(';', 1)[0].strip().lower()
+    return media_type_aliases.get(media_type, media_type)
+
+
+def is_binary(media_type: str) -> bool:
+    return media_type in binary_media_types
+
+
+def request_media_type(request: web_request.Request) -> str:
+    """
+    :return: the media type of the body of the request. Bodies that aren't MessagePack or Arrow are read as JSON,
+             like they were before content negotiation was supported
+    """
+    media_type = _canonical_media_type(request.headers.get('Content-Type', json_media_type))
+    return media_type if is_binary(media_type) else json_media_type
+
+
+def response_media_type(request: web_request.Request, default: str = json_media_type) -> str:
+    """
+    Chooses the media type of the response according to the Accept header of the request.
+    Media ranges are ranked by their quality value; wildcards and missing Accept headers select the default,
+    and so do Accept headers that don't contain any supported media type.
+    :param default: media type to use when the client doesn't express a preference, usually the request's one
+    """
+    accept = request.headers.get('Accept')
+    if not accept:
+        return default
+
+    ranked = []
+    for position, media_range in enumerate(accept.split(',')):
+        media_type, *parameters = [part.strip() for part in media_range.split(';')]
+        quality = 1.0
+        for parameter in parameters:
+            name, _, value = parameter.partition('=')
+            if name.strip() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            ranked.append((-quality, position, _canonical_media_type(media_type)))
+
+    for _, _, media_type in sorted(ranked):
+        if media_type in ('*/*', 'application/*'):
+            return default
+        if media_type == json_media_type or is_binary(media_type):
+            return media_type
+    return default
+
+
+def loads_json(body: bytes):
+    """
+    :raise json.decoder.JSONDecodeError: if the body isn't valid JSON. orjson's errors inherit from it
+    """
+    return orjson.loads(body)
+
+
+def dumps_json(obj) -> bytes:
+    return orjson.dumps(obj)
+
+
+def _loads_msgpack(body: bytes):
+    try:
+        return msgpack.unpackb(body, raw=False)
+    except (ValueError, msgpack.UnpackException) as ex:
+        raise web.HTTPBadRequest(reason=f'Invalid MessagePack body: {str(ex) or type(ex).__name__}')
+
+
+def _loads_arrow(body: bytes) -> dict:
+    """
+    Reads a JIT instance from an Arrow IPC stream with the int32 `duration` and the int64 `expected_finish`
+    columns. The scalar properties are read from the schema metadata, and `n_batches` is the number of rows.
+    """
+    pyarrow = _import_pyarrow()
+    try:
+        table = pyarrow.ipc.open_stream(pyarrow.py_buffer(body)).read_all()
+    except (pyarrow.ArrowInvalid, OSError) as ex:
+        raise web.HTTPBadRequest(reason=f'Invalid Arrow IPC stream: {ex}')
+
+    instance = {'n_batches': table.num_rows}
+    for name in table.schema.names:
+        instance[name] = table.column(name).to_pylist()
+
+    metadata = table.schema.metadata or {}
+    for name, property_type in arrow_metadata_properties.items():
+        value = metadata.get(name.encode('utf-8'))
+        if value is not None:
+            try:
+                instance[name] = property_type(value.decode('utf-8'))
+            except ValueError:
+                raise web.HTTPBadRequest(reason=f'Invalid `{name}` in the Arrow schema metadata')
+    return instance
+
+
+def _dumps_arrow(body: dict) -> bytes:
+    """
+    Writes a JIT response as an Arrow IPC stream with the int64 `start_datetime` and the float64 `delta_time`
+    columns. `total_fee` and the JSON encoded `meta` object are written in the schema metadata.
+    """
+    pyarrow = _import_pyarrow()
+    data = body['data']
+    schema = pyarrow.schema([('start_datetime', pyarrow.int64()), ('delta_time', pyarrow.float64())], metadata={
+        'total_fee': str(data['total_fee']),
+        'meta': orjson.dumps(body['meta']).decode('utf-8'),
+    })
+    table = pyarrow.Table.from_arrays([pyarrow.array(data['start_datetime'], type=pyarrow.int64()),
+                                       pyarrow.array(data['delta_time'], type=pyarrow.float64())], schema=schema)
+
+    sink = pyarrow.BufferOutputStream()
+    writer = pyarrow.RecordBatchStreamWriter(sink, schema)
+    writer.write_table(table)
+    writer.close()
+    return sink.getvalue().to_pybytes()
+
+
+async def read_body(request: web_request.Request, max_size: int = 0) -> bytes:
+    """
+    Reads the raw body of the request from its stream.
+    Unlike request.read(), the body isn't kept by the request until the response is sent,
+    so that it can be released as soon as it's decoded, before the problem is solved.
+    :param max_size: maximum size of the body in bytes, 0 means unbounded
+    :raise web.HTTPRequestEntityTooLarge: if the body is larger than max_size
+    """
+    chunks = []
+    size = 0
+    async for chunk in request.content.iter_any():
+        size += len(chunk)
+        if 0 < max_size < size:
+            raise web.HTTPRequestEntityTooLarge(max_size=max_size, actual_size=size)
+        chunks.append(chunk)
+    return b''.join(chunks)
+
+
+def decode(body: bytes, media_type: str) -> Tuple[object, str]:
+    """
+    Decodes a request body in the given media type, as returned by request_media_type().
+    :return: tuple (decoded body, media type of the body)
+    """
+    if media_type == msgpack_media_type:
+        return _loads_msgpack(body), media_type
+    if media_type == arrow_media_type:
+        return _loads_arrow(body), media_type
+    return loads_json(body), media_type
+
+
+def encode(body: dict, media_type: str) -> bytes:
+    if media_type == msgpack_media_type:
+        return msgpack.packb(body, use_bin_type=True)
+    if media_type == arrow_media_type:
+        return _dumps_arrow(body)
+    return orjson.dumps(body)
+
+
+def response(body: dict, media_type: str = json_media_type, status: int = 200) -> web.Response:
+    """
+    :return: a response with the given body encoded in the given media type
+    """
+    return web.Response(body=encode(body, media_type), status=status, content_type=media_type)
+
+
+class _BufferedWriter:
+    """
+    Groups the small pieces of a streamed body into writes of about buffer_size bytes,
+    so that each HTTP chunk isn't framed and sent on its own.
+    """
+
+    def __init__(self, response: web.StreamResponse, buffer_size: int):
+        self._response = response
+        self._buffer_size = buffer_size
+        self._buffer = bytearray()
+
+    async def write(self, data: bytes):
+        self._buffer += data
+        if len(self._buffer) >= self._buffer_size:
+            await self.flush()
+
+    async def flush(self):
+        if self._buffer:
+            await self._response.write(bytes(self._buffer))
+            self._buffer.clear()
+
+
+async def _write_json(writer: _BufferedWriter, value, chunk_size: int):
+    if isinstance(value, dict):
+        separator = b'{'
+        for key, item in value.items():
+            await writer.write(separator + orjson.dumps(key) + b':')
+            await _write_json(writer, item, chunk_size)
+            separator = b','
+        await writer.write(b'}' if separator == b',' else b'{}')
+    elif isinstance(value, list) and len(value) > chunk_size:
+        await _write_json_array(writer, (value[i:i + chunk_size] for i in range(0, len(value), chunk_size)))
+    elif isinstance(value, Iterator):
+        await _write_json_array(writer, value)
+    else:
+        await writer.write(orjson.dumps(value))
+
+
+async def _write_json_array(writer: _BufferedWriter, chunks: Iterator[list]):
+    separator = b'['
+    for chunk in chunks:
+        if chunk:
+            # the brackets of each serialized chunk are replaced by the separators of the whole array
+            await writer.write(separator + orjson.dumps(chunk)[1:-1])
+            separator = b','
+    await writer.write(b']' if separator == b',' else b'[]')
+
+
+async def stream_json(request: web_request.Request, body: dict, chunk_size: int,
+                      buffer_size: int = 65536) -> web.StreamResponse:
+    """
+    Sends a JSON body with chunked transfer encoding, writing its long arrays chunk by chunk.
+    Neither the whole serialized body nor, for the arrays given as iterators of lists, the whole array is ever
+    held in memory, and the first bytes are sent before the whole body has been serialized.
+    :param body: JSON serializable dictionary, whose arrays may also be given as iterators of lists
+    :param chunk_size: number of items of the long lists that are serialized at a time
+    :param buffer_size: approximate size in bytes of each write
+    """
+    response = web.StreamResponse(headers={'Content-Type': json_media_type})
+    response.enable_chunked_encoding()
+    await response.prepare(request)
+
+    writer = _BufferedWriter(response, buffer_size)
+    await _write_json(writer, body, chunk_size)
+    await writer.flush()
+    await response.write_eof()
+    return response
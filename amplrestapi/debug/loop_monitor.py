@@ -0,0 +1,89 @@
+from time import perf_counter
+from typing import Dict, List, Union
+import asyncio
+
+# timer of the request whose handler is running a step on the event loop, if any
+_running_timer: 'BlockingTimer' = None
+
+
+class BlockingTimer:
+    """
+    Awaitable that runs the coroutine of a request handler and measures how long it blocks the event loop,
+    i.e. the time spent in each of its steps between two awaits. Meanwhile no other request makes progress.
+    The durations of the stages observed during its steps, e.g. by amplrestapi.metrics.observe_stage,
+    are recorded as well, so that a request that blocks the event loop can be logged with its breakdown.
+    """
+
+    def __init__(self, coroutine):
+        self._coroutine = coroutine
+        self.blocking_time: float = 0.0
+        self.longest_step: float = 0.0
+        self.n_steps: int = 0
+        self.stages: Dict[str, float] = {}
+
+    def __await__(self):
+        global _running_timer
+        steps = self._coroutine.__await__()
+        value, error = None, None
+        while True:
+            started_at = perf_counter()
+            _running_timer = self
+            try:
+                future = steps.send(value) if error is None else steps.throw(error)
+            except StopIteration as stop:
+                return stop.value
+            finally:
+                _running_timer = None
+                self._record_step(perf_counter() - started_at)
+
+            # the awaited future, or the exception that interrupted the wait, e.g. a cancellation,
+            # is handed over to the handler coroutine in its next step
+            try:
+                value, error = (yield future), None
+            except GeneratorExit:
+                steps.close()
+                raise
+            except BaseException as ex:
+                value, error = None, ex
+
+    def _record_step(self, duration: float):
+        self.blocking_time += duration
+        self.longest_step = max(self.longest_step, duration)
+        self.n_steps += 1
+
+
+def running_stages() -> Union[Dict[str, float], None]:
+    """
+    :return: the stage durations of the request whose handler is running on the event loop,
+             or None if it isn't timed by a BlockingTimer
+    """
+    return _running_timer.stages if _running_timer is not None else None
+
+
+async def measure_loop_lag(interval: float, duration: float) -> List[float]:
+    """
+    Measures the lag of the event loop, i.e. how late a callback scheduled every `interval` seconds runs,
+    which is how long requests wait before the event loop resumes them.
+    :param duration: seconds of the measurement
+    :return: the lags in seconds
+    """
+    lags = []
+    ends_at = perf_counter() + duration
+    while perf_counter() < ends_at:
+        started_at = perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(max(perf_counter() - started_at - interval, 0.0))
+    return lags
+
+
+def summarize_lags(lags: List[float]) -> dict:
+    """
+    :return: dictionary with the number of measures and the average, 99th percentile and maximum lag in seconds
+    """
+    sorted_lags = sorted(lags) or [0.0]
+    return {
+        'measures': len(lags),
+        'avg': sum(sorted_lags) / len(sorted_lags),
+        'p99': sorted_lags[min(int(len(sorted_lags) * 0.99), len(sorted_lags) - 1)],
+        'max': sorted_lags[-1],
+    }
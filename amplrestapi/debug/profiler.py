@@ -0,0 +1,77 @@
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, List
+import os
+import sys
+import threading
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler of the threads of the server process, that can be started and stopped while the server runs.
+    A background thread samples the Python stack of every other thread at a fixed interval, so its overhead doesn't
+    depend on the profiled code. Each sample is counted as a collapsed stack, i.e. the thread name followed by its
+    frames from the outermost to the innermost, separated by semicolons, which is the input of flamegraph tools.
+    The AMPL sessions run in worker processes, so they only appear as the pool threads that wait for their calls.
+    """
+
+    def __init__(self, interval: float):
+        """
+        :param interval: seconds between two samples
+        """
+        self._interval = interval
+        self._stacks: Dict[str, int] = Counter()
+        self._n_samples: int = 0
+        self._stopped = threading.Event()
+        self._thread: threading.Thread = None
+
+    @property
+    def n_samples(self) -> int:
+        return self._n_samples
+
+    def start(self):
+        self._thread = threading.Thread(target=self._sample, name='sampling-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _sample(self):
+        own_thread_id = threading.get_ident()
+        while not self._stopped.wait(self._interval):
+            thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != own_thread_id:
+                    self._stacks[_collapse(thread_names.get(thread_id, str(thread_id)), frame)] += 1
+            self._n_samples += 1
+
+    def collapsed(self) -> List[str]:
+        """
+        :return: lines made of a collapsed stack and of the number of samples it was seen in, the most frequent first
+        """
+        return [f'{stack} {count}' for stack, count in sorted(self._stacks.items(), key=lambda item: -item[1])]
+
+
+def _collapse(thread_name: str, frame) -> str:
+    """
+    :return: the collapsed stack of a thread, whose frames are the functions with their file and first line,
+             so that the samples taken on different lines of the same function are merged
+    """
+    frames = []
+    while frame is not None:
+        code = frame.f_code
+        frames.append(f'{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})')
+        frame = frame.f_back
+    frames.append(thread_name.replace(';', ':'))
+    return ';'.join(reversed(frames))
+
+
+@lru_cache(maxsize=None)
+def _short_path(filename: str) -> str:
+    """
+    :return: the path of a source file relative to the longest entry of sys.path that contains it
+    """
+    roots = [root for root in sys.path if root and filename.startswith(os.path.join(root, ''))]
+    return os.path.relpath(filename, max(roots, key=len)) if roots else filename
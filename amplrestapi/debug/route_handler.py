@@ -0,0 +1,94 @@
+from aiohttp import web, web_request
+from typing import Dict
+import hmac
+import logging
+
+from amplrestapi.debug.loop_monitor import measure_loop_lag, summarize_lags
+from amplrestapi.debug.profiler import SamplingProfiler
+from amplrestapi.http_validation_error import HTTPValidationError
+from amplwrapper.ampl_pool import AMPLPool
+from config.config import Config
+
+
+class ProfileRouteHandler:
+    """
+    ProfileRouteHandler profiles the live server on demand, for a requested number of seconds, without restarting it.
+    It samples the Python stacks of the threads of the server process and measures the lag of the event loop
+    and the time spent by the AMPL sessions in their worker processes meanwhile.
+    The route is only enabled if a token is configured, and every request must send it as a bearer token.
+    """
+
+    def __init__(self, pools: Dict[str, AMPLPool], token: str):
+        """
+        :param pools: pools of AMPL sessions, by the name of the model they solve
+        :param token: token that authorizes the requests, if it's empty the route is disabled
+        """
+        self._pools = pools
+        self._token = token
+        self._running: bool = False
+
+    async def run(self, request: web_request.Request):
+        self._authorize(request)
+        duration = self._query_number(request, 'duration', default=10, maximum=Config.debug_max_duration())
+        interval = self._query_number(request, 'interval', default=0.005, maximum=1)
+        output_format = request.query.get('format', 'collapsed')
+        if output_format not in ('collapsed', 'json'):
+            raise HTTPValidationError('The `format` query parameter must be either `collapsed` or `json`')
+
+        # concurrent profiles would sample each other
+        if self._running:
+            raise web.HTTPConflict(reason='Another profile is already running')
+        self._running = True
+
+        solve_times = {name: pool.total_solve_time for name, pool in self._pools.items()}
+        profiler = SamplingProfiler(interval)
+        profiler.start()
+        try:
+            lags = await measure_loop_lag(interval, duration)
+        finally:
+            profiler.stop()
+            self._running = False
+
+        summary = {
+            'duration': duration,
+            'interval': interval,
+            'samples': profiler.n_samples,
+            'loop_lag': summarize_lags(lags),
+            # seconds spent by the AMPL sessions in the requests they completed during the profile
+            'ampl_solve_time': {name: pool.total_solve_time - solve_times[name] for name, pool in self._pools.items()},
+        }
+        logging.log(logging.INFO, f'Profiled the server for {duration}s: {summary}')
+
+        if output_format == 'json':
+            return web.json_response(dict(summary, stacks=profiler.collapsed()))
+        return web.Response(text='\n'.join(profiler.collapsed()) + '\n', content_type='text/plain')
+
+    def _authorize(self, request: web_request.Request):
+        """
+        :raise web.HTTPNotFound: if the route is disabled
+        :raise web.HTTPUnauthorized: if the request doesn't send the configured bearer token
+        """
+        if not self._token:
+            raise web.HTTPNotFound(reason='The profiling route is disabled')
+        scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+        if scheme.lower() != 'bearer' or not hmac.compare_digest(token.encode(), self._token.encode()):
+            raise web.HTTPUnauthorized(reason='A valid bearer token is required',
+                                       headers={'WWW-Authenticate': 'Bearer'})
+
+    @staticmethod
+    def _query_number(request: web_request.Request, name: str, default: float, maximum: float) -> float:
+        """
+        :return: the value of a query parameter that must be a positive number of seconds up to `maximum`
+        :raise HTTPValidationError: if it isn't
+        """
+        value = request.query.get(name)
+        if value is None:
+            return default
+        try:
+            seconds = float(value)
+        except ValueError:
+            seconds = 0.0
+        if not 0 < seconds <= maximum:
+            raise HTTPValidationError(f'The `{name}` query parameter must be a positive number of seconds '
+                                      f'up to {maximum}')
+        return seconds
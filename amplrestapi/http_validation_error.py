@@ -4,5 +4,10 @@ from aiohttp.web_exceptions import HTTPClientError
 class HTTPValidationError(HTTPClientError):
     status_code = 422
 
-    def __init__(self, reason: str):
+    def __init__(self, reason: str, path: str = None):
+        """
+        :param reason: description of the validation error
+        :param path: JSON pointer to the invalid value in the request body, if any
+        """
         super().__init__(reason=reason)
+        self.path = path
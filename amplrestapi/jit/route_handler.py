@@ -1,58 +1,397 @@
 from os import path
+from time import time
 from aiohttp import web, web_request
-from asyncio import Lock
+import asyncio
+import copy
 import json
+import logging
+from typing import Dict
 
-from ampljit import model as jit_model
+from ampljit import decomposition, model as jit_model, utils as jit_utils
+from ampljit.backends import SolverBackend
+from ampljit.result_cache import ResultCache
+from amplrestapi import codecs, metrics
 from amplrestapi.abstract_ampl_routes_handler import AbstractAMPLRoutesHandler
 from amplrestapi.http_validation_error import HTTPValidationError
-from amplrestapi.jit.validate import validate
-from amplwrapper.ampl_wrapper import AMPLWrapper
+from amplrestapi.single_flight import SingleFlight
+from amplrestapi.jit.validate import compile_validator
+from amplwrapper.ampl_pool import AMPLPoolFullError, AMPLPoolTimeoutError
+from config.config import Config
 
 json_schema: dict
 with open(path.join(path.dirname(__file__), 'route_schema.json'), 'r') as json_schema_file:
     json_schema = json.load(json_schema_file)
 
+# the JSON schema is compiled once, together with the checks on the lengths and on the order of the lists
+validate_json = compile_validator(json_schema)
+
+# binary formats send the expected finish datetimes as integer minutes since the Unix epoch
+binary_json_schema = copy.deepcopy(json_schema)
+binary_json_schema['definitions']['expected_finish']['items'] = {'type': 'integer'}
+validate_binary = compile_validator(binary_json_schema)
+
+# header with the deadline of a request in seconds, as an alternative to the `deadline` property of the instance
+deadline_header = 'X-Deadline'
+
+# values of the `profile` query parameter that turn on the profile of a request
+profile_query_values = {'1', 'true'}
+
 
 class JITRouteHandler(AbstractAMPLRoutesHandler):
     """
     JITRoutesHandler exposes a REST interface for the dynamic Just-in-time computational problem.
     """
 
-    def __init__(self, ampl: AMPLWrapper, solver: jit_model.solve):
+    def __init__(self, backends: Dict[str, SolverBackend], cache: ResultCache, default_solver_name: str = 'ampl'):
+        """
+        :param backends: solver backends of the JIT problem, by name
+        :param cache: cache of the results of the already solved canonical JIT instances
+        :param default_solver_name: name of the backend used when the request doesn't specify one
+        """
+        super().__init__(backends)
+        self._default_solver_name = default_solver_name
+        self._cache = cache
+        self._single_flight = SingleFlight()
+        self._warm_up_task: asyncio.Future = None
+
+    @property
+    def single_flight(self) -> SingleFlight:
+        return self._single_flight
+
+    @property
+    def default_solver_name(self) -> str:
+        return self._default_solver_name
+
+    @property
+    def warm(self) -> bool:
         """
-        :param ampl: AMPLWrapper instance
-        :param solver: Function that solves the JIT problem using AMPL
+        :return: whether every solver backend has been warmed up successfully
         """
-        super().__init__(ampl)
-        self._solver = solver
-        self._lock = Lock()
+        task = self._warm_up_task
+        return task is not None and task.done() and not task.cancelled() and task.exception() is None
+
+    def on_startup(self, warm_up: bool = True):
+        """
+        Starts warming up the solver backends in the background, so that the server accepts connections meanwhile.
+        :param warm_up: if False, the backends are considered warm right away
+        """
+        self._warm_up_task = asyncio.ensure_future(self._warm_up() if warm_up else asyncio.sleep(0))
+
+    async def _warm_up(self):
+        started_at = time()
+        try:
+            await asyncio.gather(*[backend.warm_up() for backend in self.backends.values()])
+        except Exception as ex:
+            logging.log(logging.ERROR, f'The solver backends failed to warm up: {ex}')
+            raise
+        logging.log(logging.INFO, f'The solver backends warmed up in {time() - started_at:.2f}s')
 
     async def run(self, request: web_request.Request):
-        # read the input data from the POST body and check if it's written in a parseable format
-        input_data = await request.json()
+        # the deadline of the request runs from its arrival
+        deadline = self.request_deadline(request)
+
+        # with ?profile=1 the durations of the stages are returned in the meta of the response
+        profile = {} if request.query.get('profile') in profile_query_values else None
+
+        # read the input data from the POST body and check if it's written in a parseable format.
+        # The body may be either JSON, MessagePack or Arrow IPC, according to its Content-Type
+        body = await codecs.read_body(request, max_size=Config.client_max_size())
+        with metrics.observe_stage('parse', profile):
+            input_data, media_type = codecs.decode(body, codecs.request_media_type(request))
+        binary = codecs.is_binary(media_type)
+
+        # only the decoded input is kept while the problem is solved
+        del body
 
         # verify that the given data is semantically valid
-        is_valid, err_message = validate(json=input_data, schema=json_schema)
-        if not is_valid:
-            raise HTTPValidationError(err_message)
+        with metrics.observe_stage('validate', profile):
+            self.validate_instance(input_data, binary)
+
+        # large JSON responses are streamed, converting their datetimes chunk by chunk
+        output_media_type = codecs.response_media_type(request, default=media_type)
+        min_stream_batches = Config.stream_min_batches()
+        chunk_size = None
+        if output_media_type == codecs.json_media_type and 0 < min_stream_batches <= input_data['n_batches']:
+            chunk_size = Config.stream_chunk_size()
+
+        json_response = await self.solve_instance(input_data, binary,
+                                                  epoch_minutes=codecs.is_binary(output_media_type),
+                                                  deadline=deadline, profile=profile, chunk_size=chunk_size)
+
+        # The computation results has been gathered and can be returned to the user.
+        with metrics.observe_stage('serialization'):
+            if chunk_size is not None:
+                return await codecs.stream_json(request, json_response, chunk_size)
+            return codecs.response(json_response, output_media_type)
+
+    async def run_batch(self, request: web_request.Request):
+        """
+        Solves a JSON array of JIT instances, streaming each result as soon as it's ready.
+        The response is made of newline delimited JSON objects (NDJSON), one for each instance, in completion order.
+        Each object contains the `index` of the instance in the request array and either its `data` and `meta`
+        or its `error`, so that an invalid or failed instance doesn't fail the whole batch.
+        Every instance is validated before any is solved, and the errors of the invalid ones are streamed first.
+        The X-Deadline header applies to every instance, which may also set their own `deadline`.
+        """
+        deadline = self.request_deadline(request)
+        input_batch = codecs.loads_json(await codecs.read_body(request, max_size=Config.client_max_size()))
+
+        max_batch_size = Config.batch_max_size()
+        if not isinstance(input_batch, list) or len(input_batch) == 0:
+            raise HTTPValidationError('The input must be a non-empty array of JIT instances')
+        if len(input_batch) > max_batch_size:
+            raise HTTPValidationError(f'The input array can\'t contain more than {max_batch_size} JIT instances')
+
+        # the instances are validated together, so that an invalid one is reported right away
+        # instead of after the solves of the instances before it
+        invalid_responses = []
+        valid_items = []
+        for index, input_data in enumerate(input_batch):
+            try:
+                self.validate_instance(input_data)
+            except HTTPValidationError as ex:
+                invalid_responses.append({'error': {'status': ex.status, 'details': ex.reason, 'path': ex.path},
+                                          'index': index})
+            else:
+                valid_items.append((index, input_data))
+
+        # the instances are solved a few at a time, so that a large batch doesn't fill the queue of the AMPL sessions
+        # and get its own instances shed with 429 errors. Twice the parallelism of the solvers keeps them busy
+        semaphore = asyncio.Semaphore(2 * max(backend.parallelism for backend in self.backends.values()))
+
+        async def solve_item(index: int, input_data: dict) -> dict:
+            try:
+                async with semaphore:
+                    item_response = await self.solve_instance(input_data, deadline=deadline)
+            except HTTPValidationError as ex:
+                item_response = {'error': {'status': ex.status, 'details': ex.reason, 'path': ex.path}}
+            except web.HTTPException as ex:
+                item_response = {'error': {'status': ex.status, 'details': ex.reason}}
+            except Exception as ex:
+                logging.log(logging.ERROR, f'Batch item {index} failed: {ex}')
+                item_response = {'error': {'status': 500, 'details': str(ex)}}
+            item_response['index'] = index
+            return item_response
+
+        tasks = [asyncio.ensure_future(solve_item(index, input_data)) for index, input_data in valid_items]
 
+        response = web.StreamResponse(headers={'Content-Type': 'application/x-ndjson'})
+        await response.prepare(request)
+        try:
+            for item_response in invalid_responses:
+                await response.write(codecs.dumps_json(item_response) + b'\n')
+            for next_completed in asyncio.as_completed(tasks):
+                item_response = await next_completed
+                await response.write(codecs.dumps_json(item_response) + b'\n')
+        finally:
+            # if the client went away, the instances that haven't been solved yet are dropped
+            for task in tasks:
+                task.cancel()
+
+        await response.write_eof()
+        return response
+
+    @staticmethod
+    def request_deadline(request: web_request.Request) -> float:
+        """
+        :return: UNIX time of the deadline given in seconds by the X-Deadline header, or None if it's missing
+        :raise web.HTTPBadRequest: if the header isn't a positive number of seconds
+        """
+        value = request.headers.get(deadline_header)
+        if value is None:
+            return None
+        try:
+            seconds = float(value)
+        except ValueError:
+            seconds = 0.0
+        if not 0 < seconds < float('inf'):
+            raise web.HTTPBadRequest(reason=f'The {deadline_header} header must be a positive number of seconds')
+        return time() + seconds
+
+    @staticmethod
+    def validate_instance(input_data: dict, binary: bool = False):
+        """
+        :param binary: whether the input data has been read from a binary format
+        :raise HTTPValidationError: if the given input data isn't a semantically valid JIT instance
+        """
+        issue = validate_binary(input_data) if binary else validate_json(input_data)
+        if issue is not None:
+            raise HTTPValidationError(issue.message, path=issue.pointer)
+
+    async def solve_instance(self, input_data: dict, binary: bool = False, epoch_minutes: bool = False,
+                             deadline: float = None, profile: dict = None, chunk_size: int = None,
+                             background: bool = False) -> dict:
+        """
+        Solves an already validated JIT instance, using the result cache and the in-flight solves when possible.
+        The solver is asked to stop shortly before the deadline and to return the best schedule found so far.
+        If it doesn't, e.g. because AMPL itself is stuck, the solve is interrupted when the deadline passes.
+        :param binary: whether the expected finish datetimes are minutes since the Unix epoch instead of strings
+        :param epoch_minutes: whether the start datetimes of the response are minutes since the Unix epoch
+        :param deadline: UNIX time by which the response must be ready. The `deadline` property of the instance,
+                         in seconds from now, or the default deadline of the configuration may set an earlier one
+        :param profile: durations of the stages of the request measured so far, by stage name. If it's given,
+                        the instance is solved again even if its result is cached, with the timing statistics
+                        of the solver turned on, and the response meta contains the whole profile
+        :param chunk_size: if given, the start datetimes of the response are converted lazily, chunk by chunk,
+                           as they're written by amplrestapi.codecs.stream_json()
+        :param background: whether the instance is solved by a background job, which waits for an AMPL session
+                           as long as needed instead of being shed
+        :return: the JSON response of the instance
+        :raise web.HTTPGatewayTimeout: if the problem wasn't solved before its deadline
+        """
         # extract variables from the input data
         n_batches: int = input_data['n_batches']
         wrong_time_fee: int = input_data['wrong_time_fee']
         duration_lst: list = input_data['duration']
         expected_finish_lst: list = input_data['expected_finish']
+        warm_start_key: str = input_data.get('warm_start_key')
+        solver_name: str = input_data.get('solver', self._default_solver_name)
 
-        # solve the problem in a critical section.
-        # self.ampl is a shared resource whose access is regulated by an asyncio.Lock.
-        async with self._lock:
-            json_response = self._solver(ampl=self.ampl, n_batches=n_batches, wrong_time_fee=wrong_time_fee,
-                                         duration_lst=duration_lst,
-                                         expected_finish_datetime_str_lst=expected_finish_lst)
+        deadline_seconds = input_data.get('deadline') or Config.deadline_default()
+        if deadline_seconds > 0:
+            deadline = min(deadline or float('inf'), time() + deadline_seconds)
 
-        # This block is outside of the previous critical section.
-        # The computation results has been gathered and can be returned to the user.
-        return web.json_response(json_response)
+        try:
+            with metrics.observe_stage('preprocess', profile):
+                if binary:
+                    preprocess = jit_model.preprocess_epoch_minutes
+                else:
+                    preprocess = jit_model.preprocess
+                epoch, utc_offset, expected_finish_minutes_lst = preprocess(expected_finish_lst)
+        except ValueError as ex:
+            raise HTTPValidationError(f'The values in the `expected_finish` list must be valid datetimes: {ex}')
+
+        # instances shifted in time share the same canonical form, hence the same cached result
+        canonical_key, first_minutes = jit_utils.canonical_instance(wrong_time_fee, duration_lst,
+                                                                    expected_finish_minutes_lst)
+        # different solvers may find different optimal solutions, so they don't share results
+        result_key = (solver_name, canonical_key)
+        result = self._cache.get(result_key) if profile is None else None
+        cached = result is not None
+        coalesced = False
+
+        if not cached:
+            # the solver stops early enough to leave time for reading its solution and sending the response
+            solver_deadline = None if deadline is None else deadline - Config.deadline_margin()
+
+            async def solve_and_cache():
+                _, _, relative_finish_lst = canonical_key
+                solve_result = await self.solve_canonical(solver_name, n_batches=n_batches,
+                                                          wrong_time_fee=wrong_time_fee, duration_lst=duration_lst,
+                                                          expected_finish_lst=list(relative_finish_lst),
+                                                          warm_start_key=warm_start_key, deadline=solver_deadline,
+                                                          profile=profile is not None, background=background)
+                # time limited schedules aren't optimal, so they must not be served to requests without a deadline
+                if solve_result.get('status', 'optimal') == 'optimal':
+                    self._cache.put(result_key, solve_result)
+                return solve_result
+
+            async def solve_alone():
+                return await solve_and_cache(), False
+
+            if profile is None:
+                # identical instances that are already being solved share the same solve,
+                # but requests never wait for a solve that may stop before their own deadline.
+                # Background jobs don't share the solves of the other requests, which may be shed by the pool
+                flight_key = (result_key, background)
+                solve = self._single_flight.do(flight_key, solve_and_cache, deadline=deadline)
+            else:
+                # a profiled instance is solved on its own, so that the profile describes its own solve
+                solve = solve_alone()
+
+            timeout = None if deadline is None else max(deadline - time(), 0.0)
+            try:
+                result, coalesced = await asyncio.wait_for(solve, timeout=timeout)
+            except asyncio.TimeoutError:
+                # the solve is interrupted unless other requests are still waiting for it
+                raise web.HTTPGatewayTimeout(reason='The problem wasn\'t solved before its deadline')
+
+        response_profile = None
+        if profile is not None:
+            # the stages of the solver are added to the ones of the server process, followed by the breakdown
+            # of the AMPL translation and of the solver, for the backends that report them
+            response_profile = {'stages': dict(profile, **result.get('stages', {}))}
+            response_profile.update(result.pop('profile', {}))
+
+        # the canonical result is shifted back to the datetimes given by the caller
+        return jit_model.build_response(result, epoch, utc_offset, start_minutes_offset=first_minutes,
+                                        cached=cached, coalesced=coalesced, epoch_minutes=epoch_minutes,
+                                        profile=response_profile, chunk_size=chunk_size)
+
+    async def solve_canonical(self, solver_name: str, n_batches: int, wrong_time_fee: int, duration_lst: list,
+                              expected_finish_lst: list, warm_start_key: str = None, deadline: float = None,
+                              profile: bool = False, background: bool = False) -> dict:
+        """
+        Solves a canonical JIT instance with the given solver backend, without the result cache.
+        Large instances are split into independent blocks, which are solved in parallel, unless they're
+        warm started: the basis of a warm start covers the whole instance.
+        :param background: whether the instance is solved by a background job, which waits for an AMPL session
+                           as long as needed instead of being shed
+        :return: the result of the solver, as returned by ampljit.model.solve_canonical()
+        :raise HTTPValidationError: if the given solver isn't available on this server
+        :raise web.HTTPTooManyRequests: if too many problems are already waiting for an AMPL session
+        :raise web.HTTPServiceUnavailable: if the problem waited too long for an AMPL session
+        """
+        backend = self.backends.get(solver_name)
+        if backend is None:
+            raise HTTPValidationError(f'The `{solver_name}` solver isn\'t available on this server', path='/solver')
+
+        blocks = [(0, n_batches)]
+        min_batches = Config.decomposition_min_batches()
+        if 0 < min_batches <= n_batches and warm_start_key is None:
+            blocks = decomposition.independent_blocks(duration_lst, expected_finish_lst,
+                                                      max_blocks=backend.parallelism,
+                                                      min_block_size=Config.decomposition_min_block_size())
+
+        try:
+            if len(blocks) == 1:
+                result = await backend.solve(n_batches=n_batches, wrong_time_fee=wrong_time_fee,
+                                             duration_lst=duration_lst, expected_finish_lst=expected_finish_lst,
+                                             warm_start_key=warm_start_key, deadline=deadline, profile=profile,
+                                             background=background)
+            else:
+                result = await self._solve_blocks(backend, blocks, wrong_time_fee=wrong_time_fee,
+                                                  duration_lst=duration_lst, expected_finish_lst=expected_finish_lst,
+                                                  deadline=deadline, profile=profile, background=background)
+        except AMPLPoolFullError as ex:
+            # the server is saturated: the request is shed immediately, instead of waiting until the client times out
+            raise web.HTTPTooManyRequests(reason=str(ex), headers={'Retry-After': str(ex.retry_after)})
+        except AMPLPoolTimeoutError as ex:
+            raise web.HTTPServiceUnavailable(reason=str(ex), headers={'Retry-After': str(ex.retry_after)})
+        metrics.observe_solve(result)
+        return result
+
+    @staticmethod
+    async def _solve_blocks(backend: SolverBackend, blocks: list, wrong_time_fee: int, duration_lst: list,
+                            expected_finish_lst: list, deadline: float = None, profile: bool = False,
+                            background: bool = False) -> dict:
+        """
+        Solves the independent blocks of an instance in parallel and merges their results.
+        :param blocks: list of the (start, end) indexes of each block, as returned by
+                       ampljit.decomposition.independent_blocks()
+        :return: the result of the whole instance, whose computation duration is the elapsed time
+        """
+        started_at = time()
+        tasks = [asyncio.ensure_future(backend.solve(n_batches=end - start, wrong_time_fee=wrong_time_fee,
+                                                     duration_lst=duration_lst[start:end],
+                                                     expected_finish_lst=expected_finish_lst[start:end],
+                                                     deadline=deadline, profile=profile, background=background))
+                 for start, end in blocks]
+        try:
+            results = await asyncio.gather(*tasks)
+        finally:
+            # if a block failed or the request has been cancelled, the other blocks aren't needed anymore
+            for task in tasks:
+                task.cancel()
+
+        result = decomposition.merge_results(results, wrong_time_fee=wrong_time_fee, duration_lst=duration_lst,
+                                             expected_finish_lst=expected_finish_lst)
+        result['computation_duration'] = time() - started_at
+        result['solver'] = backend.name
+        return result
 
     def on_exit(self):
-        self.ampl.close()
+        if self._warm_up_task is not None:
+            self._warm_up_task.cancel()
+        for backend in self.backends.values():
+            backend.close()
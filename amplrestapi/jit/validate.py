@@ -1,34 +1,193 @@
-import logging
-from typing import Tuple
-from jsonschema import validate as validate_json, ValidationError
-from typing import Union
+import re
+from typing import Callable, List, Union
 
-from .utils import is_asc_sorted
+# UTC offset at the end of an ISO8601 datetime string
+utc_offset_regex = re.compile(r'(Z|[+-]\d{2}:?\d{2})$')
 
+# Python expressions that check whether the value `v` has the given JSON schema type
+type_checks = {
+    'object': 'type(v) is dict',
+    'array': 'type(v) is list',
+    'string': 'type(v) is str',
+    'integer': '(type(v) is int or (type(v) is float and v.is_integer()))',
+    'number': '(type(v) is int or type(v) is float)',
+    'boolean': 'type(v) is bool',
+    'null': 'v is None',
+}
 
-def validate(json: dict, schema: str) -> Tuple[bool, Union[str, None]]:
+# keywords that don't constrain the instance
+annotation_keywords = {'$schema', '$id', 'definitions', 'title', 'description', 'examples', 'default', 'format'}
+
+
+class ValidationIssue:
+    """
+    Validation error of a JSON instance.
+    """
+
+    def __init__(self, path: list, message: str):
+        """
+        :param path: path of the invalid value in the instance, as a list of property names and array indexes
+        :param message: description of the error
+        """
+        self.path = path
+        self.message = message
+
+    @property
+    def pointer(self) -> str:
+        """
+        :return: path of the invalid value as a JSON pointer, e.g. '/duration/3'
+        """
+        return ''.join(f'/{segment}' for segment in self.path)
+
+
+class SchemaCompilationError(Exception):
     """
-    Validates the given json string against the given JSON schema as well as the logic constraints
-    in the input data.
-    :param json: JSON string whose structure must be validated
-    :param schema: JSON schema that defines what must be validated
-    :return: A tuple composed of 2 elements (bool, str | None).
-             The first element is True if and only if the validation had success.
-             The second element is a string that contains the validation error
-             message, if any was thrown.
+    Raised when a JSON schema uses a keyword that isn't supported by the validator compiler.
     """
-    try:
-        # validate the given JSON against the validation JSON schema
-        validate_json(instance=json, schema=schema)
+    pass
+
+
+class _SchemaCompiler:
+    """
+    Generates the source code of a Python function that validates a JSON instance against a JSON schema.
+    It supports the subset of draft-07 used by the route schemas, plus two extension keywords:
+    - `x-strictly-ascending` (array): each item must be greater than the previous one.
+      For date-time strings with a UTC offset, string order isn't chronological order,
+      so the check is left to the datetime parser.
+    - `x-lengths-equal` (object): maps an integer property to the list of array properties whose
+      length must equal its value.
+    """
+
+    def __init__(self, schema: dict):
+        self._root = schema
+        self._lines: List[str] = []
+        self._n_vars = 0
+
+    def compile(self) -> str:
+        self._emit('def validate(instance):', 0)
+        self._emit_schema(self._root, 'instance', '()', 1)
+        self._emit('return None', 1)
+        return '\n'.join(self._lines)
+
+    def _emit(self, line: str, indent: int):
+        self._lines.append('    ' * indent + line)
 
-        # the length of `duration` and `expected_finish` must be equal to the value of `n_batches`
-        if len(json['duration']) != len(json['expected_finish']) or len(json['duration']) != json['n_batches']:
-            return False, 'The length of the `duration` and `expected_finish` lists must equal the value of `n_batches`'
+    def _new_var(self, prefix: str) -> str:
+        self._n_vars += 1
+        return f'{prefix}{self._n_vars}'
 
-        if not is_asc_sorted(json['expected_finish']):
-            return False, 'The values in the `expected_finish` list must be ascendentally sorted'
+    def _resolve(self, schema: dict) -> dict:
+        while '$ref' in schema:
+            ref = schema['$ref']
+            if not ref.startswith('#/'):
+                raise SchemaCompilationError(f'Only local references are supported: {ref}')
+            schema = self._root
+            for segment in ref[2:].split('/'):
+                schema = schema[segment]
+        return schema
 
-        return True, None
-    except ValidationError as err:
-        logging.log(logging.ERROR, err)
-        return False, err
+    def _error(self, path: str, message: str, indent: int):
+        self._emit(f'return ValidationIssue(list({path}), f{message!r})', indent)
+
+    def _emit_schema(self, schema: dict, var: str, path: str, indent: int, name: str = None):
+        schema = self._resolve(schema)
+        supported = annotation_keywords | {'type', 'properties', 'required', 'enum', 'minimum', 'maximum',
+                                           'minLength', 'maxLength', 'minItems', 'maxItems', 'items',
+                                           'x-strictly-ascending', 'x-lengths-equal'}
+        unsupported = set(schema) - supported
+        if unsupported:
+            raise SchemaCompilationError(f'Unsupported JSON schema keywords: {sorted(unsupported)}')
+
+        self._emit(f'v = {var}', indent)
+        schema_type = schema.get('type')
+        if schema_type is not None:
+            self._emit(f'if not {type_checks[schema_type]}:', indent)
+            self._error(path, f"{{v!r:.64}} is not of type '{schema_type}'", indent + 1)
+
+        if 'enum' in schema:
+            self._emit(f'if v not in {schema["enum"]!r}:', indent)
+            self._error(path, f'{{v!r:.64}} is not one of {schema["enum"]!r}', indent + 1)
+        if 'minimum' in schema:
+            self._emit(f'if v < {schema["minimum"]!r}:', indent)
+            self._error(path, f'{{v!r}} is less than the minimum of {schema["minimum"]!r}', indent + 1)
+        if 'maximum' in schema:
+            self._emit(f'if v > {schema["maximum"]!r}:', indent)
+            self._error(path, f'{{v!r}} is greater than the maximum of {schema["maximum"]!r}', indent + 1)
+        if 'minLength' in schema:
+            self._emit(f'if len(v) < {schema["minLength"]}:', indent)
+            self._error(path, f'{{v!r:.64}} is too short', indent + 1)
+        if 'maxLength' in schema:
+            self._emit(f'if len(v) > {schema["maxLength"]}:', indent)
+            self._error(path, f'{{v!r:.64}} is too long', indent + 1)
+        if 'minItems' in schema:
+            self._emit(f'if len(v) < {schema["minItems"]}:', indent)
+            self._error(path, f'Array of {{len(v)}} items is too short, the minimum is {schema["minItems"]}',
+                        indent + 1)
+        if 'maxItems' in schema:
+            self._emit(f'if len(v) > {schema["maxItems"]}:', indent)
+            self._error(path, f'Array of {{len(v)}} items is too long, the maximum is {schema["maxItems"]}',
+                        indent + 1)
+
+        if 'items' in schema or schema.get('x-strictly-ascending'):
+            self._emit_items(schema, var, path, indent, name)
+
+        if 'required' in schema:
+            for required_name in schema['required']:
+                self._emit(f'if {required_name!r} not in v:', indent)
+                self._error(path, f"'{required_name}' is a required property", indent + 1)
+
+        for property_name, property_schema in schema.get('properties', {}).items():
+            property_var = self._new_var('p')
+            self._emit(f'if {property_name!r} in {var}:', indent)
+            self._emit(f'{property_var} = {var}[{property_name!r}]', indent + 1)
+            self._emit_schema(property_schema, property_var, f'{path} + ({property_name!r},)', indent + 1,
+                              property_name)
+
+        for length_name, array_names in schema.get('x-lengths-equal', {}).items():
+            names = ' and '.join(f'`{array_name}`' for array_name in array_names)
+            condition = ' or '.join(f'len({var}[{array_name!r}]) != {var}[{length_name!r}]'
+                                    for array_name in array_names)
+            self._emit(f'if {condition}:', indent)
+            self._error(path, f'The length of the {names} lists must equal the value of `{length_name}`', indent + 1)
+
+    def _emit_items(self, schema: dict, var: str, path: str, indent: int, name: str = None):
+        """
+        Emits a single loop over the items of an array, that validates each item and, if required,
+        checks that the items are strictly ascending.
+        """
+        items_var, index_var, previous_var = self._new_var('a'), self._new_var('i'), self._new_var('prev')
+        items_schema = self._resolve(schema.get('items', {}))
+        ascending = schema.get('x-strictly-ascending', False)
+
+        self._emit(f'{items_var} = {var}', indent)
+        if ascending:
+            check_var = self._new_var('ascending')
+            if items_schema.get('format') == 'date-time':
+                self._emit(f'{check_var} = len({items_var}) > 0 and type({items_var}[0]) is str and '
+                           f'utc_offset_regex.search({items_var}[0]) is None', indent)
+            else:
+                self._emit(f'{check_var} = True', indent)
+            self._emit(f'{previous_var} = None', indent)
+
+        self._emit(f'for {index_var}, item in enumerate({items_var}):', indent)
+        item_path = f'{path} + ({index_var},)'
+        self._emit_schema(items_schema, 'item', item_path, indent + 1)
+        if ascending:
+            self._emit(f'if {check_var} and {previous_var} is not None and not item > {previous_var}:', indent + 1)
+            self._error(item_path, f'The values in the `{name}` list must be ascendentally sorted', indent + 2)
+            self._emit(f'{previous_var} = item', indent + 1)
+        self._emit(f'v = {var}', indent)
+
+
+def compile_validator(schema: dict) -> Callable[[object], Union[ValidationIssue, None]]:
+    """
+    Compiles a JSON schema into a Python function that validates an instance in a single pass.
+    The function is generated once, so that validating a request costs no more than walking its payload.
+    :param schema: JSON schema, including the `x-strictly-ascending` and `x-lengths-equal` extension keywords
+    :return: function that returns the first ValidationIssue of the given instance, or None if it's valid
+    :raise SchemaCompilationError: if the schema uses an unsupported keyword
+    """
+    source = _SchemaCompiler(schema).compile()
+    namespace = {'ValidationIssue': ValidationIssue, 'utc_offset_regex': utc_offset_regex}
+    exec(compile(source, '<jit-validator>', 'exec'), namespace)
+    return namespace['validate']
@@ -0,0 +1,207 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from itertools import count
+from time import time
+from typing import Awaitable, Callable, Dict, List, Union
+from uuid import uuid4
+
+
+class JobQueueFullError(Exception):
+    """
+    Raised when a job is submitted while the queue already holds its maximum number of queued jobs.
+    """
+    pass
+
+
+class Job:
+    """
+    Job submitted to a JobQueue, with its status and, once finished, its result or its error.
+    """
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+
+    def __init__(self, payload: dict, priority: int, options: dict = None):
+        self.id: str = uuid4().hex
+        self.payload: dict = payload
+        self.options: dict = options or {}
+        self.priority: int = priority
+        self.status: str = Job.QUEUED
+        self.result: Union[dict, None] = None
+        self.error: Union[str, None] = None
+        self.submitted_at: float = time()
+        self.started_at: Union[float, None] = None
+        self.finished_at: Union[float, None] = None
+        self.task: Union[asyncio.Future, None] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (Job.DONE, Job.FAILED, Job.CANCELLED)
+
+    def to_dict(self) -> dict:
+        job_dict = {
+            'id': self.id,
+            'status': self.status,
+            'priority': self.priority,
+            'submitted_at': self.submitted_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+        if self.result is not None:
+            job_dict['result'] = self.result
+        if self.error is not None:
+            job_dict['error'] = self.error
+        return job_dict
+
+
+class JobQueue:
+    """
+    In-process priority queue of jobs, consumed by a fixed number of worker tasks.
+    Jobs with a lower priority value run first; jobs with the same priority run in submission order.
+    The number of queued jobs is bounded, and finished jobs are retained for a limited amount of time,
+    so that their results can be retrieved.
+    """
+
+    def __init__(self, run_job: Callable[..., Awaitable[dict]], n_workers: int, max_queued: int,
+                 max_retained: int, retention: float):
+        """
+        :param run_job: coroutine function that computes the result of a job from its payload,
+                        called as run_job(payload, **options) with the options given to JobQueue.submit()
+        :param n_workers: number of jobs that may run at the same time
+        :param max_queued: maximum number of jobs waiting to run
+        :param max_retained: maximum number of finished jobs that are retained
+        :param retention: seconds a finished job is retained for
+        """
+        self._run_job = run_job
+        self._n_workers = n_workers
+        self._max_queued = max_queued
+        self._max_retained = max_retained
+        self._retention = retention
+
+        self._jobs: Dict[str, Job] = {}
+        self._finished: OrderedDict = OrderedDict()
+        # cancelled jobs stay in the priority queue until a worker skips them, so the queued jobs are counted apart
+        self._n_queued: int = 0
+        self._sequence = count()
+
+        # the queue and the workers are bound to the event loop, so they're created on first use
+        self._queue: asyncio.PriorityQueue = None
+        self._workers: List[asyncio.Future] = []
+        self._closed: bool = False
+
+    def _start(self):
+        if self._queue is None:
+            self._queue = asyncio.PriorityQueue()
+            self._workers = [asyncio.ensure_future(self._work()) for _ in range(self._n_workers)]
+
+    def submit(self, payload: dict, priority: int = 0, **options) -> Job:
+        """
+        :param options: keyword arguments given to run_job together with the payload
+        :raise JobQueueFullError: if the maximum number of queued jobs has been reached
+        """
+        self._start()
+        self._purge()
+
+        if self._n_queued >= self._max_queued:
+            raise JobQueueFullError(f'There are already {self._max_queued} queued jobs')
+
+        job = Job(payload, priority, options)
+        self._jobs[job.id] = job
+        self._queue.put_nowait((priority, next(self._sequence), job))
+        self._n_queued += 1
+        return job
+
+    def get(self, job_id: str) -> Union[Job, None]:
+        self._purge()
+        return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Union[Job, None]:
+        """
+        Cancels a queued or running job. A finished job is removed from the retained jobs.
+        :return: the cancelled or removed job, or None if there's no job with the given id
+        """
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+
+        if job.finished:
+            del self._jobs[job_id]
+            self._finished.pop(job_id, None)
+        elif job.status == Job.RUNNING:
+            # the job is reported as cancelled right away, and its worker discards whatever the task returns
+            job.task.cancel()
+            self._finish(job, Job.CANCELLED)
+        else:
+            # a queued job is skipped by the workers once it reaches the head of the queue
+            self._n_queued -= 1
+            self._finish(job, Job.CANCELLED)
+        return job
+
+    async def _work(self):
+        while True:
+            _, _, job = await self._queue.get()
+            if job.finished:
+                continue
+            self._n_queued -= 1
+
+            job.status = Job.RUNNING
+            job.started_at = time()
+            task = job.task = asyncio.ensure_future(self._run_job(job.payload, **job.options))
+            try:
+                # the job is shielded, so that cancelling the worker doesn't look like cancelling the job
+                result = await asyncio.shield(task)
+            except asyncio.CancelledError:
+                if self._closed or not task.cancelled():
+                    # the worker itself has been cancelled, possibly together with its job on close
+                    raise
+                if not job.finished:
+                    self._finish(job, Job.CANCELLED)
+            except Exception as ex:
+                if not job.finished:
+                    logging.log(logging.ERROR, f'Job {job.id} failed: {ex}')
+                    job.error = str(ex)
+                    self._finish(job, Job.FAILED)
+            else:
+                if not job.finished:
+                    job.result = result
+                    self._finish(job, Job.DONE)
+
+    def _finish(self, job: Job, status: str):
+        job.status = status
+        job.finished_at = time()
+        job.task = None
+        self._finished[job.id] = job
+
+    def _purge(self):
+        """
+        Removes the finished jobs that exceeded the retention time or the maximum number of retained jobs.
+        """
+        now = time()
+        while len(self._finished) > 0:
+            job_id, job = next(iter(self._finished.items()))
+            if len(self._finished) <= self._max_retained and now - job.finished_at <= self._retention:
+                break
+            del self._finished[job_id]
+            self._jobs.pop(job_id, None)
+
+    def stats(self) -> dict:
+        statuses = [job.status for job in self._jobs.values()]
+        return {
+            'workers': self._n_workers,
+            'max_queued': self._max_queued,
+            'queued': self._n_queued,
+            'running': statuses.count(Job.RUNNING),
+            'retained': len(self._finished),
+        }
+
+    def close(self):
+        self._closed = True
+        for worker in self._workers:
+            worker.cancel()
+        for job in self._jobs.values():
+            if job.task is not None:
+                job.task.cancel()
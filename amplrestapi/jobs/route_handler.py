@@ -0,0 +1,63 @@
+from aiohttp import web, web_request
+
+from amplrestapi import codecs
+from amplrestapi.jobs.job_queue import JobQueue, JobQueueFullError
+from amplrestapi.jit.route_handler import JITRouteHandler
+from config.config import Config
+
+
+class JobsRouteHandler:
+    """
+    JobsRouteHandler exposes a REST interface to solve JIT problems asynchronously.
+    A job is submitted with a POST request that returns immediately, and its status and result
+    are then polled with GET requests.
+    """
+
+    def __init__(self, jit_handler: JITRouteHandler, queue: JobQueue):
+        """
+        :param jit_handler: handler used to validate and solve the JIT instances
+        :param queue: priority queue that runs the submitted jobs
+        """
+        self._jit_handler = jit_handler
+        self._queue = queue
+
+    @property
+    def queue(self) -> JobQueue:
+        return self._queue
+
+    async def submit_jit(self, request: web_request.Request):
+        # the body is read like the one of the synchronous route, in any of its formats and within the same size limit,
+        # and the input is validated immediately, so that an invalid job is never queued
+        body = await codecs.read_body(request, max_size=Config.client_max_size())
+        input_data, media_type = codecs.decode(body, codecs.request_media_type(request))
+        binary = codecs.is_binary(media_type)
+        del body
+        self._jit_handler.validate_instance(input_data, binary)
+
+        try:
+            priority = int(request.query.get('priority', 0))
+        except ValueError:
+            raise web.HTTPBadRequest(reason='The `priority` query parameter must be an integer')
+
+        try:
+            job = self._queue.submit(input_data, priority=priority, binary=binary)
+        except JobQueueFullError as ex:
+            raise web.HTTPServiceUnavailable(reason=str(ex), headers={'Retry-After': '1'})
+
+        location = request.app.router['job'].url_for(job_id=job.id)
+        return web.json_response(job.to_dict(), status=202, headers={'Location': str(location)})
+
+    async def get(self, request: web_request.Request):
+        job = self._queue.get(request.match_info['job_id'])
+        if job is None:
+            raise web.HTTPNotFound(reason='Job not found')
+        return web.json_response(job.to_dict())
+
+    async def cancel(self, request: web_request.Request):
+        job = self._queue.cancel(request.match_info['job_id'])
+        if job is None:
+            raise web.HTTPNotFound(reason='Job not found')
+        return web.json_response(job.to_dict())
+
+    def on_exit(self):
+        self._queue.close()
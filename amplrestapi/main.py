@@ -1,17 +1,33 @@
 import logging
-from ampljit import model as jit_model
+import os
+from ampljit import linprog, model as jit_model
+from ampljit.backends import AMPLBackend, HiGHSBackend, NativeBackend
+from ampljit.result_cache import ResultCache
 from aiohttp import web
 from asyncio import iscoroutine
+from functools import partial
+from typing import Callable
 
+from amplrestapi import metrics
+from amplrestapi.debug.route_handler import ProfileRouteHandler
 from amplrestapi.jit.route_handler import JITRouteHandler
-from amplwrapper.ampl_wrapper import AMPLWrapper
+from amplrestapi.jobs.job_queue import JobQueue
+from amplrestapi.jobs.route_handler import JobsRouteHandler
+from amplrestapi.metrics_route_handler import MetricsRouteHandler
+from amplrestapi.models.registry import AMPLModel, ModelRegistry, discover_models, share_sessions
+from amplrestapi.models.route_handler import ModelsRouteHandler
+from amplrestapi.readiness_route_handler import ReadinessRouteHandler
+from amplrestapi.schedules.route_handler import SchedulesRouteHandler
+from amplrestapi.schedules.schedule_store import ScheduleStore
+from amplrestapi.stats_route_handler import StatsRouteHandler
+from amplwrapper.ampl_pool import AMPLPool, RecyclePolicy
 from config.config import Config
 from amplrestapi.routes import setup_routes
 from amplrestapi.middlewares import setup_middlewares
 
 
 def setup_cleanup_hooks(tasks):
-    async def cleanup():
+    async def cleanup(app):
         for func in tasks:
             result = func()
             if iscoroutine(result):
@@ -20,22 +36,133 @@ def setup_cleanup_hooks(tasks):
     return cleanup
 
 
-def init():
-    app = web.Application()
+def setup_startup_hooks(tasks):
+    async def startup(app):
+        for func in tasks:
+            result = func()
+            if iscoroutine(result):
+                await result
+
+    return startup
+
+
+def init(pool: AMPLPool = None, jit_solver: Callable = None, registry: ModelRegistry = None):
+    """
+    :param pool: pool of AMPL sessions to use instead of the one described by the config,
+                 e.g. a pool of stand-in sessions in the benchmarks
+    :param jit_solver: function that solves the canonical JIT problem in the sessions of the pool,
+                       instead of the one described by the config
+    :param registry: AMPL models to serve instead of the ones discovered in the package described by the config
+    """
+    app = web.Application(client_max_size=Config.client_max_size())
+
+    # Discovers the AMPL models, and shares the AMPL sessions between them and the JIT problem by weight
+    model_modules = discover_models(Config.models_package()) if registry is None else {}
+    weights = Config.models_weights()
+    n_sessions = share_sessions(Config.pool_size() or os.cpu_count() or 1,
+                                {name: weights.get(name, 1) for name in ['jit', *model_modules]})
+
+    recycle_policy = RecyclePolicy(max_solves=Config.pool_recycle_max_solves(),
+                                   max_rss=int(Config.pool_recycle_max_rss_mb() * 2 ** 20),
+                                   max_latency_ratio=Config.pool_recycle_max_latency_ratio(),
+                                   latency_window=Config.pool_recycle_latency_window())
+
+    def create_pool(name: str) -> AMPLPool:
+        return AMPLPool(size=n_sessions[name], wait_observer=metrics.pool_wait_duration.observe,
+                        max_queued=Config.pool_max_queued(), max_wait=Config.pool_max_wait(),
+                        recycle_policy=recycle_policy,
+                        recycle_observer=lambda reason: metrics.session_recycles.labels(reason=reason).inc())
+
+    # Starts the AMPL sessions in their worker processes. Each model has its own sessions,
+    # which keep the model loaded between solves
+    if pool is None:
+        pool = create_pool('jit')
+    if registry is None:
+        registry = ModelRegistry([AMPLModel(module, pool=create_pool(name)) for name, module in model_modules.items()])
+
+    # Initializes the cache of the JIT problem results
+    jit_cache = ResultCache(max_size=Config.cache_max_size(), ttl=Config.cache_ttl(), enabled=Config.cache_enabled())
+
+    # Initializes the cache of the last optimal basis of each warm started JIT schedule
+    jit_bases = ResultCache(max_size=Config.warm_start_max_size(), ttl=Config.warm_start_ttl())
+
+    # Initializes the solver backends of the JIT problem. The HiGHS backend needs SciPy, an optional dependency
+    if jit_solver is None:
+        jit_solver = jit_model.solve_persistent if Config.jit_persistent_model() else jit_model.solve_canonical
+    jit_backends = {backend.name: backend for backend in [
+        AMPLBackend(pool=pool, solver=jit_solver, bases=jit_bases),
+        NativeBackend(),
+    ]}
+    if linprog.is_available():
+        jit_backends['highs'] = HiGHSBackend(threads=Config.highs_threads())
+
+    if Config.jit_solver() not in jit_backends:
+        raise RuntimeError(f'The default JIT solver `{Config.jit_solver()}` isn\'t available')
 
     # Initializes the JIT problem solver route
-    jit_solver = jit_model.solve
-    jit_handler = JITRouteHandler(ampl=AMPLWrapper(), solver=jit_solver)
+    jit_handler = JITRouteHandler(backends=jit_backends, cache=jit_cache, default_solver_name=Config.jit_solver())
+
+    # Initializes the asynchronous jobs routes.
+    # By default there are as many job workers as AMPL sessions, so that queued jobs never wait for a session.
+    # Jobs are already queued here, so their solves wait for a session without the admission limits of the pool
+    job_queue = JobQueue(run_job=partial(jit_handler.solve_instance, background=True),
+                         n_workers=Config.jobs_workers() or pool.size,
+                         max_queued=Config.jobs_max_queued(), max_retained=Config.jobs_max_retained(),
+                         retention=Config.jobs_retention())
+    jobs_handler = JobsRouteHandler(jit_handler=jit_handler, queue=job_queue)
+
+    # Initializes the routes of the schedules kept by the server, which are solved again incrementally
+    schedule_store = ScheduleStore(max_batches=Config.schedules_max_batches(), ttl=Config.schedules_ttl())
+    schedules_handler = SchedulesRouteHandler(jit_handler=jit_handler, store=schedule_store)
+
+    # Initializes the route of the other AMPL models
+    models_handler = ModelsRouteHandler(registry=registry)
+
+    # Initializes the monitoring route
+    stats_handler = StatsRouteHandler()
+    stats_handler.register('pool', pool.stats)
+    stats_handler.register('cache', jit_cache.stats)
+    stats_handler.register('single_flight', jit_handler.single_flight.stats)
+    stats_handler.register('warm_start', jit_bases.stats)
+    stats_handler.register('jobs', job_queue.stats)
+    stats_handler.register('schedules', schedule_store.stats)
+    stats_handler.register('models', registry.stats)
+
+    # Initializes the Prometheus metrics route
+    metrics.pool_busy_sessions.set_function(lambda: pool.stats()['busy'])
+    metrics.pool_queue_depth.set_function(lambda: pool.stats()['queue_depth'])
+    metrics_handler = MetricsRouteHandler()
+
+    # Initializes the readiness route, which fails until the solver sessions are warm
+    readiness_handler = ReadinessRouteHandler()
+    readiness_handler.register('warm_up', lambda: jit_handler.warm)
+    readiness_handler.register('models', lambda: models_handler.warm)
+
+    # Initializes the on-demand profiling route, which is disabled unless a token is configured
+    pools = dict({'jit': pool}, **{name: registry.get(name).pool for name in registry.names})
+    profile_handler = ProfileRouteHandler(pools=pools, token=Config.debug_token())
 
     # Sets up the server routes
-    setup_routes(app, jit_handler=jit_handler)
+    setup_routes(app, jit_handler=jit_handler, jobs_handler=jobs_handler, stats_handler=stats_handler,
+                 metrics_handler=metrics_handler, readiness_handler=readiness_handler,
+                 schedules_handler=schedules_handler, models_handler=models_handler,
+                 profile_handler=profile_handler)
 
     # Sets up the server middleware methods
     setup_middlewares(app)
 
+    # Declares the methods to call on server startup. The warm up runs in the background
+    warm_up = Config.warm_up()
+    app.on_startup.append(setup_startup_hooks([
+        lambda: jit_handler.on_startup(warm_up=warm_up),
+        lambda: models_handler.on_startup(warm_up=warm_up),
+    ]))
+
     # Declares the methods to call on server shutdown
     app.on_cleanup.append(setup_cleanup_hooks([
+        jobs_handler.on_exit,
         jit_handler.on_exit,
+        models_handler.on_exit,
     ]))
 
     # Reads the host and the port of the server from the config package
@@ -44,10 +171,10 @@ def init():
 
 
 def main():
-    logging.basicConfig(level=logging.DEBUG)
+    logging.basicConfig(level=Config.log_level())
 
     app, host, port = init()
-    logging.log(logging.DEBUG, f'Running app on {host}:{str(port)}...')
+    logging.log(logging.INFO, f'Running app on {host}:{str(port)}...')
     web.run_app(app, host=host, port=port)
 
 
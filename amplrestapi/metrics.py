@@ -0,0 +1,83 @@
+from contextlib import contextmanager
+from time import perf_counter
+from prometheus_client import Counter, Gauge, Histogram
+
+from amplrestapi.debug import loop_monitor
+
+# Prometheus metrics of the server, registered in the default registry of prometheus_client.
+# The AMPL sessions run in worker processes, which can't update them: the durations of the stages that run there
+# are sent back with the result of each solve, under the 'stages' key, and observed by the server process.
+
+latency_buckets = (.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30, 60, float('inf'))
+
+stage_duration = Histogram('amplrestapi_stage_duration_seconds',
+                           'Duration of each stage of a JIT request',
+                           ['stage'], buckets=latency_buckets)
+
+pool_wait_duration = Histogram('amplrestapi_pool_wait_seconds',
+                               'Time spent by a solve waiting for an idle AMPL session',
+                               buckets=latency_buckets)
+
+dual_simplex_iterations = Histogram('amplrestapi_dual_simplex_iterations',
+                                    'Dual simplex iterations performed by CPLEX for each solve',
+                                    buckets=(0, 1, 5, 10, 50, 100, 500, 1000, 5000, 10000, 50000, float('inf')))
+
+solves = Counter('amplrestapi_solves_total',
+                 'Number of solves that have actually run, by solver and status of the solution',
+                 ['solver', 'status'])
+
+requests_in_flight = Gauge('amplrestapi_requests_in_flight',
+                           'Number of HTTP requests being handled')
+
+request_duration = Histogram('amplrestapi_request_duration_seconds',
+                             'Duration of the HTTP requests, by route and status',
+                             ['method', 'route', 'status'], buckets=latency_buckets)
+
+errors = Counter('amplrestapi_errors_total',
+                 'Number of HTTP error responses, by status',
+                 ['status'])
+
+pool_busy_sessions = Gauge('amplrestapi_pool_busy_sessions',
+                           'Number of AMPL sessions that are solving a problem')
+
+pool_queue_depth = Gauge('amplrestapi_pool_queue_depth',
+                         'Number of solves waiting for an idle AMPL session')
+
+session_recycles = Counter('amplrestapi_session_recycles_total',
+                           'Number of AMPL sessions replaced because they exceeded a limit, by limit',
+                           ['reason'])
+
+
+@contextmanager
+def observe_stage(stage: str, stages: dict = None):
+    """
+    Measures the duration of a stage that runs in the server process.
+    :param stage: label of the stage in the stage_duration histogram
+    :param stages: if given, the duration in seconds is also stored in this dictionary, under the stage name,
+                   e.g. to return it in the profile of a request
+    """
+    started_at = perf_counter()
+    try:
+        yield
+    finally:
+        duration = perf_counter() - started_at
+        stage_duration.labels(stage=stage).observe(duration)
+        if stages is not None:
+            stages[stage] = duration
+        # the stages of a request are logged too if it blocks the event loop for too long
+        request_stages = loop_monitor.running_stages()
+        if request_stages is not None:
+            request_stages[stage] = duration
+
+
+def observe_solve(result: dict):
+    """
+    Observes the durations of the stages and the iterations reported by a solver that has actually run,
+    i.e. whose result doesn't come from the cache or from an identical request.
+    :param result: dictionary returned by a JIT solver
+    """
+    for stage, duration in result.get('stages', {}).items():
+        stage_duration.labels(stage=stage).observe(duration)
+    solves.labels(solver=result.get('solver', 'ampl'), status=result.get('status', 'optimal')).inc()
+    if result.get('solver', 'ampl') == 'ampl':
+        dual_simplex_iterations.observe(result['iterations'])
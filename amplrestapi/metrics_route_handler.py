@@ -0,0 +1,17 @@
+from aiohttp import web, web_request
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, generate_latest
+
+
+class MetricsRouteHandler:
+    """
+    MetricsRouteHandler exposes the metrics of the server in the Prometheus text format.
+    """
+
+    def __init__(self, registry=REGISTRY):
+        """
+        :param registry: prometheus_client registry of the exposed metrics
+        """
+        self._registry = registry
+
+    async def run(self, request: web_request.Request):
+        return web.Response(body=generate_latest(self._registry), headers={'Content-Type': CONTENT_TYPE_LATEST})
@@ -1,5 +1,64 @@
 from aiohttp import web
+from time import time
 import json
+import logging
+
+from amplrestapi import metrics
+from amplrestapi.debug.loop_monitor import BlockingTimer
+from amplrestapi.http_validation_error import HTTPValidationError
+from config.config import Config
+
+
+def create_metrics_middleware():
+    """
+    Measures the duration of every request and counts the error responses by status.
+    It must be the outermost middleware, so that it sees the responses built by the error middleware.
+    """
+    @web.middleware
+    async def metrics_middleware(request, handler):
+        started_at = time()
+        status = 500
+
+        with metrics.requests_in_flight.track_inprogress():
+            try:
+                response = await handler(request)
+                status = response.status
+                return response
+
+            except web.HTTPException as ex:
+                status = ex.status
+                raise
+
+            finally:
+                resource = request.match_info.route.resource
+                route = resource.canonical if resource is not None else 'unmatched'
+                metrics.request_duration.labels(method=request.method, route=route,
+                                                status=str(status)).observe(time() - started_at)
+                if status >= 400:
+                    metrics.errors.labels(status=str(status)).inc()
+
+    return metrics_middleware
+
+
+def create_loop_blocking_middleware(threshold: float):
+    """
+    Logs the requests that blocked the event loop for more than `threshold` seconds in total,
+    together with the durations of their stages.
+    It must be the innermost middleware, so that it only measures the handlers.
+    """
+    @web.middleware
+    async def loop_blocking_middleware(request, handler):
+        timer = BlockingTimer(handler(request))
+        try:
+            return await timer
+        finally:
+            if timer.blocking_time > threshold:
+                stages = ', '.join(f'{stage} {duration:.4f}s' for stage, duration in timer.stages.items())
+                logging.log(logging.WARNING, f'{request.method} {request.path} blocked the event loop for '
+                                             f'{timer.blocking_time:.4f}s in {timer.n_steps} steps, the longest '
+                                             f'of {timer.longest_step:.4f}s. Stages: {stages or "none"}')
+
+    return loop_blocking_middleware
 
 
 def create_error_middleware(overrides):
@@ -18,10 +77,17 @@ def create_error_middleware(overrides):
         except json.decoder.JSONDecodeError as ex:
             return await overrides.get(400)(request, ex.msg)
 
+        except HTTPValidationError as ex:
+            return await overrides.get(422)(request, ex.reason, ex.path)
+
         except web.HTTPException as ex:
             override = overrides.get(ex.status)
             if override:
-                return await override(request, ex.reason)
+                override_response = await override(request, ex.reason)
+                # e.g. the estimated time after which a shed request may be retried
+                if 'Retry-After' in ex.headers:
+                    override_response.headers['Retry-After'] = ex.headers['Retry-After']
+                return override_response
             raise
 
     return error_middleware
@@ -42,12 +108,44 @@ async def handle_not_found_error(request, details):
     }, status=404)
 
 
-async def handle_unprocessable_entity_error(request, details):
+async def handle_unauthorized_error(request, details):
+    return web.json_response({
+        'error': 'Unauthorized',
+        'details': details,
+    }, status=401, headers={'WWW-Authenticate': 'Bearer'})
+
+
+async def handle_conflict_error(request, details):
+    return web.json_response({
+        'error': 'Conflict',
+        'details': details,
+    }, status=409)
+
+
+async def handle_unsupported_media_type_error(request, details):
     return web.json_response({
+        'error': 'Unsupported media type',
+        'details': details,
+    }, status=415)
+
+
+async def handle_unprocessable_entity_error(request, details, path=None):
+    body = {
         'error': 'Unprocessable entity',
         'description': 'The server understands the structure of the given input, but its semantics is invalid',
         'details': details,
-    }, status=422)
+    }
+    if path is not None:
+        body['path'] = path
+    return web.json_response(body, status=422)
+
+
+async def handle_too_many_requests_error(request, details):
+    return web.json_response({
+        'error': 'Too many requests',
+        'description': 'The server is saturated and didn\'t admit the request, retry later',
+        'details': details,
+    }, status=429, headers={'Retry-After': '1'})
 
 
 async def handle_server_error(request, details):
@@ -57,11 +155,39 @@ async def handle_server_error(request, details):
     }, status=500)
 
 
+async def handle_service_unavailable_error(request, details):
+    return web.json_response({
+        'error': 'Service unavailable',
+        'description': 'The server is temporarily unable to accept the request, retry later',
+        'details': details,
+    }, status=503, headers={'Retry-After': '1'})
+
+
+async def handle_gateway_timeout_error(request, details):
+    return web.json_response({
+        'error': 'Deadline exceeded',
+        'description': 'The problem couldn\'t be solved before the deadline of the request',
+        'details': details,
+    }, status=504)
+
+
 def setup_middlewares(app):
     error_middleware = create_error_middleware({
         400: handle_bad_request_error,
+        401: handle_unauthorized_error,
         404: handle_not_found_error,
+        409: handle_conflict_error,
+        415: handle_unsupported_media_type_error,
         422: handle_unprocessable_entity_error,
-        500: handle_server_error
+        429: handle_too_many_requests_error,
+        500: handle_server_error,
+        503: handle_service_unavailable_error,
+        504: handle_gateway_timeout_error,
     })
+    app.middlewares.append(create_metrics_middleware())
     app.middlewares.append(error_middleware)
+
+    # the handlers that block the event loop for too long are logged, if a threshold is configured
+    slow_request_threshold = Config.debug_slow_request_threshold()
+    if slow_request_threshold > 0:
+        app.middlewares.append(create_loop_blocking_middleware(slow_request_threshold))
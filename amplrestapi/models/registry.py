@@ -0,0 +1,184 @@
+from functools import lru_cache
+from importlib import import_module
+from os import path
+from time import time
+from types import ModuleType
+from typing import Dict, List, TYPE_CHECKING, Union
+import json
+import math
+import pkgutil
+
+from amplrestapi.jit.validate import ValidationIssue, compile_validator
+from amplwrapper.ampl_pool import AMPLPool
+
+if TYPE_CHECKING:
+    from amplwrapper.ampl_wrapper import AMPLWrapper
+
+# files of the package of a model
+model_filename = 'model.mod'
+schema_filename = 'schema.json'
+
+
+class AMPLModel:
+    """
+    AMPL model served by the /problems/{model_name} route, with its own pool of AMPL sessions that keep
+    the model loaded between solves.
+    A model is a Python package, whose name is the name of the model, made of:
+    - a model.mod file with the AMPL declarations of the model
+    - a schema.json file with the JSON schema of its input, as supported by amplrestapi.jit.validate
+    - a set_data(ampl, input_data) function, that sends a validated input to the declared model
+    - an extract(ampl) function, that returns the JSON serializable result of a solve
+    - an optional warm_up_input, the input of a tiny instance solved by each session at startup
+    """
+
+    def __init__(self, module: ModuleType, pool: AMPLPool):
+        """
+        :param module: package of the model
+        :param pool: pool of AMPL sessions that only solve this model
+        """
+        self._module = module
+        self._pool = pool
+        with open(path.join(path.dirname(module.__file__), schema_filename), 'r') as json_schema_file:
+            self._validate = compile_validator(json.load(json_schema_file))
+
+    @property
+    def name(self) -> str:
+        return self._module.__name__.rsplit('.', 1)[-1]
+
+    @property
+    def pool(self) -> AMPLPool:
+        return self._pool
+
+    def validate(self, input_data: dict) -> Union[ValidationIssue, None]:
+        """
+        :return: the first validation error of the given input, or None if it's valid
+        """
+        return self._validate(input_data)
+
+    async def solve(self, input_data: dict) -> dict:
+        """
+        Solves a validated input in the first idle session of the model.
+        :return: dictionary with the result of the extract() function of the model under the 'data' key,
+                 and the iterations and the duration of the stages of the solve under the 'meta' key
+        """
+        return await self._pool.run(solve_model, module_name=self._module.__name__, input_data=input_data)
+
+    async def warm_up(self):
+        # every session loads the model, so that requests only send their data
+        warm_up_input = getattr(self._module, 'warm_up_input', None)
+        if warm_up_input is not None:
+            await self._pool.warm_up(solve_model, module_name=self._module.__name__, input_data=warm_up_input)
+        else:
+            await self._pool.warm_up(load_model, module_name=self._module.__name__)
+
+    def close(self):
+        self._pool.close()
+
+
+class ModelRegistry:
+    """
+    AMPL models discovered at startup, by name.
+    """
+
+    def __init__(self, models: List[AMPLModel] = ()):
+        self._models: Dict[str, AMPLModel] = {model.name: model for model in models}
+
+    def get(self, name: str) -> Union[AMPLModel, None]:
+        return self._models.get(name)
+
+    @property
+    def names(self) -> List[str]:
+        return list(self._models)
+
+    def stats(self) -> dict:
+        return {name: model.pool.stats() for name, model in self._models.items()}
+
+    def close(self):
+        for model in self._models.values():
+            model.close()
+
+
+def discover_models(package_name: str) -> Dict[str, ModuleType]:
+    """
+    :param package_name: name of the Python package whose subpackages are AMPL models
+    :return: dictionary with the package of each model, by model name
+    """
+    package = import_module(package_name)
+    return {module_info.name: import_module(f'{package_name}.{module_info.name}')
+            for module_info in sorted(pkgutil.iter_modules(package.__path__), key=lambda info: info.name)
+            if module_info.ispkg}
+
+
+def share_sessions(n_sessions: int, weights: Dict[str, float]) -> Dict[str, int]:
+    """
+    Shares the AMPL sessions between models proportionally to their weights, with the largest remainder method.
+    Every model gets at least one session, so the total may exceed n_sessions if there are more models.
+    :param n_sessions: number of sessions to share
+    :param weights: weight of each model, by name
+    :return: number of sessions of each model, by name
+    """
+    total_weight = sum(weights.values())
+    quotas = {name: n_sessions * weight / total_weight for name, weight in weights.items()}
+    shares = {name: max(1, math.floor(quota)) for name, quota in quotas.items()}
+
+    # the sessions left are given to the models with the largest remainders
+    n_left = n_sessions - sum(shares.values())
+    for name in sorted(quotas, key=lambda model_name: quotas[model_name] - shares[model_name], reverse=True):
+        if n_left <= 0:
+            break
+        shares[name] += 1
+        n_left -= 1
+    return shares
+
+
+@lru_cache(maxsize=None)
+def _model_statements(module_name: str) -> str:
+    """
+    :return: the AMPL declarations of a model, read only once per worker process
+    """
+    with open(path.join(path.dirname(import_module(module_name).__file__), model_filename), 'r') as model_file:
+        return model_file.read()
+
+
+def load_model(ampl: 'AMPLWrapper', module_name: str):
+    """
+    Loads the declarations of a model in an AMPL session, unless they're already loaded.
+    """
+    ampl.load_model(module_name, _model_statements(module_name))
+
+
+def solve_model(ampl: 'AMPLWrapper', module_name: str, input_data: dict) -> dict:
+    """
+    Solves an input of a model in an AMPL session. The declarations of the model are only loaded by the first
+    solve of the session: the next ones only replace its data.
+    :param module_name: name of the package of the model
+    :raise RuntimeError: if the solver didn't solve the instance
+    """
+    started_at = time()
+    module = import_module(module_name)
+    load_model(ampl, module_name)
+    ampl.reset_data()
+    module.set_data(ampl, input_data)
+    model_build_duration = time() - started_at
+
+    computation_duration = ampl.solve()
+    solve_result = ampl.get_value('solve_result')
+    if solve_result != 'solved':
+        raise RuntimeError(f'The solver didn\'t solve the {module_name} instance: its solve_result is {solve_result}')
+
+    extraction_started_at = time()
+    data = module.extract(ampl)
+    extraction_duration = time() - extraction_started_at
+
+    return {
+        'data': data,
+        'meta': {
+            'iterations': ampl.n_iterations,
+            'computation_duration': computation_duration,
+            'stages': {
+                'model_build': model_build_duration,
+                'solve': computation_duration,
+                'extraction': extraction_duration,
+            },
+        },
+    }
@@ -0,0 +1,83 @@
+from time import time
+from aiohttp import web, web_request
+import asyncio
+import logging
+
+from amplrestapi import codecs
+from amplrestapi.http_validation_error import HTTPValidationError
+from amplrestapi.models.registry import ModelRegistry
+from amplwrapper.ampl_pool import AMPLPoolFullError, AMPLPoolTimeoutError
+from config.config import Config
+
+
+class ModelsRouteHandler:
+    """
+    ModelsRouteHandler exposes a REST interface for the AMPL models discovered by a ModelRegistry.
+    Each model is solved by its own AMPL sessions, which keep the model loaded between requests.
+    """
+
+    def __init__(self, registry: ModelRegistry):
+        self._registry = registry
+        self._warm_up_task: asyncio.Future = None
+
+    @property
+    def registry(self) -> ModelRegistry:
+        return self._registry
+
+    @property
+    def warm(self) -> bool:
+        """
+        :return: whether the sessions of every model have been warmed up successfully
+        """
+        task = self._warm_up_task
+        return task is not None and task.done() and not task.cancelled() and task.exception() is None
+
+    def on_startup(self, warm_up: bool = True):
+        """
+        Starts warming up the sessions of every model in the background.
+        :param warm_up: if False, the models are considered warm right away
+        """
+        self._warm_up_task = asyncio.ensure_future(self._warm_up() if warm_up else asyncio.sleep(0))
+
+    async def _warm_up(self):
+        started_at = time()
+        try:
+            await asyncio.gather(*[self._registry.get(name).warm_up() for name in self._registry.names])
+        except Exception as ex:
+            logging.log(logging.ERROR, f'The AMPL models failed to warm up: {ex}')
+            raise
+        logging.log(logging.INFO, f'The AMPL models {self._registry.names} warmed up in {time() - started_at:.2f}s')
+
+    async def run(self, request: web_request.Request):
+        model = self._registry.get(request.match_info['model_name'])
+        if model is None:
+            raise web.HTTPNotFound(reason='Model not found')
+
+        # the body may be either JSON or MessagePack, according to its Content-Type.
+        # The columns of the Arrow IPC format are specific to the JIT problem
+        media_type = codecs.request_media_type(request)
+        if media_type == codecs.arrow_media_type:
+            raise web.HTTPUnsupportedMediaType(reason='The Arrow IPC format is only supported by the JIT problem')
+        input_data, _ = codecs.decode(await codecs.read_body(request, max_size=Config.client_max_size()), media_type)
+
+        issue = model.validate(input_data)
+        if issue is not None:
+            raise HTTPValidationError(issue.message, path=issue.pointer)
+
+        try:
+            response = await model.solve(input_data)
+        except AMPLPoolFullError as ex:
+            raise web.HTTPTooManyRequests(reason=str(ex), headers={'Retry-After': str(ex.retry_after)})
+        except AMPLPoolTimeoutError as ex:
+            raise web.HTTPServiceUnavailable(reason=str(ex), headers={'Retry-After': str(ex.retry_after)})
+        response['meta']['model'] = model.name
+
+        output_media_type = codecs.response_media_type(request, default=media_type)
+        if output_media_type == codecs.arrow_media_type:
+            output_media_type = media_type
+        return codecs.response(response, output_media_type)
+
+    def on_exit(self):
+        if self._warm_up_task is not None:
+            self._warm_up_task.cancel()
+        self._registry.close()
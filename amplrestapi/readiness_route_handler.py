@@ -0,0 +1,26 @@
+from aiohttp import web, web_request
+from typing import Callable, Dict
+
+
+class ReadinessRouteHandler:
+    """
+    ReadinessRouteHandler tells the orchestrator whether the server should receive traffic.
+    The server is ready once every registered check passes, e.g. once its solver sessions are warm.
+    """
+
+    def __init__(self):
+        self._checks: Dict[str, Callable[[], bool]] = {}
+
+    def register(self, name: str, check: Callable[[], bool]):
+        """
+        :param name: name of the check, reported in the response
+        :param check: function without arguments that returns whether the server is ready as far as it's concerned
+        """
+        self._checks[name] = check
+
+    async def run(self, request: web_request.Request):
+        checks = {name: check() for name, check in self._checks.items()}
+        if not all(checks.values()):
+            pending = ', '.join(name for name, ready in checks.items() if not ready)
+            raise web.HTTPServiceUnavailable(reason=f'The server isn\'t ready yet, waiting for: {pending}')
+        return web.json_response({'ready': True, 'checks': checks})
@@ -1,10 +1,33 @@
 from aiohttp import web
 
 from amplrestapi.abstract_ampl_routes_handler import AbstractAMPLRoutesHandler
+from amplrestapi.debug.route_handler import ProfileRouteHandler
+from amplrestapi.jobs.route_handler import JobsRouteHandler
+from amplrestapi.metrics_route_handler import MetricsRouteHandler
+from amplrestapi.models.route_handler import ModelsRouteHandler
+from amplrestapi.readiness_route_handler import ReadinessRouteHandler
+from amplrestapi.schedules.route_handler import SchedulesRouteHandler
+from amplrestapi.stats_route_handler import StatsRouteHandler
 
 
-def setup_routes(app: web.Application, jit_handler: AbstractAMPLRoutesHandler):
+def setup_routes(app: web.Application, jit_handler: AbstractAMPLRoutesHandler, jobs_handler: JobsRouteHandler,
+                 stats_handler: StatsRouteHandler, metrics_handler: MetricsRouteHandler,
+                 readiness_handler: ReadinessRouteHandler, schedules_handler: SchedulesRouteHandler,
+                 models_handler: ModelsRouteHandler, profile_handler: ProfileRouteHandler):
     router = app.router
     router.add_post('/problems/jit', jit_handler.run)
-    # router.add_get('/problems/investments-plan', handler.investments_plan)
-    # router.add_get('/problems/knapsack', handler.knapsack)
+    router.add_post('/problems/jit/batch', jit_handler.run_batch)
+    # the other models are discovered at startup. The JIT routes come first, so they take precedence
+    router.add_post('/problems/{model_name}', models_handler.run)
+    router.add_post('/jobs/jit', jobs_handler.submit_jit)
+    router.add_get('/jobs/{job_id}', jobs_handler.get, name='job')
+    router.add_delete('/jobs/{job_id}', jobs_handler.cancel)
+    router.add_post('/schedules', schedules_handler.create)
+    router.add_get('/schedules/{schedule_id}', schedules_handler.get, name='schedule')
+    router.add_delete('/schedules/{schedule_id}', schedules_handler.delete)
+    router.add_post('/schedules/{schedule_id}/batches', schedules_handler.append)
+    router.add_patch(r'/schedules/{schedule_id}/batches/{index:\d+}', schedules_handler.update)
+    router.add_get('/stats', stats_handler.run)
+    router.add_get('/metrics', metrics_handler.run)
+    router.add_get('/ready', readiness_handler.run)
+    router.add_get('/debug/profile', profile_handler.run)
@@ -0,0 +1,214 @@
+from os import path
+from aiohttp import web, web_request
+import json
+import numpy as np
+
+from ampljit import model as jit_model, utils as jit_utils
+from amplrestapi import codecs
+from amplrestapi.http_validation_error import HTTPValidationError
+from amplrestapi.jit.route_handler import JITRouteHandler, json_schema as jit_json_schema
+from amplrestapi.jit.validate import compile_validator
+from amplrestapi.schedules.schedule_store import Schedule, ScheduleStore
+from config.config import Config
+
+json_schemas: dict
+with open(path.join(path.dirname(__file__), 'route_schema.json'), 'r') as json_schema_file:
+    json_schemas = json.load(json_schema_file)
+
+# the schemas of the appended batches and of the updated batch share the definitions of the file
+validate_append = compile_validator(dict(json_schemas['append'], definitions=json_schemas['definitions']))
+validate_update = compile_validator(dict(json_schemas['update'], definitions=json_schemas['definitions']))
+
+# a schedule can't grow larger than a JIT instance
+max_schedule_batches = jit_json_schema['properties']['n_batches']['maximum']
+
+
+class SchedulesRouteHandler:
+    """
+    SchedulesRouteHandler exposes a REST interface to JIT schedules kept by the server, which grow and change
+    over time. A schedule is created from a JIT instance, then new batches are appended to it and single batches
+    are updated. Each change only sends the changed batches and only solves again the batches it affects,
+    and its response only contains their new start datetimes.
+    """
+
+    def __init__(self, jit_handler: JITRouteHandler, store: ScheduleStore):
+        """
+        :param jit_handler: handler used to validate and solve the JIT instances
+        :param store: store of the schedules
+        """
+        self._jit_handler = jit_handler
+        self._store = store
+
+    @property
+    def store(self) -> ScheduleStore:
+        return self._store
+
+    async def create(self, request: web_request.Request):
+        input_data = await self._read_json(request)
+        self._jit_handler.validate_instance(input_data)
+
+        try:
+            epoch, utc_offset, expected_finish_lst = jit_model.preprocess(input_data['expected_finish'])
+        except ValueError as ex:
+            raise HTTPValidationError(f'The values in the `expected_finish` list must be valid datetimes: {ex}')
+
+        schedule = Schedule(wrong_time_fee=input_data['wrong_time_fee'],
+                            solver_name=input_data.get('solver', self._jit_handler.default_solver_name),
+                            epoch=epoch, utc_offset=utc_offset)
+        response = await self._change(schedule, 0, input_data['duration'], expected_finish_lst)
+
+        location = request.app.router['schedule'].url_for(schedule_id=schedule.id)
+        json_response = codecs.response(response, status=201)
+        json_response.headers['Location'] = str(location)
+        return json_response
+
+    async def get(self, request: web_request.Request):
+        schedule = self._get_schedule(request)
+        return codecs.response(self._response(schedule, 0))
+
+    async def append(self, request: web_request.Request):
+        """
+        Appends new batches to the end of a schedule. They must be expected to finish after its last batch.
+        """
+        schedule = self._get_schedule(request)
+        input_data = await self._read_json(request)
+        issue = validate_append(input_data)
+        if issue is not None:
+            raise HTTPValidationError(issue.message, path=issue.pointer)
+
+        async with schedule.lock:
+            if schedule.n_batches + input_data['n_batches'] > max_schedule_batches:
+                raise HTTPValidationError(f'A schedule can\'t contain more than {max_schedule_batches} batches',
+                                          path='/n_batches')
+
+            expected_finish_lst = self._expected_finish_minutes(schedule, input_data['expected_finish'])
+            if expected_finish_lst[0] <= schedule.expected_finish_lst[-1]:
+                raise HTTPValidationError('The appended batches must be expected to finish after the last batch '
+                                          'of the schedule', path='/expected_finish/0')
+
+            response = await self._change(schedule, schedule.n_batches, input_data['duration'], expected_finish_lst)
+        return codecs.response(response)
+
+    async def update(self, request: web_request.Request):
+        """
+        Changes the duration or the expected finish datetime of a batch of a schedule, given by its index.
+        """
+        schedule = self._get_schedule(request)
+        index = int(request.match_info['index'])
+        input_data = await self._read_json(request)
+        issue = validate_update(input_data)
+        if issue is not None:
+            raise HTTPValidationError(issue.message, path=issue.pointer)
+        if 'duration' not in input_data and 'expected_finish' not in input_data:
+            raise HTTPValidationError('Either the `duration` or the `expected_finish` of the batch must be given')
+
+        async with schedule.lock:
+            if index >= schedule.n_batches:
+                raise web.HTTPNotFound(reason='Batch not found')
+
+            duration = input_data.get('duration', schedule.duration_lst[index])
+            expected_finish = schedule.expected_finish_lst[index]
+            if 'expected_finish' in input_data:
+                expected_finish = self._expected_finish_minutes(schedule, [input_data['expected_finish']])[0]
+                previous_ok = index == 0 or schedule.expected_finish_lst[index - 1] < expected_finish
+                next_ok = index == schedule.n_batches - 1 or expected_finish < schedule.expected_finish_lst[index + 1]
+                if not (previous_ok and next_ok):
+                    raise HTTPValidationError('The batch must be expected to finish after the previous batch and '
+                                              'before the next one', path='/expected_finish')
+
+            response = await self._change(schedule, index, [duration] + schedule.duration_lst[index + 1:],
+                                          [expected_finish] + schedule.expected_finish_lst[index + 1:])
+        return codecs.response(response)
+
+    async def delete(self, request: web_request.Request):
+        if self._store.remove(request.match_info['schedule_id']) is None:
+            raise web.HTTPNotFound(reason='Schedule not found')
+        return web.Response(status=204)
+
+    async def _change(self, schedule: Schedule, start: int, duration_lst: list, expected_finish_lst: list) -> dict:
+        """
+        Replaces the batches of a schedule from index `start` on, solving again only the batches affected
+        by the change, and stores the schedule.
+        If the solve fails, the schedule doesn't change.
+        :return: the JSON response with the solution of the batches that have been solved again
+        :raise web.HTTPNotFound: if the schedule has been removed from the store while it was being solved
+        """
+        first, duration_lst, expected_finish_lst = schedule.plan(start, duration_lst, expected_finish_lst)
+
+        # the batches are solved as a canonical instance, whose offsets are relative to its first batch
+        first_minutes = expected_finish_lst[0]
+        result = await self._jit_handler.solve_canonical(schedule.solver_name, n_batches=len(duration_lst),
+                                                         wrong_time_fee=schedule.wrong_time_fee,
+                                                         duration_lst=duration_lst,
+                                                         expected_finish_lst=[finish - first_minutes
+                                                                              for finish in expected_finish_lst])
+
+        # the schedule may have been deleted, evicted or expired while it was being solved
+        if schedule.removed:
+            raise web.HTTPNotFound(reason='Schedule not found')
+
+        schedule.apply(first, duration_lst, expected_finish_lst,
+                       start_minutes=[start_minutes + first_minutes for start_minutes in result['start_minutes']],
+                       delta_time_lst=result['delta_time'])
+        self._store.put(schedule)
+        return self._response(schedule, first, result)
+
+    @staticmethod
+    def _response(schedule: Schedule, first: int, result: dict = None) -> dict:
+        """
+        :param first: index of the first batch whose solution is returned
+        :param result: result of the solve of the batches from index `first` on, if they've just been solved
+        :return: the JSON response of the schedule, with the solution of the batches from index `first` on
+        """
+        start_datetime_arr = jit_utils.set_minutes_to_datetimes(schedule.epoch, schedule.start_minutes[first:])
+        meta = {'solver': schedule.solver_name}
+        if result is not None:
+            meta.update({
+                'iterations': result['iterations'],
+                'computation_duration': result['computation_duration'],
+                'solved_batches': schedule.n_batches - first,
+                'blocks': result.get('blocks', 1),
+            })
+        return {
+            'id': schedule.id,
+            'n_batches': schedule.n_batches,
+            'data': {
+                'total_fee': schedule.total_fee,
+                'first_batch': first,
+                'start_datetime': jit_utils.datetimes_to_strings(start_datetime_arr, jit_utils.iso_datetime_format,
+                                                                 schedule.utc_offset),
+                'delta_time': schedule.delta_time[first:],
+            },
+            'meta': meta,
+        }
+
+    def _get_schedule(self, request: web_request.Request) -> Schedule:
+        """
+        :raise web.HTTPNotFound: if there's no schedule with the id in the path, e.g. because it has expired
+        """
+        schedule = self._store.get(request.match_info['schedule_id'])
+        if schedule is None:
+            raise web.HTTPNotFound(reason='Schedule not found')
+        return schedule
+
+    @staticmethod
+    async def _read_json(request: web_request.Request):
+        return codecs.loads_json(await codecs.read_body(request, max_size=Config.client_max_size()))
+
+    @staticmethod
+    def _expected_finish_minutes(schedule: Schedule, expected_finish_datetime_str_lst: list) -> list:
+        """
+        :return: list of the minute offsets of the given datetime strings, with respect to the epoch of the schedule
+        :raise HTTPValidationError: if a string can't be parsed, or if it has a UTC offset and the datetimes of the
+                                    schedule don't, or vice versa
+        """
+        try:
+            datetime_arr, utc_offset = jit_utils.strings_to_datetimes(expected_finish_datetime_str_lst,
+                                                                      jit_utils.iso_datetime_format)
+        except ValueError as ex:
+            raise HTTPValidationError(f'The expected finish datetimes must be valid datetimes: {ex}',
+                                      path='/expected_finish')
+        if (utc_offset is None) != (schedule.utc_offset is None):
+            raise HTTPValidationError('Either every expected finish datetime of a schedule or none of them must have '
+                                      'a UTC offset', path='/expected_finish')
+        return (datetime_arr - schedule.epoch).astype(np.int64).tolist()
@@ -0,0 +1,203 @@
+import asyncio
+from collections import OrderedDict
+from itertools import accumulate
+from time import monotonic, time
+from typing import List, Tuple, Union
+from uuid import uuid4
+import numpy as np
+
+from ampljit import decomposition
+
+
+class Schedule:
+    """
+    JIT schedule kept by the server between requests, together with its current optimal solution.
+    Its expected finish and start times are minute offsets from its epoch, the first expected finish datetime
+    it was created with.
+    The schedule also keeps the target t_i = expected_finish_i - P_i of each batch, where P_i is the sum of the
+    durations of the batches 1..i, and the running maximum of the targets, so that a change only solves again
+    the batches it affects, as found by ampljit.decomposition.reusable_prefix().
+    """
+
+    def __init__(self, wrong_time_fee: int, solver_name: str, epoch: np.datetime64, utc_offset: int = None):
+        """
+        :param wrong_time_fee: fee to pay for each minute early or late
+        :param solver_name: name of the solver backend that solves the schedule
+        :param epoch: reference epoch of the minute offsets, as returned by ampljit.model.preprocess()
+        :param utc_offset: UTC offset of the datetimes of the responses, as returned by ampljit.model.preprocess()
+        """
+        self.id: str = uuid4().hex
+        self.wrong_time_fee: int = wrong_time_fee
+        self.solver_name: str = solver_name
+        self.epoch: np.datetime64 = epoch
+        self.utc_offset: Union[int, None] = utc_offset
+        self.duration_lst: List[int] = []
+        self.expected_finish_lst: List[int] = []
+        self.start_minutes: list = []
+        self.delta_time: list = []
+        self.created_at: float = time()
+        self.updated_at: float = self.created_at
+
+        # the changes of a schedule are solved one at a time, each one on top of the previous one
+        self.lock = asyncio.Lock()
+
+        # set by the store when the schedule is deleted, evicted or expired, so that a change that was being
+        # solved meanwhile doesn't store it again
+        self.removed: bool = False
+
+        self._prefix_durations: List[int] = []
+        self._targets: List[int] = []
+        self._prefix_max: List[int] = []
+        self._delta_time_sum = 0
+
+    @property
+    def n_batches(self) -> int:
+        return len(self.duration_lst)
+
+    @property
+    def total_fee(self):
+        return self.wrong_time_fee * self._delta_time_sum
+
+    def plan(self, start: int, duration_lst: list, expected_finish_lst: list) -> Tuple[int, list, list]:
+        """
+        Finds the batches that must be solved again if the batches from index `start` on are replaced
+        by the given ones. The schedule doesn't change until apply() is called with their solution.
+        :param start: index of the first replaced batch, or the number of batches to append the given ones
+        :param duration_lst: durations of the new batches
+        :param expected_finish_lst: expected finish minute offsets of the new batches
+        :return: tuple (index of the first batch to solve again, durations and expected finish minute offsets
+                 of the batches from that index on)
+        """
+        prefix_duration = self._prefix_durations[start - 1] if start > 0 else 0
+        new_targets = _targets(duration_lst, expected_finish_lst, prefix_duration)
+        changed_min = min(new_targets + self._targets[start:])
+
+        first = decomposition.reusable_prefix(self._targets, self._prefix_max, start, changed_min)
+        return (first, self.duration_lst[first:start] + list(duration_lst),
+                self.expected_finish_lst[first:start] + list(expected_finish_lst))
+
+    def apply(self, first: int, duration_lst: list, expected_finish_lst: list, start_minutes: list,
+              delta_time_lst: list):
+        """
+        Replaces the batches from index `first` on, together with their solution.
+        :param start_minutes: start minute offsets of the new batches, with respect to the epoch of the schedule
+        :param delta_time_lst: delta times of the new batches
+        """
+        self._delta_time_sum += sum(delta_time_lst) - sum(self.delta_time[first:])
+        prefix_duration = self._prefix_durations[first - 1] if first > 0 else 0
+        new_targets = _targets(duration_lst, expected_finish_lst, prefix_duration)
+
+        for lst, tail in ((self.duration_lst, duration_lst), (self.expected_finish_lst, expected_finish_lst),
+                          (self.start_minutes, start_minutes), (self.delta_time, delta_time_lst),
+                          (self._targets, new_targets)):
+            del lst[first:]
+            lst.extend(tail)
+
+        del self._prefix_durations[first:]
+        self._prefix_durations.extend(prefix_duration + prefix for prefix in accumulate(duration_lst))
+        del self._prefix_max[first:]
+        previous_max = [self._prefix_max[-1]] if first > 0 else []
+        self._prefix_max.extend(list(accumulate(previous_max + new_targets, max))[len(previous_max):])
+
+        self.updated_at = time()
+
+
+def _targets(duration_lst: list, expected_finish_lst: list, prefix_duration: int = 0) -> List[int]:
+    """
+    :param prefix_duration: sum of the durations of the batches before the given ones
+    :return: list of the targets t_i = expected_finish_i - P_i of the given batches
+    """
+    return [expected_finish - prefix_duration - prefix
+            for expected_finish, prefix in zip(expected_finish_lst, accumulate(duration_lst))]
+
+
+class ScheduleStore:
+    """
+    In-memory store of the schedules, bounded by the total number of their batches, which their memory is
+    proportional to. When the bound is exceeded, the least recently used schedules are dropped.
+    Schedules that haven't been used for `ttl` seconds expire.
+    """
+
+    def __init__(self, max_batches: int, ttl: float):
+        """
+        :param max_batches: maximum number of batches of all the stored schedules
+        :param ttl: number of seconds after which an unused schedule expires. If it's 0, schedules never expire
+        """
+        self._max_batches = max_batches
+        self._ttl = ttl
+
+        # schedule id -> (schedule, number of batches accounted for it, last time it was used)
+        self._entries: OrderedDict = OrderedDict()
+        self._n_batches = 0
+
+        self._n_evictions: int = 0
+        self._n_expirations: int = 0
+
+    def get(self, schedule_id: str) -> Union[Schedule, None]:
+        self._purge()
+        entry = self._entries.get(schedule_id)
+        if entry is None:
+            return None
+
+        schedule, n_batches, _ = entry
+        self._entries[schedule_id] = (schedule, n_batches, monotonic())
+        self._entries.move_to_end(schedule_id)
+        return schedule
+
+    def put(self, schedule: Schedule) -> bool:
+        """
+        Stores a new schedule, or accounts for the current number of batches of an already stored one.
+        :return: False if the schedule has already been removed from the store, in which case it isn't stored again
+        """
+        if schedule.removed:
+            return False
+
+        entry = self._entries.get(schedule.id)
+        self._n_batches += schedule.n_batches - (entry[1] if entry is not None else 0)
+        self._entries[schedule.id] = (schedule, schedule.n_batches, monotonic())
+        self._entries.move_to_end(schedule.id)
+
+        # the given schedule is kept even if it exceeds the bound on its own
+        while self._n_batches > self._max_batches and len(self._entries) > 1:
+            self._pop_oldest()
+            self._n_evictions += 1
+        return True
+
+    def remove(self, schedule_id: str) -> Union[Schedule, None]:
+        entry = self._entries.pop(schedule_id, None)
+        if entry is None:
+            return None
+        schedule, n_batches, _ = entry
+        schedule.removed = True
+        self._n_batches -= n_batches
+        return schedule
+
+    def _pop_oldest(self):
+        _, (schedule, n_batches, _) = self._entries.popitem(last=False)
+        schedule.removed = True
+        self._n_batches -= n_batches
+
+    def _purge(self):
+        """
+        Removes the schedules that haven't been used for more than ttl seconds.
+        """
+        if self._ttl <= 0:
+            return
+        now = monotonic()
+        while len(self._entries) > 0:
+            _, _, used_at = next(iter(self._entries.values()))
+            if now - used_at <= self._ttl:
+                break
+            self._pop_oldest()
+            self._n_expirations += 1
+
+    def stats(self) -> dict:
+        self._purge()
+        return {
+            'size': len(self._entries),
+            'batches': self._n_batches,
+            'max_batches': self._max_batches,
+            'ttl': self._ttl,
+            'evictions': self._n_evictions,
+            'expirations': self._n_expirations,
+        }
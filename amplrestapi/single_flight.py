@@ -0,0 +1,77 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, Tuple
+
+
+class _Flight:
+    """
+    Running job of a SingleFlight, with the number of requests waiting for its result
+    and the deadline given to the job.
+    """
+
+    def __init__(self, future: asyncio.Future, deadline: float):
+        self.future = future
+        self.deadline = deadline
+        self.n_waiters: int = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent executions of the same job.
+    While a job identified by a key is running, every other request for the same key
+    waits for the result of the running job instead of starting a new one, unless the running job
+    may give up before the deadline of the request.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[Hashable, _Flight] = {}
+        self._n_executions: int = 0
+        self._n_coalesced: int = 0
+        self._n_abandoned: int = 0
+
+    async def do(self, key: Hashable, job: Callable[[], Awaitable], deadline: float = None) -> Tuple[object, bool]:
+        """
+        Runs job() unless a job with the same key and a deadline at least as late is already running,
+        in which case its result is shared. A job with an earlier deadline may stop before giving its best result,
+        so a new job is started instead, and the following requests for the same key wait for the new one.
+        The running job is shielded, so it isn't cancelled when one of its waiters gets cancelled.
+        When every waiter has been cancelled, e.g. because their clients disconnected, nobody needs its result
+        anymore and the job itself is cancelled.
+        :param key: hashable identifier of the job
+        :param job: function without arguments that returns an awaitable
+        :param deadline: UNIX time by which job() may stop early, or None if it never does
+        :return: tuple (result of the job, True if the result was shared with an already running job)
+        """
+        deadline = float('inf') if deadline is None else deadline
+        flight = self._in_flight.get(key)
+        coalesced = flight is not None and flight.deadline >= deadline
+        if coalesced:
+            self._n_coalesced += 1
+        else:
+            flight = _Flight(asyncio.ensure_future(job()), deadline)
+            self._in_flight[key] = flight
+            flight.future.add_done_callback(lambda _: self._forget(key, flight))
+            self._n_executions += 1
+
+        flight.n_waiters += 1
+        try:
+            return await asyncio.shield(flight.future), coalesced
+        except asyncio.CancelledError:
+            if not flight.future.done() and flight.n_waiters == 1:
+                self._n_abandoned += 1
+                flight.future.cancel()
+            raise
+        finally:
+            flight.n_waiters -= 1
+
+    def _forget(self, key: Hashable, flight: _Flight):
+        # a job with a later deadline may have replaced the finished one
+        if self._in_flight.get(key) is flight:
+            del self._in_flight[key]
+
+    def stats(self) -> dict:
+        return {
+            'in_flight': len(self._in_flight),
+            'executions': self._n_executions,
+            'coalesced': self._n_coalesced,
+            'abandoned': self._n_abandoned,
+        }
@@ -0,0 +1,22 @@
+from aiohttp import web, web_request
+from typing import Callable, Dict
+
+
+class StatsRouteHandler:
+    """
+    StatsRouteHandler exposes a REST interface to monitor the internal state of the server.
+    Every registered provider contributes a section of the response.
+    """
+
+    def __init__(self):
+        self._providers: Dict[str, Callable[[], dict]] = {}
+
+    def register(self, name: str, provider: Callable[[], dict]):
+        """
+        :param name: key of the response section filled by the given provider
+        :param provider: function without arguments that returns a JSON serializable dictionary
+        """
+        self._providers[name] = provider
+
+    async def run(self, request: web_request.Request):
+        return web.json_response({name: provider() for name, provider in self._providers.items()})
@@ -3,6 +3,11 @@ from typing import Callable
 import re
 import logging
 
+from amplwrapper.ampl_profile import AMPLProfile
+
+# compiled once, since output() is called for every message
+dual_simplex_iterations_regex = re.compile(r'([0-9]+) dual simplex iterations', re.MULTILINE)
+
 
 class AMPLOutputHandler(OutputHandler):
     """
@@ -10,15 +15,19 @@ class AMPLOutputHandler(OutputHandler):
     It also parses the solver output message to capture the number of dual simplex
     iterations performed by the CPLEX solver. That number is dispatched to the
     object that instantiated this object via the `n_iterations_consumer` consumer function.
+    While a profile is set, every message is also fed to it.
     """
 
     def __init__(self, n_iterations_consumer: Callable[[int], None]):
         self.n_iterations_consumer = n_iterations_consumer
+        self.profile: AMPLProfile = None
 
     def output(self, kind, msg):
+        if self.profile is not None:
+            self.profile.feed(msg)
+
         if kind == Kind.SOLVE:
-            regex = re.compile(r'([0-9]+) dual simplex iterations', re.MULTILINE)
-            matches = re.findall(regex, msg)
+            matches = dual_simplex_iterations_regex.findall(msg)
             logging.log(logging.DEBUG, msg)
 
             if len(matches) > 0:
@@ -0,0 +1,611 @@
+import asyncio
+import logging
+import math
+import os
+import signal
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import get_context
+from multiprocessing.util import Finalize
+from time import time
+from typing import Callable, Dict, List, Tuple, Union
+
+# Worker processes are forked, so that they inherit the already imported modules
+# and the solver functions don't need to be importable by a fresh interpreter.
+_mp_context = get_context('fork')
+
+
+class AMPLSessionError(RuntimeError):
+    """
+    Raised in the server process when a function executed by an AMPL session fails.
+    AMPL exceptions can't be safely pickled, so only their message crosses the process boundary.
+    """
+    pass
+
+
+class AMPLPoolSaturatedError(RuntimeError):
+    """
+    Raised when a request isn't admitted to the pool because too many requests are already waiting
+    for an idle AMPL session.
+    """
+
+    def __init__(self, message: str, retry_after: int):
+        """
+        :param retry_after: estimated number of seconds after which the pool may admit a new request
+        """
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AMPLPoolFullError(AMPLPoolSaturatedError):
+    """
+    Raised when the maximum number of requests waiting for an idle AMPL session has been reached.
+    """
+    pass
+
+
+class AMPLPoolTimeoutError(AMPLPoolSaturatedError):
+    """
+    Raised when a request waited for an idle AMPL session for longer than the maximum wait time.
+    """
+    pass
+
+
+# the resident memory of a worker process tree is measured at most once per interval, in seconds,
+# since it scans every process of the host
+rss_interval = 1.0
+
+
+def _create_ampl_wrapper():
+    # amplpy is imported by the worker processes only
+    from amplwrapper.ampl_wrapper import AMPLWrapper
+    return AMPLWrapper()
+
+
+def _process_group_rss(pgid: int) -> int:
+    """
+    :return: resident memory in bytes of the processes of the given process group, i.e. of a worker process and of
+             the AMPL and CPLEX processes it started, or 0 if /proc isn't available
+    """
+    try:
+        pids = [name for name in os.listdir('/proc') if name.isdigit()]
+    except OSError:
+        return 0
+
+    rss_pages = 0
+    for pid in pids:
+        try:
+            with open(f'/proc/{pid}/stat', 'r') as stat_file:
+                stat = stat_file.read()
+        except OSError:
+            # the process has already exited
+            continue
+        # the fields after the command name, which may contain spaces, start with the state, the ppid and the pgrp,
+        # and the rss in pages is the 24th field
+        fields = stat[stat.rfind(')') + 2:].split()
+        if int(fields[2]) == pgid:
+            rss_pages += int(fields[21])
+    return rss_pages * os.sysconf('SC_PAGE_SIZE')
+
+
+def _serve(conn, ampl_factory: Callable[[], object]):
+    """
+    Main loop of an AMPL worker process.
+    The AMPLWrapper instance is created lazily on the first request, so that the AMPL interpreter
+    is started in the worker process and never in the server process.
+    Each message is a (func, kwargs) tuple; func is called as func(ampl=ampl, **kwargs).
+    Each reply is a (success, result or error message, seconds spent, resident memory in bytes of the process group)
+    tuple. A None message stops the worker.
+    The worker leads its own process group, which also contains the AMPL and CPLEX processes it starts,
+    so that AMPLSession.interrupt() can kill them all at once.
+    :param conn: child end of the multiprocessing.Pipe shared with the AMPLSession object
+    :param ampl_factory: function that creates the AMPLWrapper instance, or any object with the same interface
+                         that the solver functions need
+    """
+    os.setpgrp()
+    ampl = None
+
+    def close_ampl():
+        if ampl is not None:
+            ampl.close()
+
+    # multiprocessing doesn't run atexit hooks in child processes, but it does run Finalize callbacks
+    Finalize(None, close_ampl, exitpriority=10)
+
+    rss = 0
+    rss_measured_at = 0.0
+    while True:
+        message = conn.recv()
+        if message is None:
+            break
+
+        func, kwargs = message
+        start = time()
+        try:
+            if ampl is None:
+                ampl = ampl_factory()
+            reply = (True, func(ampl=ampl, **kwargs))
+        except Exception as ex:
+            logging.log(logging.ERROR, f'AMPL worker {os.getpid()} failed: {ex}')
+            reply = (False, str(ex))
+        end = time()
+
+        # the memory is measured by the worker, after the call, so that the server process doesn't scan /proc
+        if end - rss_measured_at >= rss_interval:
+            rss = _process_group_rss(os.getpid())
+            rss_measured_at = end
+        conn.send(reply + (end - start, rss))
+
+
+class RecyclePolicy:
+    """
+    Limits past which an AMPL session is retired and replaced by a fresh one, since long-lived AMPL and CPLEX
+    processes may grow their memory or slow down over time. A limit that is 0 is disabled.
+    """
+
+    def __init__(self, max_solves: int = 0, max_rss: int = 0, max_latency_ratio: float = 0,
+                 latency_window: int = 100):
+        """
+        :param max_solves: number of requests served by a session since it started
+        :param max_rss: resident memory in bytes of the worker process of a session and of its AMPL and CPLEX processes
+        :param max_latency_ratio: ratio between the average solve time of the last `latency_window` requests served
+                                  by a session and of the first `latency_window` ones it served after it started
+        :param latency_window: number of requests of each average solve time
+        """
+        self.max_solves = max_solves
+        self.max_rss = max_rss
+        self.max_latency_ratio = max_latency_ratio
+        self.latency_window = latency_window
+
+    def reason(self, session: 'AMPLSession') -> Union[str, None]:
+        """
+        :return: the limit exceeded by the session, i.e. 'solves', 'rss' or 'latency', or None if it's healthy
+        """
+        if 0 < self.max_solves <= session.solves_since_start:
+            return 'solves'
+        if 0 < self.max_rss <= session.rss:
+            return 'rss'
+        latency_ratio = session.latency_ratio
+        if 0 < self.max_latency_ratio and latency_ratio is not None and latency_ratio >= self.max_latency_ratio:
+            return 'latency'
+        return None
+
+
+class AMPLSession:
+    """
+    Server-side handle of a single AMPL session that lives in its own worker process.
+    It also keeps track of how long requests waited for this session and how long they took to be solved,
+    and of the health of its worker process: the requests it served, its memory and its recent solve times.
+    """
+
+    def __init__(self, session_id: int, ampl_factory: Callable[[], object] = _create_ampl_wrapper,
+                 latency_window: int = 100):
+        """
+        :param latency_window: number of requests of the average solve times compared by AMPLSession.latency_ratio
+        """
+        self._session_id = session_id
+        self._ampl_factory = ampl_factory
+        self._latency_window = latency_window
+        self._start()
+
+        self._interrupted: bool = False
+        self._n_restarts: int = 0
+        self._n_recycles: int = 0
+        self._n_solves: int = 0
+        self._n_errors: int = 0
+        self._total_wait_time: float = 0.0
+        self._last_wait_time: float = 0.0
+        self._total_solve_time: float = 0.0
+        self._last_solve_time: float = 0.0
+
+    def _start(self):
+        self._conn, child_conn = _mp_context.Pipe()
+        self._process = _mp_context.Process(target=_serve, args=(child_conn, self._ampl_factory), daemon=True,
+                                            name=f'ampl-session-{self._session_id}')
+        self._process.start()
+        child_conn.close()
+
+        # health of the worker process, which starts over with every new process
+        self._solves_since_start: int = 0
+        self._rss: int = 0
+        self._first_solve_times: List[float] = []
+        self._recent_solve_times = deque(maxlen=self._latency_window)
+
+    @property
+    def session_id(self) -> int:
+        return self._session_id
+
+    @property
+    def pid(self) -> int:
+        return self._process.pid
+
+    def call(self, func: Callable, kwargs: dict):
+        """
+        Runs func(ampl=<session AMPLWrapper>, **kwargs) in the worker process and waits for its result.
+        This method is blocking, so it should be run in a thread executor.
+        :return: tuple (result, time in seconds spent by the worker process)
+        """
+        self._conn.send((func, kwargs))
+        success, result, solve_time, self._rss = self._conn.recv()
+        if not success:
+            raise AMPLSessionError(result)
+        return result, solve_time
+
+    def interrupt(self):
+        """
+        Kills the worker process while it's running a call, together with its AMPL and CPLEX processes.
+        The pending call fails, and the session must be restarted before it's used again.
+        """
+        self._interrupted = True
+        self._kill()
+
+    def _kill(self):
+        """
+        Kills the process group of the worker process, so that its AMPL and CPLEX processes don't outlive it.
+        """
+        try:
+            os.killpg(self._process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            # the worker may not have created its process group yet
+            self._process.kill()
+
+    @property
+    def needs_restart(self) -> bool:
+        """
+        :return: whether the worker process has been interrupted or has died, e.g. killed by the OOM killer
+        """
+        return self._interrupted or not self._process.is_alive()
+
+    def restart(self):
+        """
+        Replaces the worker process with a new one, whose AMPL session starts from a clean state.
+        """
+        if self._process.is_alive():
+            self._process.kill()
+        self._process.join(timeout=5)
+        self._conn.close()
+        self._start()
+        self._interrupted = False
+        self._n_restarts += 1
+
+    def recycle(self):
+        """
+        Replaces a healthy but worn out worker process with a new one, letting the old one close AMPL first.
+        This method is blocking, so it should be run in a thread executor.
+        """
+        self.close()
+        self._start()
+        self._n_recycles += 1
+
+    @property
+    def n_solves(self) -> int:
+        return self._n_solves
+
+    @property
+    def solves_since_start(self) -> int:
+        return self._solves_since_start
+
+    @property
+    def rss(self) -> int:
+        """
+        :return: resident memory in bytes of the worker process and of its AMPL and CPLEX processes,
+                 as measured by the worker after one of its last calls
+        """
+        return self._rss
+
+    @property
+    def latency_ratio(self) -> Union[float, None]:
+        """
+        :return: ratio between the average solve time of the last requests served by the worker process and of the
+                 first ones it served, or None until it has served enough requests for both averages
+        """
+        if len(self._first_solve_times) < self._latency_window or len(self._recent_solve_times) < self._latency_window:
+            return None
+        first_solve_time = sum(self._first_solve_times)
+        return sum(self._recent_solve_times) / first_solve_time if first_solve_time > 0 else None
+
+    @property
+    def total_solve_time(self) -> float:
+        return self._total_solve_time
+
+    def record(self, wait_time: float, solve_time: float, success: bool):
+        self._n_solves += 1
+        if not success:
+            self._n_errors += 1
+        self._total_wait_time += wait_time
+        self._last_wait_time = wait_time
+        self._total_solve_time += solve_time
+        self._last_solve_time = solve_time
+
+        self._solves_since_start += 1
+        if success:
+            if len(self._first_solve_times) < self._latency_window:
+                self._first_solve_times.append(solve_time)
+            self._recent_solve_times.append(solve_time)
+
+    def stats(self) -> dict:
+        n_solves = max(self._n_solves, 1)
+        return {
+            'id': self._session_id,
+            'pid': self.pid,
+            'solves': self._n_solves,
+            'errors': self._n_errors,
+            'restarts': self._n_restarts,
+            'recycles': self._n_recycles,
+            'solves_since_start': self._solves_since_start,
+            'rss': self._rss,
+            'latency_ratio': self.latency_ratio,
+            'last_wait_time': self._last_wait_time,
+            'avg_wait_time': self._total_wait_time / n_solves,
+            'last_solve_time': self._last_solve_time,
+            'avg_solve_time': self._total_solve_time / n_solves,
+        }
+
+    def close(self):
+        try:
+            self._conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self._process.join(timeout=5)
+        if self._process.is_alive():
+            # the worker didn't close AMPL in time, e.g. because it's stuck
+            self._kill()
+            self._process.join(timeout=5)
+        self._conn.close()
+
+
+class AMPLPool:
+    """
+    Pool of AMPL sessions, each one running in a dedicated worker process.
+    Requests are dispatched to the first idle session, so that up to `size` problems are solved in parallel,
+    while the event loop of the server is never blocked by a solve.
+    Sessions that exceed the limits of the recycle policy are replaced in the background once their request is over,
+    one at a time, so that at most one session is missing from the pool meanwhile.
+    """
+
+    def __init__(self, size: int, wait_observer: Callable[[float], None] = None,
+                 ampl_factory: Callable[[], object] = _create_ampl_wrapper, max_queued: int = 0,
+                 max_wait: float = 0, recycle_policy: RecyclePolicy = None,
+                 recycle_observer: Callable[[str], None] = None):
+        """
+        :param size: number of AMPL sessions. If it's 0, a session is created for each CPU core.
+        :param max_queued: maximum number of requests waiting for an idle session, 0 means unbounded.
+                           Further requests are rejected immediately with AMPLPoolFullError
+        :param max_wait: maximum number of seconds a request waits for an idle session, 0 means unbounded.
+                         Requests that wait longer are rejected with AMPLPoolTimeoutError
+        :param wait_observer: function called with the time in seconds each request waited for an idle session
+        :param ampl_factory: function called by each worker process to create its AMPLWrapper instance.
+                             The benchmarks replace it with a stand-in that doesn't need AMPL
+        :param recycle_policy: limits past which a session is replaced by a fresh one, None means never
+        :param recycle_observer: function called with the reason of each session replacement,
+                                 e.g. 'solves', 'rss' or 'latency'
+        """
+        self._size: int = size if size > 0 else (os.cpu_count() or 1)
+        self._recycle_policy = recycle_policy
+        latency_window = recycle_policy.latency_window if recycle_policy is not None else 100
+        self._sessions: List[AMPLSession] = [AMPLSession(i, ampl_factory, latency_window=latency_window)
+                                             for i in range(self._size)]
+
+        # every blocking AMPLSession.call runs in its own thread
+        self._executor = ThreadPoolExecutor(max_workers=self._size, thread_name_prefix='ampl-pool')
+
+        # the idle sessions queue is bound to the event loop, so it's created on first use
+        self._idle: asyncio.Queue = None
+        self._n_waiting: int = 0
+        self._wait_observer = wait_observer
+
+        self._max_queued = max_queued
+        self._max_wait = max_wait
+        self._n_rejected: int = 0
+        self._n_timed_out: int = 0
+        self._n_interrupted: int = 0
+
+        self._recycle_observer = recycle_observer
+        self._recycling: AMPLSession = None
+        self._n_recycles: Dict[str, int] = {}
+
+        # function and arguments that warm up each session, set by warm_up()
+        self._warm_up: Tuple[Callable, dict] = None
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def total_solve_time(self) -> float:
+        """
+        :return: seconds spent by the worker processes in the requests served by every session so far
+        """
+        return sum(session.total_solve_time for session in self._sessions)
+
+    def _idle_sessions(self) -> asyncio.Queue:
+        if self._idle is None:
+            self._idle = asyncio.Queue()
+            for session in self._sessions:
+                self._idle.put_nowait(session)
+        return self._idle
+
+    async def run(self, func: Callable, **kwargs):
+        """
+        Runs func(ampl=<AMPLWrapper>, **kwargs) in the first available AMPL session.
+        func and kwargs must be picklable, and so must be the returned value.
+        :param func: module level function that uses an AMPLWrapper instance
+        :return: the value returned by func
+        :raise AMPLPoolFullError: if max_queued requests are already waiting for a session
+        :raise AMPLPoolTimeoutError: if no session became idle within max_wait seconds
+        """
+        return await self._run(func, kwargs, admission_control=True)
+
+    async def run_background(self, func: Callable, **kwargs):
+        """
+        Same as run(), but the call waits for an idle session as long as needed, without the admission control
+        limits, e.g. for background jobs that are already queued elsewhere. It still counts as a waiting request
+        for the admission control of the other calls.
+        """
+        return await self._run(func, kwargs, admission_control=False)
+
+    async def _run(self, func: Callable, kwargs: dict, admission_control: bool):
+        idle = self._idle_sessions()
+
+        # an idle session is taken right away, unless other requests are already waiting for one
+        submitted_at = time()
+        session: AMPLSession = None
+        if self._n_waiting == 0 and not idle.empty():
+            session = idle.get_nowait()
+        if session is None:
+            session = await self._wait_for_session(idle, admission_control)
+        wait_time = time() - submitted_at
+        if self._wait_observer is not None:
+            self._wait_observer(wait_time)
+
+        return await self._call(session, func, kwargs, wait_time)
+
+    async def warm_up(self, func: Callable, **kwargs):
+        """
+        Runs func(ampl=<AMPLWrapper>, **kwargs) once in every idle AMPL session, e.g. to start AMPL and CPLEX
+        and to load the model before the first request. It's also run in every session that gets restarted,
+        before the session is given back to the pool.
+        Requests that arrive meanwhile wait for the first warm session.
+        :raise AMPLSessionError: if func fails in any session
+        """
+        self._warm_up = (func, kwargs)
+        idle = self._idle_sessions()
+        sessions = [idle.get_nowait() for _ in range(idle.qsize())]
+        await asyncio.gather(*[self._call(session, func, kwargs) for session in sessions])
+
+    async def _call(self, session: AMPLSession, func: Callable, kwargs: dict, wait_time: float = None):
+        """
+        Runs func in the given session, which is given back to the pool once the call is over.
+        :param wait_time: seconds the call waited for the session. If it's None, the call isn't a request,
+                          e.g. it's a warm up, and it isn't recorded in the session stats
+        """
+        loop = asyncio.get_event_loop()
+
+        # the call is shielded, so that the session is given back to the pool only once the worker process
+        # has actually stopped. If the request gets cancelled, e.g. because its client disconnected or its
+        # deadline passed, the running solve is interrupted and the session is restarted from a clean state
+        future = loop.run_in_executor(self._executor, session.call, func, kwargs)
+        future.add_done_callback(lambda f: self._release(session, wait_time, f))
+        try:
+            result, _ = await asyncio.shield(future)
+        except asyncio.CancelledError:
+            if not future.done():
+                self._n_interrupted += 1
+                session.interrupt()
+            raise
+        return result
+
+    async def _rewarm(self, session: AMPLSession):
+        func, kwargs = self._warm_up
+        try:
+            await self._call(session, func, kwargs)
+        except Exception as ex:
+            logging.log(logging.ERROR, f'AMPL session {session.session_id} failed to warm up: {ex}')
+
+    async def _wait_for_session(self, idle: asyncio.Queue, admission_control: bool = True) -> AMPLSession:
+        """
+        Waits for an idle session when every session is busy, applying the admission control limits.
+        :param admission_control: if False, the limits aren't applied and the call waits as long as needed
+        :raise AMPLPoolFullError: if max_queued requests are already waiting
+        :raise AMPLPoolTimeoutError: if no session became idle within max_wait seconds
+        """
+        if admission_control and 0 < self._max_queued <= self._n_waiting:
+            self._n_rejected += 1
+            raise AMPLPoolFullError(f'Too many problems are waiting to be solved ({self._n_waiting})',
+                                    retry_after=self._estimated_wait())
+
+        self._n_waiting += 1
+        try:
+            get_session = idle.get()
+            if admission_control and self._max_wait > 0:
+                get_session = asyncio.wait_for(get_session, timeout=self._max_wait)
+            return await get_session
+        except asyncio.TimeoutError:
+            self._n_timed_out += 1
+            raise AMPLPoolTimeoutError(f'No AMPL session became available within {self._max_wait} seconds',
+                                       retry_after=self._estimated_wait())
+        finally:
+            self._n_waiting -= 1
+
+    def _release(self, session: AMPLSession, wait_time: float, future: asyncio.Future):
+        success = future.exception() is None
+        solve_time = future.result()[1] if success else 0.0
+        if wait_time is not None:
+            session.record(wait_time=wait_time, solve_time=solve_time, success=success)
+            logging.log(logging.DEBUG, f'AMPL session {session.session_id}: waited {wait_time:.4f}s, '
+                                       f'solved in {solve_time:.4f}s')
+        if session.needs_restart:
+            logging.log(logging.WARNING, f'Restarting AMPL session {session.session_id}')
+            asyncio.ensure_future(self._replace_worker(session, session.restart))
+            return
+        elif wait_time is not None and self._recycle_policy is not None and self._recycling is None:
+            # the other sessions that exceed a limit are recycled after their next requests,
+            # one at a time: the guard is set before the recycle is scheduled, so no other session slips in
+            reason = self._recycle_policy.reason(session)
+            if reason is not None:
+                self._recycling = session
+                asyncio.ensure_future(self._recycle(session, reason))
+                return
+        self._idle.put_nowait(session)
+
+    async def _recycle(self, session: AMPLSession, reason: str):
+        """
+        Replaces the worker process of an idle session that exceeded a limit of the recycle policy,
+        and gives the session back to the pool once its new worker process is warm.
+        """
+        logging.log(logging.WARNING, f'Recycling AMPL session {session.session_id} (exceeded {reason} limit): '
+                                     f'{session.solves_since_start} solves, {session.rss / 2 ** 20:.0f} MiB, '
+                                     f'latency ratio {session.latency_ratio}')
+        self._n_recycles[reason] = self._n_recycles.get(reason, 0) + 1
+        if self._recycle_observer is not None:
+            self._recycle_observer(reason)
+        try:
+            await self._replace_worker(session, session.recycle)
+        finally:
+            self._recycling = None
+
+    async def _replace_worker(self, session: AMPLSession, replace: Callable[[], None]):
+        """
+        Replaces the worker process of an idle session, and gives the session back to the pool
+        once its new worker process is warm.
+        :param replace: method of the session that stops its worker process and starts a new one
+        """
+        loop = asyncio.get_event_loop()
+        try:
+            # stopping the old worker process may take a while, so it's done in the thread the session would use
+            await loop.run_in_executor(self._executor, replace)
+            if self._warm_up is not None:
+                # the session is given back to the pool by _call once it's warm
+                await self._rewarm(session)
+                return
+        except Exception as ex:
+            logging.log(logging.ERROR, f'AMPL session {session.session_id} failed to start a new worker: {ex}')
+        self._idle.put_nowait(session)
+
+    def _estimated_wait(self) -> int:
+        """
+        :return: estimated number of seconds before the requests that are waiting now get a session, at least 1
+        """
+        n_solves = sum(session.n_solves for session in self._sessions)
+        if n_solves == 0:
+            return 1
+        avg_solve_time = sum(session.total_solve_time for session in self._sessions) / n_solves
+        return max(1, math.ceil(avg_solve_time * (self._n_waiting + 1) / self._size))
+
+    def stats(self) -> dict:
+        n_idle = self._idle.qsize() if self._idle is not None else self._size
+        return {
+            'size': self._size,
+            'busy': self._size - n_idle,
+            'queue_depth': self._n_waiting,
+            'rejected': self._n_rejected,
+            'timed_out': self._n_timed_out,
+            'interrupted': self._n_interrupted,
+            'recycles': dict(self._n_recycles),
+            'sessions': [session.stats() for session in self._sessions],
+        }
+
+    def close(self):
+        for session in self._sessions:
+            session.close()
+        self._executor.shutdown(wait=False)
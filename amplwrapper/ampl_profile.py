@@ -0,0 +1,65 @@
+import re
+
+# the patterns are compiled once, since AMPL calls the output handler for every message it prints
+number = r'[0-9]*\.?[0-9]+(?:[eE][+-]?[0-9]+)?'
+
+# `option times 1;` prints a line with the seconds and the memory of each translation phase of a solve
+phase_regex = re.compile(rf'^\s*#*\s*(collect|genmod|merge|presolve|output|compile)\s+({number})',
+                         re.MULTILINE | re.IGNORECASE)
+
+# `option gentimes 1;` prints a line with the seconds taken to generate each model entity:
+# sequence number, seconds, cumulative seconds, memory increment and name
+entity_regex = re.compile(rf'^\s*#*\s*[0-9]+\s+({number})\s+{number}\s+[0-9]+\s+([A-Za-z_][A-Za-z0-9_]*)\s*$',
+                          re.MULTILINE)
+
+# `cplex_options 'timing=1'` prints the seconds spent by CPLEX reading the .nl file, solving and writing the .sol file
+solver_time_regex = re.compile(rf'^\s*(Input|Solve|Output)\s*=\s*({number})', re.MULTILINE)
+
+# e.g. '5 dual simplex iterations (0 in phase I)', '12 simplex iterations', '8 barrier iterations'
+iterations_regex = re.compile(r'([0-9]+) (dual simplex|simplex|barrier) iterations')
+
+# translation phases that AMPL goes through before writing the .nl file for the solver
+translation_phases = ('collect', 'genmod', 'merge', 'presolve', 'compile')
+
+
+class AMPLProfile:
+    """
+    Collects the timing statistics that AMPL and CPLEX print during a solve, when the `times` and `gentimes`
+    options of AMPL and the `timing` option of CPLEX are on.
+    """
+
+    def __init__(self):
+        self._phases = {}
+        self._entities = {}
+        self._solver_times = {}
+        self._iterations = {}
+
+    def feed(self, msg: str):
+        """
+        :param msg: message printed by AMPL or by the solver
+        """
+        for phase, seconds in phase_regex.findall(msg):
+            phase = phase.lower()
+            self._phases[phase] = self._phases.get(phase, 0.0) + float(seconds)
+        for seconds, name in entity_regex.findall(msg):
+            self._entities[name] = self._entities.get(name, 0.0) + float(seconds)
+        for name, seconds in solver_time_regex.findall(msg):
+            self._solver_times[name.lower()] = float(seconds)
+        for n_iterations, method in iterations_regex.findall(msg):
+            self._iterations[f'{method.replace(" ", "_")}_iterations'] = int(n_iterations)
+
+    def to_dict(self) -> dict:
+        """
+        :return: dictionary with the 'ampl' translation breakdown (seconds spent translating the model, writing the
+                 .nl file, in each phase and generating each entity) and the 'solver' breakdown (seconds spent
+                 by CPLEX reading its input, solving and writing its output, and its iterations)
+        """
+        return {
+            'ampl': {
+                'translation': sum(self._phases.get(phase, 0.0) for phase in translation_phases),
+                'nl_write': self._phases.get('output', 0.0),
+                'phases': dict(self._phases),
+                'entities': dict(self._entities),
+            },
+            'solver': dict(self._solver_times, **self._iterations),
+        }
@@ -2,6 +2,7 @@ from amplpy import AMPL
 
 from amplwrapper.ampl_error_handler import AMPLErrorHandler
 from amplwrapper.ampl_output_handler import AMPLOutputHandler
+from amplwrapper.ampl_profile import AMPLProfile
 
 
 class AMPLWrapper:
@@ -33,10 +34,21 @@ class AMPLWrapper:
 
         self._n_iterations: int = 0
 
+        """
+        Options of the CPLEX driver, joined into the cplex_options AMPL option whenever one changes.
+        """
+        self._cplex_options = {}
+
+        """
+        Name of the model whose declarations are currently loaded in AMPL, if any.
+        """
+        self._loaded_model: str = None
+
         """
         Add class that handles AMPL outputs
         """
-        self._ampl.setOutputHandler(AMPLOutputHandler(self.set_n_iterations))
+        self._output_handler = AMPLOutputHandler(self.set_n_iterations)
+        self._ampl.setOutputHandler(self._output_handler)
 
         """
         Add class that handles errors and warnings that may occur during the AMPL execution.
@@ -54,12 +66,75 @@ class AMPLWrapper:
     def ampl(self):
         return self._ampl
 
+    @property
+    def loaded_model(self):
+        return self._loaded_model
+
     def reset(self):
         self.ampl.reset()
+        self._loaded_model = None
+
+    def load_model(self, name: str, statements: str):
+        """
+        Loads the declarations of a model, unless the same model is already loaded.
+        Loading a model removes every previous declaration and data.
+        :param name: name that identifies the model
+        :param statements: AMPL statements that declare the model
+        """
+        if self._loaded_model == name:
+            return
+        self.reset()
+        self.eval(statements)
+        self._loaded_model = name
+
+    def reset_data(self):
+        """
+        Removes every data from the loaded model, keeping its declarations.
+        """
+        self.eval('reset data;')
 
     def eval(self, statements: str):
         self.ampl.eval(statements)
 
+    def set_time_limit(self, seconds: float = None):
+        """
+        Limits the time CPLEX spends on the next solves. When the limit is hit, CPLEX stops and returns its
+        current solution, and the AMPL solve_result is 'limit'.
+        :param seconds: time limit in seconds, None to remove it
+        """
+        self._set_cplex_option('timelimit', f'{seconds:.3f}' if seconds is not None else None)
+
+    def start_profile(self):
+        """
+        Turns on the timing statistics of AMPL and CPLEX, which are collected until stop_profile() is called.
+        """
+        self._output_handler.profile = AMPLProfile()
+        self._ampl.setOption('times', 1)
+        self._ampl.setOption('gentimes', 1)
+        self._set_cplex_option('timing', 1)
+
+    def stop_profile(self) -> dict:
+        """
+        Turns off the timing statistics of AMPL and CPLEX.
+        :return: the statistics collected since start_profile(), as returned by AMPLProfile.to_dict()
+        """
+        profile = self._output_handler.profile
+        self._output_handler.profile = None
+        self._ampl.setOption('times', 0)
+        self._ampl.setOption('gentimes', 0)
+        self._set_cplex_option('timing', None)
+        return profile.to_dict() if profile is not None else {}
+
+    def _set_cplex_option(self, name: str, value=None):
+        """
+        :param value: value of the option, None to remove it
+        """
+        if value is None:
+            self._cplex_options.pop(name, None)
+        else:
+            self._cplex_options[name] = value
+        self._ampl.setOption('cplex_options', ' '.join(f'{key}={value}' for key, value in self._cplex_options.items()))
+
     def solve(self) -> float:
         from time import time
         # Wait for the solution to complete
@@ -77,6 +152,20 @@ class AMPLWrapper:
     def get_variable_values(self, variable):
         return self.ampl.getVariable(variable).getValues()
 
+    def get_data(self, *statements):
+        """
+        Get the data corresponding to the display statements. The statements
+        can be AMPL expressions, or entities. It captures the equivalent of the
+        command display ds1, ..., dsn in a single DataFrame.
+
+        Args:
+            statements: AMPL expressions sharing the same indexing set.
+
+        Returns:
+            DataFrame with one index column and one column for each statement.
+        """
+        return self.ampl.getData(*statements)
+
     def get_value(self, scalar_expression):
         """
         Get a scalar value from the underlying AMPL interpreter, as a double or
@@ -0,0 +1,60 @@
+from time import sleep, time
+
+from ampljit import native
+
+
+class FakeAMPLWrapper:
+    """
+    Stand-in for AMPLWrapper in the AMPL sessions of the benchmarks, so that they run without an AMPL license.
+    Solves are delegated to the exact native solver and, optionally, slowed down to mimic the latency of CPLEX.
+    """
+
+    def __init__(self, base_latency: float = 0.0, latency_per_batch: float = 0.0):
+        """
+        :param base_latency: seconds added to each solve
+        :param latency_per_batch: seconds added to each solve for each batch of the instance
+        """
+        self.base_latency = base_latency
+        self.latency_per_batch = latency_per_batch
+        self.n_solves: int = 0
+
+    def close(self):
+        pass
+
+
+class FakeAMPLFactory:
+    """
+    Picklable factory of FakeAMPLWrapper instances, to be given to AMPLPool as its `ampl_factory`.
+    """
+
+    def __init__(self, base_latency: float = 0.0, latency_per_batch: float = 0.0):
+        self.base_latency = base_latency
+        self.latency_per_batch = latency_per_batch
+
+    def __call__(self) -> FakeAMPLWrapper:
+        return FakeAMPLWrapper(base_latency=self.base_latency, latency_per_batch=self.latency_per_batch)
+
+
+def solve_canonical(ampl: FakeAMPLWrapper, n_batches: int, wrong_time_fee: int, duration_lst: list,
+                    expected_finish_lst: list, deadline: float = None, **kwargs) -> dict:
+    """
+    JIT solver with the same interface of ampljit.model.solve_canonical(), that runs in the sessions of a pool
+    created with FakeAMPLFactory. The warm start arguments of ampljit.model.solve_persistent() are ignored.
+    If the deadline comes before the end of the simulated latency, the solve stops there and its result
+    is marked as time limited, like CPLEX would do.
+    """
+    latency = ampl.base_latency + ampl.latency_per_batch * n_batches
+    time_limited = deadline is not None and time() + latency > deadline
+    if time_limited:
+        latency = max(deadline - time(), 0.0)
+    if latency > 0:
+        sleep(latency)
+    ampl.n_solves += 1
+
+    result = native.solve_canonical(n_batches=n_batches, wrong_time_fee=wrong_time_fee, duration_lst=duration_lst,
+                                    expected_finish_lst=expected_finish_lst)
+    result['computation_duration'] += latency
+    if time_limited:
+        result['status'] = 'time_limit'
+    result['stages']['solve'] = result['computation_duration']
+    return result
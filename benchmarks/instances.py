@@ -0,0 +1,52 @@
+import random
+import numpy as np
+
+from ampljit import utils
+
+# number of batches of the generated instances, from the usual request to the largest accepted one
+sizes = (10, 100, 1000, 10000, 100000)
+
+# first expected finish datetime of the generated instances
+start_datetime = np.datetime64('2019-08-22T08:00', 'm')
+
+
+def generate_instance(n_batches: int, seed: int = 0, wrong_time_fee: int = 750, max_duration: int = 120,
+                      slack: float = 1.0) -> dict:
+    """
+    Generates a random, valid JIT instance in the JSON format of the /problems/jit route.
+    The expected finish datetimes are strictly ascending, and the gap between two of them is drawn between
+    1 minute and (1 + slack) times the duration of the batch, so that some batches are necessarily early or late.
+    :param n_batches: number of batches
+    :param seed: seed of the random generator, so that the same arguments always generate the same instance
+    :param wrong_time_fee: fee to pay for each minute early or late
+    :param max_duration: maximum duration of a batch, in minutes
+    :param slack: how loose the expected finish datetimes are with respect to the durations
+    """
+    instance = generate_binary_instance(n_batches, seed=seed, wrong_time_fee=wrong_time_fee,
+                                        max_duration=max_duration, slack=slack)
+    expected_finish_arr = np.array(instance['expected_finish'], dtype=np.int64).astype('datetime64[m]')
+    instance['expected_finish'] = utils.datetimes_to_strings(expected_finish_arr, utils.iso_datetime_format)
+    return instance
+
+
+def generate_binary_instance(n_batches: int, seed: int = 0, wrong_time_fee: int = 750, max_duration: int = 120,
+                             slack: float = 1.0) -> dict:
+    """
+    Same as generate_instance(), but the expected finish datetimes are minutes since the Unix epoch,
+    as they're sent in the binary formats of the /problems/jit route.
+    """
+    rng = random.Random(seed)
+    duration_lst = [rng.randint(1, max_duration) for _ in range(n_batches)]
+
+    expected_finish_lst = []
+    expected_finish = int(start_datetime.astype(np.int64))
+    for duration in duration_lst:
+        expected_finish += rng.randint(1, max(1, int(duration * (1 + slack))))
+        expected_finish_lst.append(expected_finish)
+
+    return {
+        'n_batches': n_batches,
+        'wrong_time_fee': wrong_time_fee,
+        'duration': duration_lst,
+        'expected_finish': expected_finish_lst,
+    }
@@ -0,0 +1,168 @@
+"""
+Load generator for the /problems/jit route, reporting throughput and latency percentiles.
+By default it starts an in-process server whose AMPL sessions are replaced by a stand-in backend,
+so that it runs on any Linux machine. Run with `python -m benchmarks.load --help`.
+"""
+from argparse import ArgumentParser
+from collections import Counter
+from time import perf_counter
+import asyncio
+import socket
+import sys
+import aiohttp
+import numpy as np
+from aiohttp import web
+
+from amplrestapi import codecs, metrics
+from amplrestapi.main import init
+from amplrestapi.models.registry import ModelRegistry
+from amplwrapper.ampl_pool import AMPLPool
+from benchmarks import fake_backend
+from benchmarks.instances import generate_binary_instance, generate_instance
+from config.config import Config
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+async def start_server(pool_size: int, base_latency: float, latency_per_batch: float):
+    """
+    Starts the REST server in the current event loop, with a pool of stand-in AMPL sessions.
+    Only the JIT problem is served, since the stand-in sessions can't solve the other models.
+    :return: tuple (aiohttp AppRunner to clean up at the end, URL of the server)
+    """
+    pool = AMPLPool(size=pool_size, wait_observer=metrics.pool_wait_duration.observe,
+                    ampl_factory=fake_backend.FakeAMPLFactory(base_latency, latency_per_batch),
+                    max_queued=Config.pool_max_queued(), max_wait=Config.pool_max_wait())
+    app, _, _ = init(pool=pool, jit_solver=fake_backend.solve_canonical, registry=ModelRegistry())
+
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    port = _free_port()
+    await web.TCPSite(runner, '127.0.0.1', port).start()
+    return runner, f'http://127.0.0.1:{port}'
+
+
+async def generate_load(url: str, bodies: list, media_type: str, concurrency: int, n_requests: int,
+                        duration: float) -> dict:
+    """
+    Sends the given bodies in a round robin fashion from `concurrency` concurrent clients, until either
+    n_requests have been sent or duration seconds have elapsed.
+    :return: dictionary with the latencies in seconds and the status of each request, and the total elapsed time
+    """
+    latencies = []
+    statuses = Counter()
+    headers = {'Content-Type': media_type, 'Accept': media_type}
+    next_request = 0
+    started_at = perf_counter()
+
+    async def client(session: aiohttp.ClientSession):
+        nonlocal next_request
+        while next_request < n_requests and perf_counter() - started_at < duration:
+            body = bodies[next_request % len(bodies)]
+            next_request += 1
+
+            request_started_at = perf_counter()
+            try:
+                async with session.post(f'{url}/problems/jit', data=body, headers=headers) as response:
+                    await response.read()
+                    statuses[response.status] += 1
+            except aiohttp.ClientError as ex:
+                statuses[type(ex).__name__] += 1
+            latencies.append(perf_counter() - request_started_at)
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        await asyncio.gather(*[client(session) for _ in range(concurrency)])
+
+    return {'latencies': latencies, 'statuses': statuses, 'elapsed': perf_counter() - started_at}
+
+
+def report(result: dict) -> dict:
+    latencies = np.array(result['latencies']) * 1000
+    n_requests = len(latencies)
+    summary = {
+        'requests': n_requests,
+        'elapsed': result['elapsed'],
+        'throughput': n_requests / result['elapsed'] if result['elapsed'] > 0 else 0.0,
+        'p50': float(np.percentile(latencies, 50)) if n_requests else 0.0,
+        'p90': float(np.percentile(latencies, 90)) if n_requests else 0.0,
+        'p99': float(np.percentile(latencies, 99)) if n_requests else 0.0,
+        'max': float(latencies.max()) if n_requests else 0.0,
+        'statuses': dict(result['statuses']),
+    }
+    print(f'requests:   {summary["requests"]} in {summary["elapsed"]:.2f} s')
+    print(f'throughput: {summary["throughput"]:.1f} req/s')
+    print(f'latency:    p50 {summary["p50"]:.2f} ms, p90 {summary["p90"]:.2f} ms, '
+          f'p99 {summary["p99"]:.2f} ms, max {summary["max"]:.2f} ms')
+    print(f'statuses:   {summary["statuses"]}')
+    return summary
+
+
+async def run(args) -> dict:
+    binary = args.format == 'msgpack'
+    media_type = codecs.msgpack_media_type if binary else codecs.json_media_type
+    generate = generate_binary_instance if binary else generate_instance
+
+    # distinct instances are generated with different seeds, so that they don't share the cached results
+    bodies = []
+    for seed in range(args.distinct):
+        instance = generate(args.batches, seed=seed)
+        if args.solver is not None:
+            instance['solver'] = args.solver
+        bodies.append(codecs.encode(instance, media_type))
+
+    runner = None
+    url = args.url
+    if url is None:
+        runner, url = await start_server(args.pool_size, args.base_latency, args.latency_per_batch)
+
+    try:
+        result = await generate_load(url, bodies, media_type, concurrency=args.concurrency,
+                                     n_requests=args.requests, duration=args.duration)
+    finally:
+        if runner is not None:
+            await runner.cleanup()
+
+    return report(result)
+
+
+def main():
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument('--url', help='URL of a running server. If it\'s not given, an in-process server '
+                                      'with stand-in AMPL sessions is started')
+    parser.add_argument('--batches', type=int, default=100, help='number of batches of each instance')
+    parser.add_argument('--distinct', type=int, default=1000, help='number of distinct instances to send')
+    parser.add_argument('--format', choices=['json', 'msgpack'], default='json', help='format of the requests')
+    parser.add_argument('--solver', choices=['ampl', 'native'], help='solver requested by each instance')
+    parser.add_argument('--concurrency', type=int, default=16, help='number of concurrent clients')
+    parser.add_argument('--requests', type=int, default=2000, help='maximum number of requests to send')
+    parser.add_argument('--duration', type=float, default=30.0, help='maximum duration of the test, in seconds')
+    parser.add_argument('--pool-size', type=int, default=0, help='stand-in AMPL sessions of the in-process server, '
+                                                                 '0 for one per CPU core')
+    parser.add_argument('--base-latency', type=float, default=0.005,
+                        help='seconds added to each stand-in solve, to mimic the latency of AMPL and CPLEX')
+    parser.add_argument('--latency-per-batch', type=float, default=0.00002,
+                        help='seconds added to each stand-in solve for each batch')
+    parser.add_argument('--max-p99', type=float, help='fails if the p99 latency in milliseconds exceeds this value')
+    parser.add_argument('--min-throughput', type=float, help='fails if the throughput in req/s is below this value')
+    args = parser.parse_args()
+
+    summary = asyncio.get_event_loop().run_until_complete(run(args))
+
+    failures = []
+    if args.max_p99 is not None and summary['p99'] > args.max_p99:
+        failures.append(f'p99 latency {summary["p99"]:.2f} ms exceeds {args.max_p99:.2f} ms')
+    if args.min_throughput is not None and summary['throughput'] < args.min_throughput:
+        failures.append(f'throughput {summary["throughput"]:.1f} req/s is below {args.min_throughput:.1f} req/s')
+    for failure in failures:
+        print(f'Failure: {failure}', file=sys.stderr)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+Microbenchmarks of the Python side of the JIT route, stage by stage, for instances of increasing size.
+Run with `python -m benchmarks.micro`. AMPL isn't needed: the solve stage uses the native solver.
+"""
+from argparse import ArgumentParser
+from time import perf_counter
+from typing import Callable, Dict
+import json
+import sys
+
+from ampljit import model as jit_model, native as jit_native, utils as jit_utils
+from amplrestapi import codecs
+from amplrestapi.jit.route_handler import validate_binary, validate_json
+from benchmarks.instances import generate_binary_instance, generate_instance, sizes
+
+stages = ('parse', 'validate', 'preprocess', 'canonical_form', 'solve', 'build_response', 'serialize',
+          'parse_msgpack', 'validate_msgpack', 'preprocess_msgpack', 'serialize_msgpack')
+
+
+def measure(func: Callable[[], object], min_time: float = 0.2, min_repeat: int = 3) -> float:
+    """
+    Runs func repeatedly, for at least min_time seconds and min_repeat times.
+    :return: the best time of a single run, in milliseconds
+    """
+    best = float('inf')
+    total = 0.0
+    repeat = 0
+    while total < min_time or repeat < min_repeat:
+        start = perf_counter()
+        func()
+        elapsed = perf_counter() - start
+        best = min(best, elapsed)
+        total += elapsed
+        repeat += 1
+    return best * 1000
+
+
+def run(n_batches: int, min_time: float) -> Dict[str, float]:
+    """
+    :return: dictionary that maps each stage to its best time in milliseconds, for an instance with n_batches
+    """
+    instance = generate_instance(n_batches)
+    binary_instance = generate_binary_instance(n_batches)
+    body = codecs.encode(instance, codecs.json_media_type)
+    binary_body = codecs.encode(binary_instance, codecs.msgpack_media_type)
+
+    epoch, utc_offset, expected_finish_lst = jit_model.preprocess(instance['expected_finish'])
+    canonical_key, first_minutes = jit_utils.canonical_instance(instance['wrong_time_fee'], instance['duration'],
+                                                                expected_finish_lst)
+    result = jit_native.solve_canonical(n_batches, instance['wrong_time_fee'], instance['duration'],
+                                        list(canonical_key[2]))
+    response = jit_model.build_response(result, epoch, utc_offset, start_minutes_offset=first_minutes)
+    binary_response = jit_model.build_response(result, epoch, utc_offset, start_minutes_offset=first_minutes,
+                                               epoch_minutes=True)
+
+    benchmarks = {
+        'parse': lambda: codecs.decode(body, codecs.json_media_type),
+        'validate': lambda: validate_json(instance),
+        'preprocess': lambda: jit_model.preprocess(instance['expected_finish']),
+        'canonical_form': lambda: jit_utils.canonical_instance(instance['wrong_time_fee'], instance['duration'],
+                                                               expected_finish_lst),
+        'solve': lambda: jit_native.solve_canonical(n_batches, instance['wrong_time_fee'], instance['duration'],
+                                                    list(canonical_key[2])),
+        'build_response': lambda: jit_model.build_response(result, epoch, utc_offset,
+                                                           start_minutes_offset=first_minutes),
+        'serialize': lambda: codecs.encode(response, codecs.json_media_type),
+        'parse_msgpack': lambda: codecs.decode(binary_body, codecs.msgpack_media_type),
+        'validate_msgpack': lambda: validate_binary(binary_instance),
+        'preprocess_msgpack': lambda: jit_model.preprocess_epoch_minutes(binary_instance['expected_finish']),
+        'serialize_msgpack': lambda: codecs.encode(binary_response, codecs.msgpack_media_type),
+    }
+    return {stage: measure(benchmarks[stage], min_time) for stage in stages}
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """
+    :return: list of descriptions of the stages that are slower than the baseline by more than tolerance
+    """
+    regressions = []
+    for n_batches, timings in results.items():
+        for stage, elapsed in timings.items():
+            expected = baseline.get(n_batches, {}).get(stage)
+            if expected is not None and elapsed > expected * (1 + tolerance):
+                regressions.append(f'{stage} with {n_batches} batches: {elapsed:.3f} ms, '
+                                   f'baseline {expected:.3f} ms')
+    return regressions
+
+
+def main():
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=sizes, help='numbers of batches of the instances')
+    parser.add_argument('--min-time', type=float, default=0.2, help='seconds spent measuring each stage')
+    parser.add_argument('--output', help='writes the results to this JSON file')
+    parser.add_argument('--baseline', help='JSON file written by a previous run with --output')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='relative slowdown with respect to the baseline that is reported as a regression')
+    args = parser.parse_args()
+
+    results = {}
+    print('| batches | ' + ' | '.join(stages) + ' |')
+    print('|--------:|' + '|'.join('-' * (len(stage) + 1) + ':' for stage in stages) + '|')
+    for n_batches in args.sizes:
+        timings = run(n_batches, args.min_time)
+        results[str(n_batches)] = timings
+        print(f'| {n_batches} | ' + ' | '.join(f'{timings[stage]:.3f}' for stage in stages) + ' |', flush=True)
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, 'r') as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.tolerance)
+        for regression in regressions:
+            print(f'Regression: {regression}', file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -28,3 +28,256 @@ class Config:
         :return: Port exposed by the REST server
         """
         return cls.config['app']['port'].get()
+
+    @classmethod
+    def client_max_size(cls):
+        """"
+        :return: Maximum size in bytes of a request body
+        """
+        return cls.config['app']['client_max_size'].get(int)
+
+    @classmethod
+    def log_level(cls):
+        """"
+        :return: Logging level of the server
+        """
+        return cls.config['app']['log_level'].as_choice(['DEBUG', 'INFO', 'WARNING', 'ERROR'])
+
+    @classmethod
+    def warm_up(cls):
+        """"
+        :return: Whether the solver sessions are warmed up at startup
+        """
+        return cls.config['app']['warm_up'].get(bool)
+
+    @classmethod
+    def pool_size(cls):
+        """"
+        :return: Number of AMPL sessions shared by the JIT problem and the other models, 0 means one per CPU core
+        """
+        return cls.config['pool']['size'].get(int)
+
+    @classmethod
+    def pool_max_queued(cls):
+        """"
+        :return: Maximum number of problems waiting for an idle AMPL session, 0 means unbounded
+        """
+        return cls.config['pool']['max_queued'].get(int)
+
+    @classmethod
+    def pool_max_wait(cls):
+        """"
+        :return: Maximum number of seconds a problem waits for an idle AMPL session, 0 means unbounded
+        """
+        return cls.config['pool']['max_wait'].as_number()
+
+    @classmethod
+    def pool_recycle_max_solves(cls):
+        """"
+        :return: Number of problems solved by an AMPL session before it's replaced, 0 means never
+        """
+        return cls.config['pool']['recycle']['max_solves'].get(int)
+
+    @classmethod
+    def pool_recycle_max_rss_mb(cls):
+        """"
+        :return: Resident memory in MiB of the processes of an AMPL session past which it's replaced, 0 means never
+        """
+        return cls.config['pool']['recycle']['max_rss_mb'].as_number()
+
+    @classmethod
+    def pool_recycle_max_latency_ratio(cls):
+        """"
+        :return: Ratio between the recent and the first average solve times of an AMPL session past which it's
+                 replaced, 0 means never
+        """
+        return cls.config['pool']['recycle']['max_latency_ratio'].as_number()
+
+    @classmethod
+    def pool_recycle_latency_window(cls):
+        """"
+        :return: Number of problems of each average solve time compared by pool.recycle.max_latency_ratio
+        """
+        return cls.config['pool']['recycle']['latency_window'].get(int)
+
+    @classmethod
+    def cache_enabled(cls):
+        """"
+        :return: Whether the results of already solved problems are cached
+        """
+        return cls.config['cache']['enabled'].get(bool)
+
+    @classmethod
+    def cache_max_size(cls):
+        """"
+        :return: Maximum number of cached results
+        """
+        return cls.config['cache']['max_size'].get(int)
+
+    @classmethod
+    def cache_ttl(cls):
+        """"
+        :return: Seconds after which a cached result expires, 0 means never
+        """
+        return cls.config['cache']['ttl'].get(int)
+
+    @classmethod
+    def models_package(cls):
+        """"
+        :return: Name of the Python package whose subpackages are the AMPL models served by the server
+        """
+        return cls.config['models']['package'].get(str)
+
+    @classmethod
+    def models_weights(cls):
+        """"
+        :return: Dictionary with the weight of each model in the share of the AMPL sessions, by model name
+        """
+        return cls.config['models']['weights'].get(dict)
+
+    @classmethod
+    def jit_persistent_model(cls):
+        """"
+        :return: Whether the JIT model is loaded only once per AMPL session
+        """
+        return cls.config['jit']['persistent_model'].get(bool)
+
+    @classmethod
+    def warm_start_max_size(cls):
+        """"
+        :return: Maximum number of schedules whose last optimal basis is kept
+        """
+        return cls.config['warm_start']['max_size'].get(int)
+
+    @classmethod
+    def warm_start_ttl(cls):
+        """"
+        :return: Seconds after which a kept basis expires, 0 means never
+        """
+        return cls.config['warm_start']['ttl'].get(int)
+
+    @classmethod
+    def jit_solver(cls):
+        """"
+        :return: Name of the solver used when a JIT request doesn't specify one, either 'ampl', 'native' or 'highs'
+        """
+        return cls.config['jit']['solver'].as_choice(['ampl', 'native', 'highs'])
+
+    @classmethod
+    def decomposition_min_batches(cls):
+        """"
+        :return: Minimum number of batches of a JIT instance that is split into independent blocks, 0 means never
+        """
+        return cls.config['decomposition']['min_batches'].get(int)
+
+    @classmethod
+    def decomposition_min_block_size(cls):
+        """"
+        :return: Minimum number of batches of each independent block
+        """
+        return cls.config['decomposition']['min_block_size'].get(int)
+
+    @classmethod
+    def stream_min_batches(cls):
+        """"
+        :return: Minimum number of batches of a JIT instance whose JSON response is streamed, 0 means never
+        """
+        return cls.config['stream']['min_batches'].get(int)
+
+    @classmethod
+    def stream_chunk_size(cls):
+        """"
+        :return: Number of array items converted and serialized at a time by a streamed response
+        """
+        return cls.config['stream']['chunk_size'].get(int)
+
+    @classmethod
+    def deadline_default(cls):
+        """"
+        :return: Deadline in seconds of the JIT problems that don't set one, 0 means no deadline
+        """
+        return cls.config['deadline']['default'].as_number()
+
+    @classmethod
+    def deadline_margin(cls):
+        """"
+        :return: Seconds of each deadline reserved for reading the solution and sending the response
+        """
+        return cls.config['deadline']['margin'].as_number()
+
+    @classmethod
+    def highs_threads(cls):
+        """"
+        :return: Number of threads that run HiGHS solves at the same time, 0 means one per CPU core
+        """
+        return cls.config['highs']['threads'].get(int)
+
+    @classmethod
+    def batch_max_size(cls):
+        """"
+        :return: Maximum number of JIT instances in a single batch request
+        """
+        return cls.config['batch']['max_size'].get(int)
+
+    @classmethod
+    def schedules_max_batches(cls):
+        """"
+        :return: Maximum number of batches of all the schedules kept by the server
+        """
+        return cls.config['schedules']['max_batches'].get(int)
+
+    @classmethod
+    def schedules_ttl(cls):
+        """"
+        :return: Seconds after which an unused schedule expires, 0 means never
+        """
+        return cls.config['schedules']['ttl'].get(int)
+
+    @classmethod
+    def jobs_workers(cls):
+        """"
+        :return: Number of jobs that may run at the same time, 0 means one per AMPL session
+        """
+        return cls.config['jobs']['workers'].get(int)
+
+    @classmethod
+    def jobs_max_queued(cls):
+        """"
+        :return: Maximum number of jobs waiting to run
+        """
+        return cls.config['jobs']['max_queued'].get(int)
+
+    @classmethod
+    def jobs_max_retained(cls):
+        """"
+        :return: Maximum number of finished jobs whose result is retained
+        """
+        return cls.config['jobs']['max_retained'].get(int)
+
+    @classmethod
+    def jobs_retention(cls):
+        """"
+        :return: Seconds a finished job is retained for
+        """
+        return cls.config['jobs']['retention'].get(int)
+
+    @classmethod
+    def debug_token(cls):
+        """"
+        :return: Bearer token that authorizes the requests to /debug/profile, empty if the route is disabled
+        """
+        return cls.config['debug']['token'].get(str)
+
+    @classmethod
+    def debug_max_duration(cls):
+        """"
+        :return: Maximum number of seconds of a profile of the server
+        """
+        return cls.config['debug']['max_duration'].as_number()
+
+    @classmethod
+    def debug_slow_request_threshold(cls):
+        """"
+        :return: Seconds a request may block the event loop before it's logged with its stages, 0 means never
+        """
+        return cls.config['debug']['slow_request_threshold'].as_number()
@@ -12,7 +12,16 @@ install_requires = ['aiohttp==3.5.4',
                     'amplpy==0.6.7',
                     'asyncio==3.4.3',
                     'confuse==1.0.0',
-                    'jsonschema==3.0.2']
+                    'msgpack==0.6.2',
+                    'numpy==1.17.0',
+                    'orjson==2.6.8',
+                    'prometheus_client==0.7.1']
+
+# the Arrow IPC format of the JIT route is only available if pyarrow is installed,
+# and the highs solver backend if SciPy is installed. The tests compare the validators with jsonschema
+extras_require = {'arrow': ['pyarrow==0.15.1'],
+                  'highs': ['scipy>=1.6.0'],
+                  'test': ['pytest', 'jsonschema']}
 
 setup(name='amplrestapi',
       version=version,
@@ -21,4 +30,5 @@ setup(name='amplrestapi',
       packages=find_packages(),
       include_package_data=True,
       install_requires=install_requires,
+      extras_require=extras_require,
       zip_safe=False)
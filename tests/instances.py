@@ -0,0 +1,34 @@
+import random
+from typing import List, Tuple
+
+
+def random_instance(n_batches: int, rng: random.Random, max_duration: int = 10,
+                    max_gap: int = 30) -> Tuple[List[int], List[int]]:
+    """
+    Generates a random canonical JIT instance, whose batches may last 0 minutes and whose expected finish minute
+    offsets are strictly ascending, with gaps that are sometimes tighter and sometimes looser than the durations,
+    so that it usually has both early and late batches and some valid cuts.
+    :return: tuple (durations, expected finish minute offsets)
+    """
+    duration_lst = [rng.randint(0, max_duration) for _ in range(n_batches)]
+    expected_finish_lst = []
+    expected_finish = 0
+    for _ in range(n_batches):
+        expected_finish += rng.randint(1, max_gap)
+        expected_finish_lst.append(expected_finish)
+    return duration_lst, expected_finish_lst
+
+
+def assert_feasible(duration_lst: list, expected_finish_lst: list, result: dict, wrong_time_fee: int):
+    """
+    Checks that each batch of a schedule starts after the previous one has finished,
+    and that its delta times and total fee match its start minutes.
+    """
+    start_minutes = result['start_minutes']
+    assert len(start_minutes) == len(duration_lst)
+    for i in range(1, len(start_minutes)):
+        assert start_minutes[i] >= start_minutes[i - 1] + duration_lst[i - 1]
+    delta_time_lst = [abs(start + duration - expected_finish)
+                      for start, duration, expected_finish in zip(start_minutes, duration_lst, expected_finish_lst)]
+    assert list(result['delta_time']) == delta_time_lst
+    assert result['total_fee'] == wrong_time_fee * sum(delta_time_lst)
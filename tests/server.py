@@ -0,0 +1,30 @@
+import asyncio
+from aiohttp.test_utils import TestClient, TestServer
+
+from amplrestapi.main import init
+from amplrestapi.models.registry import ModelRegistry
+from amplwrapper.ampl_pool import AMPLPool, RecyclePolicy
+from benchmarks import fake_backend
+
+
+async def start_client(size: int = 1, base_latency: float = 0.0, max_queued: int = 0, max_wait: float = 0.0,
+                       recycle_policy: RecyclePolicy = None) -> TestClient:
+    """
+    Starts the server with a pool of stand-in AMPL sessions, which solve the JIT problem without an AMPL license,
+    and waits until its sessions are warm.
+    :param base_latency: seconds taken by each solve of the AMPL sessions
+    :return: client of the server, which the caller must close
+    """
+    pool = AMPLPool(size, ampl_factory=fake_backend.FakeAMPLFactory(base_latency=base_latency),
+                    max_queued=max_queued, max_wait=max_wait, recycle_policy=recycle_policy)
+    app, _, _ = init(pool=pool, jit_solver=fake_backend.solve_canonical, registry=ModelRegistry())
+    client = TestClient(TestServer(app))
+    await client.start_server()
+    while (await client.get('/ready')).status != 200:
+        await asyncio.sleep(0.01)
+    return client
+
+
+async def stats(client: TestClient) -> dict:
+    response = await client.get('/stats')
+    return await response.json()
@@ -0,0 +1,118 @@
+import asyncio
+import os
+from time import sleep, time
+
+from amplwrapper.ampl_pool import AMPLPool, AMPLSessionError, RecyclePolicy
+from benchmarks import fake_backend
+
+
+def worker_pid(ampl) -> int:
+    return os.getpid()
+
+
+def stuck(ampl):
+    sleep(60)
+
+
+def slow_pid(ampl, duration: float) -> int:
+    sleep(duration)
+    return os.getpid()
+
+
+def fail(ampl):
+    raise ValueError('infeasible')
+
+
+def slow(method, duration: float = 0.3):
+    def slow_method():
+        sleep(duration)
+        method()
+    return slow_method
+
+
+async def wait_until_idle(pool: AMPLPool):
+    while pool.stats()['busy'] > 0:
+        await asyncio.sleep(0.01)
+
+
+def test_calls_run_in_parallel_in_the_worker_processes():
+    async def main():
+        pool = AMPLPool(2, ampl_factory=fake_backend.FakeAMPLFactory())
+        try:
+            start = time()
+            pids = await asyncio.gather(pool.run(slow_pid, duration=0.3), pool.run(slow_pid, duration=0.3))
+            assert time() - start < 0.55
+            assert len(set(pids)) == 2 and os.getpid() not in pids
+        finally:
+            pool.close()
+    asyncio.run(main())
+
+
+def test_failed_calls_raise_in_the_server_process():
+    async def main():
+        pool = AMPLPool(1, ampl_factory=fake_backend.FakeAMPLFactory())
+        try:
+            try:
+                await pool.run(fail)
+                assert False, 'the call should have failed'
+            except AMPLSessionError as ex:
+                assert 'infeasible' in str(ex)
+            # the session keeps serving the next calls
+            assert await pool.run(worker_pid) != os.getpid()
+            assert pool.stats()['sessions'][0]['errors'] == 1
+        finally:
+            pool.close()
+    asyncio.run(main())
+
+
+def test_sessions_are_recycled_past_the_solves_limit():
+    async def main():
+        pool = AMPLPool(1, ampl_factory=fake_backend.FakeAMPLFactory(), recycle_policy=RecyclePolicy(max_solves=2))
+        try:
+            first_pids = [await pool.run(worker_pid), await pool.run(worker_pid)]
+            assert await pool.run(worker_pid) not in first_pids
+            assert pool.stats()['recycles'] == {'solves': 1}
+        finally:
+            pool.close()
+    asyncio.run(main())
+
+
+def test_sessions_are_recycled_one_at_a_time():
+    async def main():
+        pool = AMPLPool(2, ampl_factory=fake_backend.FakeAMPLFactory(), recycle_policy=RecyclePolicy(max_solves=1))
+        for session in pool._sessions:
+            session.recycle = slow(session.recycle)
+        try:
+            # the second session is released while the first one is still recycling
+            await asyncio.gather(pool.run(slow_pid, duration=0.1), pool.run(slow_pid, duration=0.2))
+            await wait_until_idle(pool)
+            assert pool.stats()['recycles'] == {'solves': 1}
+        finally:
+            pool.close()
+    asyncio.run(main())
+
+
+def test_interrupted_sessions_are_restarted_without_blocking_the_event_loop():
+    async def main():
+        pool = AMPLPool(1, ampl_factory=fake_backend.FakeAMPLFactory())
+        session = pool._sessions[0]
+        session.restart = slow(session.restart, duration=0.5)
+
+        try:
+            pid = await pool.run(worker_pid)
+            task = asyncio.ensure_future(pool.run(stuck))
+            await asyncio.sleep(0.1)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+            # the event loop keeps running while the session restarts
+            start = time()
+            await asyncio.sleep(0.05)
+            assert time() - start < 0.3
+
+            assert await pool.run(worker_pid) != pid
+            assert pool.stats()['interrupted'] == 1
+            assert pool.stats()['sessions'][0]['restarts'] == 1
+        finally:
+            pool.close()
+    asyncio.run(main())
@@ -0,0 +1,178 @@
+import asyncio
+import msgpack
+import numpy as np
+import orjson
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer, make_mocked_request
+
+from ampljit import utils
+from amplrestapi import codecs
+from benchmarks.instances import generate_binary_instance, generate_instance
+from config.config import Config
+from tests.server import start_client
+
+
+@pytest.mark.parametrize('accept, expected', [
+    (None, codecs.json_media_type),
+    ('*/*', codecs.json_media_type),
+    ('application/msgpack', codecs.msgpack_media_type),
+    ('application/x-msgpack', codecs.msgpack_media_type),
+    ('application/json;q=0.5, application/vnd.apache.arrow.stream', codecs.arrow_media_type),
+    ('application/msgpack;q=0.2, application/json;q=0.8', codecs.json_media_type),
+    ('application/msgpack;q=0, */*', codecs.json_media_type),
+    ('text/html, application/xml', codecs.json_media_type),
+])
+def test_response_media_type_follows_the_accept_header(accept, expected):
+    headers = {} if accept is None else {'Accept': accept}
+    assert codecs.response_media_type(make_mocked_request('POST', '/', headers=headers)) == expected
+
+
+@pytest.mark.parametrize('content_type, expected', [
+    (None, codecs.json_media_type),
+    ('application/json; charset=utf-8', codecs.json_media_type),
+    ('text/plain', codecs.json_media_type),
+    ('application/vnd.msgpack', codecs.msgpack_media_type),
+    ('application/vnd.apache.arrow.stream', codecs.arrow_media_type),
+])
+def test_request_media_type_follows_the_content_type_header(content_type, expected):
+    headers = {} if content_type is None else {'Content-Type': content_type}
+    assert codecs.request_media_type(make_mocked_request('POST', '/', headers=headers)) == expected
+
+
+def test_binary_responses_carry_epoch_minutes():
+    async def main():
+        client = await start_client()
+        try:
+            instance = generate_instance(20)
+            json_response = await client.post('/problems/jit', json=instance)
+            msgpack_response = await client.post('/problems/jit', json=instance,
+                                                 headers={'Accept': codecs.msgpack_media_type})
+            assert msgpack_response.headers['Content-Type'] == codecs.msgpack_media_type
+
+            json_data = (await json_response.json())['data']
+            msgpack_data = msgpack.unpackb(await msgpack_response.read(), raw=False)['data']
+            start_arr = np.array(msgpack_data['start_datetime'], dtype=np.int64).astype('datetime64[m]')
+            assert utils.datetimes_to_strings(start_arr, utils.iso_datetime_format) == json_data['start_datetime']
+            assert msgpack_data['total_fee'] == json_data['total_fee']
+        finally:
+            await client.close()
+    asyncio.run(main())
+
+
+def test_msgpack_requests_get_msgpack_responses():
+    async def main():
+        client = await start_client()
+        try:
+            response = await client.post('/problems/jit', data=msgpack.packb(generate_binary_instance(20)),
+                                         headers={'Content-Type': codecs.msgpack_media_type})
+            assert response.headers['Content-Type'] == codecs.msgpack_media_type
+
+            data = msgpack.unpackb(await response.read(), raw=False)['data']
+            expected = await (await client.post('/problems/jit', json=generate_instance(20))).json()
+            assert data['total_fee'] == expected['data']['total_fee']
+            assert len(data['start_datetime']) == 20
+        finally:
+            await client.close()
+    asyncio.run(main())
+
+
+def test_arrow_requests_get_arrow_responses():
+    pyarrow = pytest.importorskip('pyarrow')
+
+    instance = generate_binary_instance(20)
+    schema = pyarrow.schema([('duration', pyarrow.int32()), ('expected_finish', pyarrow.int64())],
+                            metadata={'wrong_time_fee': str(instance['wrong_time_fee'])})
+    table = pyarrow.Table.from_arrays([pyarrow.array(instance['duration'], type=pyarrow.int32()),
+                                       pyarrow.array(instance['expected_finish'], type=pyarrow.int64())],
+                                      schema=schema)
+    sink = pyarrow.BufferOutputStream()
+    with pyarrow.RecordBatchStreamWriter(sink, schema) as writer:
+        writer.write_table(table)
+
+    async def main():
+        client = await start_client()
+        try:
+            response = await client.post('/problems/jit', data=sink.getvalue().to_pybytes(),
+                                         headers={'Content-Type': codecs.arrow_media_type})
+            assert response.headers['Content-Type'] == codecs.arrow_media_type
+
+            result = pyarrow.ipc.open_stream(pyarrow.py_buffer(await response.read())).read_all()
+            expected = await (await client.post('/problems/jit', json=generate_instance(20))).json()
+            assert int(result.schema.metadata[b'total_fee']) == expected['data']['total_fee']
+            assert result.num_rows == 20
+        finally:
+            await client.close()
+    asyncio.run(main())
+
+
+def test_unparseable_bodies_are_rejected():
+    async def main():
+        client = await start_client()
+        try:
+            response = await client.post('/problems/jit', data=b'\xc1',
+                                         headers={'Content-Type': codecs.msgpack_media_type})
+            assert response.status == 400
+        finally:
+            await client.close()
+    asyncio.run(main())
+
+
+def stream(body_factory, chunk_size: int, buffer_size: int) -> bytes:
+    """
+    :param body_factory: function that returns the body to stream, whose iterators can only be consumed once
+    :return: the body streamed by codecs.stream_json(), as received by a client
+    """
+    async def handler(request):
+        return await codecs.stream_json(request, body_factory(), chunk_size, buffer_size=buffer_size)
+
+    async def main():
+        app = web.Application()
+        app.router.add_get('/', handler)
+        client = TestClient(TestServer(app))
+        await client.start_server()
+        try:
+            response = await client.get('/')
+            assert response.headers['Transfer-Encoding'] == 'chunked'
+            return await response.read()
+        finally:
+            await client.close()
+    return asyncio.run(main())
+
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 100])
+@pytest.mark.parametrize('buffer_size', [1, 16, 65536])
+def test_streamed_json_matches_the_serialized_body(chunk_size, buffer_size):
+    start_datetime_chunks = [['2019-08-22 08:00', '2019-08-22 08:30'], [], ['2019-08-22 09:00']]
+
+    def body_factory(iterators: bool = True):
+        return {
+            'data': {
+                'total_fee': 1500,
+                'start_datetime': iter(start_datetime_chunks) if iterators else sum(start_datetime_chunks, []),
+                'delta_time': list(range(10)),
+            },
+            'meta': {'status': 'optimal', 'empty_list': [], 'empty_dict': {}, 'empty': iter([]) if iterators else []},
+        }
+
+    assert stream(body_factory, chunk_size, buffer_size) == orjson.dumps(body_factory(iterators=False))
+
+
+def test_large_json_responses_are_streamed():
+    async def main():
+        client = await start_client()
+        try:
+            n_batches = Config.stream_min_batches()
+            json_response = await client.post('/problems/jit', json=generate_instance(n_batches))
+            assert json_response.headers['Transfer-Encoding'] == 'chunked'
+            msgpack_response = await client.post('/problems/jit', json=generate_instance(n_batches),
+                                                 headers={'Accept': codecs.msgpack_media_type})
+
+            json_data = (await json_response.json())['data']
+            msgpack_data = msgpack.unpackb(await msgpack_response.read(), raw=False)['data']
+            start_arr = np.array(msgpack_data['start_datetime'], dtype=np.int64).astype('datetime64[m]')
+            assert utils.datetimes_to_strings(start_arr, utils.iso_datetime_format) == json_data['start_datetime']
+            assert json_data['delta_time'] == msgpack_data['delta_time']
+        finally:
+            await client.close()
+    asyncio.run(main())
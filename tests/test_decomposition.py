@@ -0,0 +1,103 @@
+import random
+import pytest
+
+from ampljit import decomposition, native
+from tests.instances import assert_feasible, random_instance
+
+
+def solve(duration_lst: list, expected_finish_lst: list, wrong_time_fee: int) -> dict:
+    return native.solve_canonical(n_batches=len(duration_lst), wrong_time_fee=wrong_time_fee,
+                                  duration_lst=duration_lst, expected_finish_lst=expected_finish_lst)
+
+
+def solve_blocks(blocks: list, duration_lst: list, expected_finish_lst: list, wrong_time_fee: int) -> dict:
+    return decomposition.merge_results([solve(duration_lst[start:end], expected_finish_lst[start:end], wrong_time_fee)
+                                        for start, end in blocks],
+                                       wrong_time_fee=wrong_time_fee, duration_lst=duration_lst,
+                                       expected_finish_lst=expected_finish_lst)
+
+
+@pytest.mark.parametrize('seed', range(50))
+def test_blocks_partition_the_instance(seed):
+    rng = random.Random(seed)
+    duration_lst, expected_finish_lst = random_instance(rng.randint(1, 400), rng)
+    max_blocks, min_block_size = rng.randint(1, 8), rng.randint(1, 50)
+
+    blocks = decomposition.independent_blocks(duration_lst, expected_finish_lst, max_blocks=max_blocks,
+                                              min_block_size=min_block_size)
+
+    assert 1 <= len(blocks) <= max(max_blocks, 1)
+    assert blocks[0][0] == 0 and blocks[-1][1] == len(duration_lst)
+    for (_, end), (start, _) in zip(blocks, blocks[1:]):
+        assert end == start
+    if len(blocks) > 1:
+        assert all(end - start >= min_block_size for start, end in blocks)
+
+
+@pytest.mark.parametrize('seed', range(100))
+def test_merged_blocks_are_optimal(seed):
+    rng = random.Random(seed)
+    duration_lst, expected_finish_lst = random_instance(rng.randint(2, 400), rng)
+    wrong_time_fee = rng.randint(1, 1000)
+    blocks = decomposition.independent_blocks(duration_lst, expected_finish_lst, max_blocks=rng.randint(2, 8),
+                                              min_block_size=rng.randint(1, 20))
+
+    merged = solve_blocks(blocks, duration_lst, expected_finish_lst, wrong_time_fee)
+
+    assert merged['blocks'] == len(blocks)
+    assert merged['status'] == 'optimal'
+    assert merged['total_fee'] == solve(duration_lst, expected_finish_lst, wrong_time_fee)['total_fee']
+    assert_feasible(duration_lst, expected_finish_lst, merged, wrong_time_fee)
+
+
+def test_every_valid_cut_is_independent():
+    # with one block per batch, every valid cut is taken
+    rng = random.Random(0)
+    for _ in range(200):
+        duration_lst, expected_finish_lst = random_instance(rng.randint(2, 30), rng, max_gap=rng.randint(1, 40))
+        blocks = decomposition.independent_blocks(duration_lst, expected_finish_lst,
+                                                  max_blocks=len(duration_lst), min_block_size=1)
+        merged = solve_blocks(blocks, duration_lst, expected_finish_lst, 1)
+        assert merged['total_fee'] == solve(duration_lst, expected_finish_lst, 1)['total_fee']
+        assert_feasible(duration_lst, expected_finish_lst, merged, 1)
+
+
+def test_time_limited_blocks_are_repaired_across_cuts():
+    duration_lst, expected_finish_lst = [0, 0, 100, 0, 0, 0, 0], [1, 101, 102, 103, 104, 201, 202]
+    first_block = dict(native.repair_schedule(1, duration_lst[:5], expected_finish_lst[:5]),
+                       iterations=0, computation_duration=0, status='time_limit')
+    second_block = solve(duration_lst[5:], expected_finish_lst[5:], 1)
+
+    merged = decomposition.merge_results([first_block, second_block], wrong_time_fee=1, duration_lst=duration_lst,
+                                         expected_finish_lst=expected_finish_lst)
+
+    assert merged['status'] == 'time_limit'
+    assert_feasible(duration_lst, expected_finish_lst, merged, 1)
+
+
+@pytest.mark.parametrize('seed', range(50))
+def test_reusable_prefix_keeps_only_independent_batches(seed):
+    rng = random.Random(seed)
+    duration_lst, expected_finish_lst = random_instance(rng.randint(1, 100), rng)
+    targets = [expected_finish - prefix for expected_finish, prefix
+               in zip(expected_finish_lst, _accumulate(duration_lst))]
+    prefix_max = _accumulate(targets, max)
+    start = rng.randint(0, len(targets))
+    changed_min = rng.randint(min(targets) - 50, max(targets) + 50)
+
+    end = decomposition.reusable_prefix(targets, prefix_max, start, changed_min)
+
+    assert 0 <= end <= start
+    # the kept prefix is below every changed target and every target it gave up
+    suffix_min = min([changed_min] + targets[end:start])
+    assert end == 0 or prefix_max[end - 1] <= suffix_min
+    # and it's the longest such prefix
+    if end < start:
+        assert prefix_max[end] > min([changed_min] + targets[end + 1:start])
+
+
+def _accumulate(lst: list, func=lambda a, b: a + b) -> list:
+    total = []
+    for item in lst:
+        total.append(func(total[-1], item) if total else item)
+    return total
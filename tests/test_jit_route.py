@@ -0,0 +1,111 @@
+import asyncio
+import json
+from time import time
+
+from benchmarks.instances import generate_instance
+from tests.server import start_client, stats
+
+
+async def solve(client, instance: dict, deadline: float = None) -> dict:
+    headers = {} if deadline is None else {'X-Deadline': str(deadline)}
+    response = await client.post('/problems/jit', json=instance, headers=headers)
+    assert response.status == 200
+    return (await response.json())['meta']
+
+
+def test_requests_dont_share_a_solve_with_an_earlier_deadline():
+    async def main():
+        client = await start_client(size=2, base_latency=1.0)
+        try:
+            instance = generate_instance(5)
+            short_meta, long_meta = await asyncio.gather(solve(client, instance, deadline=0.5),
+                                                         solve(client, instance, deadline=60))
+            assert short_meta['status'] == 'time_limit'
+            assert long_meta['status'] == 'optimal' and not long_meta['coalesced']
+            assert (await stats(client))['single_flight']['executions'] == 2
+        finally:
+            await client.close()
+    asyncio.run(main())
+
+
+def test_time_limited_results_arent_cached():
+    async def main():
+        client = await start_client(base_latency=0.5)
+        try:
+            instance = generate_instance(5)
+            assert (await solve(client, instance, deadline=0.3))['status'] == 'time_limit'
+            meta = await solve(client, instance)
+            assert meta['status'] == 'optimal' and not meta['cached']
+            assert (await solve(client, instance))['cached']
+        finally:
+            await client.close()
+    asyncio.run(main())
+
+
+def test_invalid_batch_items_are_reported_before_any_solve():
+    async def main():
+        client = await start_client(base_latency=0.3)
+        try:
+            batch = [generate_instance(5, seed=seed) for seed in range(3)]
+            batch[2]['n_batches'] = 6
+            start = time()
+            response = await client.post('/problems/jit/batch', json=batch)
+            assert response.status == 200
+
+            # the invalid item is streamed before the first solve is over
+            first_item = json.loads(await response.content.readline())
+            assert time() - start < 0.3
+            assert first_item['index'] == 2 and first_item['error']['status'] == 422
+
+            items = [json.loads(line) for line in (await response.read()).splitlines()]
+            assert sorted(item['index'] for item in items) == [0, 1]
+            assert all(item['meta']['status'] == 'optimal' for item in items)
+        finally:
+            await client.close()
+    asyncio.run(main())
+
+
+def test_requests_are_shed_when_too_many_are_queued():
+    async def main():
+        client = await start_client(base_latency=0.5, max_queued=1)
+        try:
+            # one request is solved, one waits for the session and the last one is rejected right away
+            responses = await asyncio.gather(*[client.post('/problems/jit', json=generate_instance(5, seed=seed))
+                                               for seed in range(3)])
+            statuses = sorted(response.status for response in responses)
+            assert statuses == [200, 200, 429]
+            rejected = next(response for response in responses if response.status == 429)
+            assert int(rejected.headers['Retry-After']) >= 1
+            assert (await stats(client))['pool']['rejected'] == 1
+        finally:
+            await client.close()
+    asyncio.run(main())
+
+
+def test_requests_are_shed_when_they_wait_too_long():
+    async def main():
+        client = await start_client(base_latency=0.5, max_wait=0.1)
+        try:
+            responses = await asyncio.gather(*[client.post('/problems/jit', json=generate_instance(5, seed=seed))
+                                               for seed in range(2)])
+            assert sorted(response.status for response in responses) == [200, 503]
+            timed_out = next(response for response in responses if response.status == 503)
+            assert int(timed_out.headers['Retry-After']) >= 1
+            assert (await stats(client))['pool']['timed_out'] == 1
+        finally:
+            await client.close()
+    asyncio.run(main())
+
+
+def test_batches_dont_shed_their_own_items():
+    async def main():
+        client = await start_client(base_latency=0.05, max_queued=1)
+        try:
+            batch = [generate_instance(5, seed=seed) for seed in range(6)]
+            response = await client.post('/problems/jit/batch', json=batch)
+            items = [json.loads(line) for line in (await response.read()).splitlines()]
+            assert sorted(item['index'] for item in items) == list(range(6))
+            assert all('error' not in item for item in items)
+        finally:
+            await client.close()
+    asyncio.run(main())
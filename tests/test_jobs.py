@@ -0,0 +1,114 @@
+import asyncio
+import msgpack
+
+from amplrestapi.jobs.job_queue import Job, JobQueue, JobQueueFullError
+from benchmarks.instances import generate_binary_instance, generate_instance
+from tests.server import start_client
+
+
+async def wait_for_job(client, location: str) -> dict:
+    while True:
+        job = await (await client.get(location)).json()
+        if job['status'] not in (Job.QUEUED, Job.RUNNING):
+            return job
+        await asyncio.sleep(0.01)
+
+
+def test_jobs_are_solved_in_the_background():
+    async def main():
+        client = await start_client()
+        try:
+            instance = generate_instance(10)
+            response = await client.post('/jobs/jit', json=instance)
+            assert response.status == 202
+            job = await wait_for_job(client, response.headers['Location'])
+
+            expected = await (await client.post('/problems/jit', json=instance)).json()
+            assert job['status'] == Job.DONE
+            assert job['result']['data'] == expected['data']
+        finally:
+            await client.close()
+    asyncio.run(main())
+
+
+def test_jobs_accept_the_binary_formats():
+    async def main():
+        client = await start_client()
+        try:
+            body = msgpack.packb(generate_binary_instance(10))
+            response = await client.post('/jobs/jit', data=body, headers={'Content-Type': 'application/msgpack'})
+            assert response.status == 202
+            job = await wait_for_job(client, response.headers['Location'])
+            assert job['status'] == Job.DONE
+            assert len(job['result']['data']['start_datetime']) == 10
+        finally:
+            await client.close()
+    asyncio.run(main())
+
+
+def test_invalid_jobs_are_rejected():
+    async def main():
+        client = await start_client()
+        try:
+            instance = dict(generate_instance(10), n_batches=11)
+            assert (await client.post('/jobs/jit', json=instance)).status == 422
+        finally:
+            await client.close()
+    asyncio.run(main())
+
+
+def test_running_jobs_are_cancelled_right_away():
+    async def main():
+        client = await start_client(base_latency=1.0)
+        try:
+            location = (await client.post('/jobs/jit', json=generate_instance(10))).headers['Location']
+            while (await (await client.get(location)).json())['status'] != Job.RUNNING:
+                await asyncio.sleep(0.01)
+
+            job = await (await client.delete(location)).json()
+            assert job['status'] == Job.CANCELLED
+            assert (await wait_for_job(client, location))['status'] == Job.CANCELLED
+        finally:
+            await client.close()
+    asyncio.run(main())
+
+
+def test_jobs_wait_for_a_session_without_the_admission_limits():
+    async def main():
+        client = await start_client(base_latency=0.5, max_queued=1, max_wait=0.1)
+        try:
+            # the synchronous request keeps the only session busy for longer than the maximum wait
+            solve = asyncio.ensure_future(client.post('/problems/jit', json=generate_instance(10, seed=1)))
+            await asyncio.sleep(0.1)
+            location = (await client.post('/jobs/jit', json=generate_instance(10, seed=2))).headers['Location']
+
+            assert (await solve).status == 200
+            assert (await wait_for_job(client, location))['status'] == Job.DONE
+        finally:
+            await client.close()
+    asyncio.run(main())
+
+
+def test_cancelled_jobs_dont_count_as_queued():
+    async def run_job(payload: dict) -> dict:
+        await asyncio.sleep(1)
+        return payload
+
+    async def main():
+        queue = JobQueue(run_job=run_job, n_workers=1, max_queued=1, max_retained=10, retention=60)
+        try:
+            queue.submit({})
+            await asyncio.sleep(0)
+            queued_job = queue.submit({})
+            try:
+                queue.submit({})
+                assert False, 'the queue should be full'
+            except JobQueueFullError:
+                pass
+
+            queue.cancel(queued_job.id)
+            queue.submit({})
+            assert queue.stats()['queued'] == 1
+        finally:
+            queue.close()
+    asyncio.run(main())
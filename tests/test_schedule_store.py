@@ -0,0 +1,87 @@
+import random
+import numpy as np
+import pytest
+
+from ampljit import native
+from amplrestapi.schedules.schedule_store import Schedule, ScheduleStore
+from tests.instances import assert_feasible, random_instance
+
+
+def change(schedule: Schedule, start: int, duration_lst: list, expected_finish_lst: list) -> int:
+    """
+    Replaces the batches of a schedule from index `start` on, like SchedulesRouteHandler._change() does.
+    :return: index of the first batch that has been solved again
+    """
+    first, duration_lst, expected_finish_lst = schedule.plan(start, duration_lst, expected_finish_lst)
+    first_minutes = expected_finish_lst[0]
+    result = native.solve_canonical(n_batches=len(duration_lst), wrong_time_fee=schedule.wrong_time_fee,
+                                    duration_lst=duration_lst,
+                                    expected_finish_lst=[finish - first_minutes for finish in expected_finish_lst])
+    schedule.apply(first, duration_lst, expected_finish_lst,
+                   start_minutes=[start_minutes + first_minutes for start_minutes in result['start_minutes']],
+                   delta_time_lst=result['delta_time'])
+    return first
+
+
+def assert_optimal(schedule: Schedule):
+    fresh = native.solve_canonical(n_batches=schedule.n_batches, wrong_time_fee=schedule.wrong_time_fee,
+                                   duration_lst=schedule.duration_lst, expected_finish_lst=schedule.expected_finish_lst)
+    assert schedule.total_fee == fresh['total_fee']
+    assert_feasible(schedule.duration_lst, schedule.expected_finish_lst,
+                    {'start_minutes': schedule.start_minutes, 'delta_time': schedule.delta_time,
+                     'total_fee': schedule.total_fee}, schedule.wrong_time_fee)
+
+
+@pytest.mark.parametrize('seed', range(40))
+def test_incremental_changes_match_a_fresh_solve(seed):
+    rng = random.Random(seed)
+    schedule = Schedule(wrong_time_fee=rng.randint(1, 100), solver_name='native',
+                        epoch=np.datetime64('2019-08-22T08:00', 'm'))
+    change(schedule, 0, *random_instance(rng.randint(1, 50), rng))
+    assert_optimal(schedule)
+
+    for _ in range(30):
+        if rng.random() < 0.4:
+            # appends batches expected to finish after the last one
+            duration_lst, expected_finish_lst = random_instance(rng.randint(1, 20), rng)
+            last = schedule.expected_finish_lst[-1]
+            change(schedule, schedule.n_batches, duration_lst, [last + finish for finish in expected_finish_lst])
+        else:
+            # updates the duration or the expected finish of a batch, between its neighbours
+            index = rng.randrange(schedule.n_batches)
+            duration = rng.randint(0, 10) if rng.random() < 0.5 else schedule.duration_lst[index]
+            low = schedule.expected_finish_lst[index - 1] + 1 if index > 0 else schedule.expected_finish_lst[0] - 30
+            high = (schedule.expected_finish_lst[index + 1] - 1 if index < schedule.n_batches - 1
+                    else schedule.expected_finish_lst[index] + 30)
+            expected_finish = rng.randint(low, high)
+            change(schedule, index, [duration] + schedule.duration_lst[index + 1:],
+                   [expected_finish] + schedule.expected_finish_lst[index + 1:])
+        assert_optimal(schedule)
+
+
+def test_appending_loose_batches_keeps_the_schedule():
+    schedule = Schedule(wrong_time_fee=1, solver_name='native', epoch=np.datetime64('2019-08-22T08:00', 'm'))
+    change(schedule, 0, [10, 10, 10], [10, 20, 30])
+    assert change(schedule, 3, [10], [100]) == 3
+    assert schedule.total_fee == 0
+    assert_optimal(schedule)
+
+
+def test_removed_schedules_are_not_stored_again():
+    store = ScheduleStore(max_batches=5, ttl=0)
+    epoch = np.datetime64('2019-08-22T08:00', 'm')
+    deleted, evicted, kept = [Schedule(wrong_time_fee=1, solver_name='native', epoch=epoch) for _ in range(3)]
+    for schedule in (deleted, evicted, kept):
+        change(schedule, 0, [1, 1, 1], [1, 2, 3])
+
+    assert store.put(deleted)
+    assert store.remove(deleted.id) is deleted
+    assert not store.put(deleted)
+    assert store.get(deleted.id) is None
+
+    # the least recently used schedule is evicted once the batches exceed the bound
+    assert store.put(evicted) and store.put(kept)
+    assert store.get(evicted.id) is None
+    assert not store.put(evicted)
+    assert store.get(kept.id) is kept
+    assert store.stats()['batches'] == 3
@@ -0,0 +1,75 @@
+import asyncio
+
+from amplrestapi.single_flight import SingleFlight
+
+
+def job(result, duration: float = 0.05):
+    async def run():
+        await asyncio.sleep(duration)
+        return result
+    return run
+
+
+def test_identical_jobs_are_coalesced():
+    async def main():
+        single_flight = SingleFlight()
+        results = await asyncio.gather(single_flight.do('key', job(1)), single_flight.do('key', job(2)))
+        assert results == [(1, False), (1, True)]
+        assert single_flight.stats()['executions'] == 1
+    asyncio.run(main())
+
+
+def test_jobs_with_an_earlier_deadline_arent_joined():
+    async def main():
+        single_flight = SingleFlight()
+        results = await asyncio.gather(single_flight.do('key', job(1), deadline=10.0),
+                                       single_flight.do('key', job(2), deadline=20.0),
+                                       single_flight.do('key', job(3)),
+                                       single_flight.do('key', job(4), deadline=15.0))
+        # each job replaces the previous one for the following requests, which join the latest deadline
+        assert results == [(1, False), (2, False), (3, False), (3, True)]
+        assert single_flight.stats() == {'in_flight': 0, 'executions': 3, 'coalesced': 1, 'abandoned': 0}
+    asyncio.run(main())
+
+
+def test_jobs_with_a_later_deadline_are_joined():
+    async def main():
+        single_flight = SingleFlight()
+        results = await asyncio.gather(single_flight.do('key', job(1), deadline=20.0),
+                                       single_flight.do('key', job(2), deadline=10.0))
+        assert results == [(1, False), (1, True)]
+    asyncio.run(main())
+
+
+def test_jobs_keep_running_while_a_waiter_remains():
+    async def main():
+        single_flight = SingleFlight()
+        first = asyncio.ensure_future(single_flight.do('key', job(1)))
+        second = asyncio.ensure_future(single_flight.do('key', job(2)))
+        await asyncio.sleep(0.01)
+        first.cancel()
+
+        assert await second == (1, True)
+        assert first.cancelled()
+        assert single_flight.stats()['abandoned'] == 0
+    asyncio.run(main())
+
+
+def test_jobs_are_cancelled_with_their_last_waiter():
+    async def main():
+        single_flight = SingleFlight()
+        finished = []
+
+        async def run():
+            await asyncio.sleep(0.05)
+            finished.append(True)
+
+        waiters = [asyncio.ensure_future(single_flight.do('key', run)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.sleep(0.1)
+
+        assert finished == []
+        assert single_flight.stats() == {'in_flight': 0, 'executions': 1, 'coalesced': 1, 'abandoned': 1}
+    asyncio.run(main())
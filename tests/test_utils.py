@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from ampljit.utils import iso_datetime_format, strings_to_datetimes
+
+
+@pytest.mark.parametrize('str_date_lst', [
+    ['NaT', 'nat'],
+    ['now'],
+    ['today'],
+    ['nowZ'],
+    ['2019-08-22'],
+    ['2019-08-22x14:32'],
+    ['2019-08-22 14:32:30'],
+    ['2019-08-22 14:32:30Z'],
+    ['2019-08-22 14:32', '2019-08-22 1:32'],
+    ['2019-13-22 14:32'],
+    ['2019-08-22 14:32+05:3'],
+    ['2019-08-22 14:32+99:99'],
+])
+def test_invalid_datetimes_are_rejected(str_date_lst):
+    with pytest.raises(ValueError):
+        strings_to_datetimes(str_date_lst, iso_datetime_format)
+
+
+def test_naive_datetimes():
+    datetime_arr, utc_offset = strings_to_datetimes(['2019-08-22 14:32', '2019-08-22T14:40'], iso_datetime_format)
+
+    assert utc_offset is None
+    assert datetime_arr.tolist() == np.array(['2019-08-22T14:32', '2019-08-22T14:40'], dtype='datetime64[m]').tolist()
+
+
+def test_whole_minute_seconds_are_accepted():
+    datetime_arr, _ = strings_to_datetimes(['2019-08-22 14:32:00', '2019-08-22T14:33:00'], iso_datetime_format)
+
+    assert datetime_arr.tolist() == np.array(['2019-08-22T14:32', '2019-08-22T14:33'], dtype='datetime64[m]').tolist()
+
+
+def test_datetimes_with_utc_offsets_are_converted_to_utc():
+    datetime_arr, utc_offset = strings_to_datetimes(['2019-08-22 14:32+02:00', '2019-08-22T14:33Z'],
+                                                    iso_datetime_format)
+
+    assert utc_offset == 120
+    assert datetime_arr.tolist() == np.array(['2019-08-22T12:32', '2019-08-22T14:33'], dtype='datetime64[m]').tolist()
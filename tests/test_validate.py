@@ -0,0 +1,112 @@
+import copy
+import random
+import pytest
+
+from amplrestapi.jit.route_handler import binary_json_schema, json_schema
+from amplrestapi.jit.validate import SchemaCompilationError, compile_validator, utc_offset_regex
+from amplrestapi.schedules.route_handler import json_schemas as schedule_json_schemas
+
+jsonschema = pytest.importorskip('jsonschema')
+
+valid_instance = {
+    'n_batches': 3,
+    'wrong_time_fee': 750,
+    'duration': [0, 500, 1000],
+    'expected_finish': ['2019-08-22 14:32', '2019-08-22 14:40', '2019-08-22 15:52'],
+}
+
+# values that probe the type checks and the bounds of the schema, e.g. booleans aren't integers in JSON,
+# while integral floats are
+edge_values = [None, True, False, 0, 1, -1, 0.0, 1.0, 0.5, 999, 1000, 1001, 100000, 100001, 0.001, 0.0009, 3600,
+               3600.5, '', 'x', 'ampl', 'highs', 'cplex', '2019-08-22 14:32', 'x' * 257, [], [1], {}, {'a': 1}]
+
+
+def reference_issue(schema: dict, instance) -> bool:
+    """
+    :return: whether the instance is invalid according to the jsonschema library and to the extension keywords
+    """
+    if not jsonschema.Draft7Validator(schema).is_valid(instance):
+        return True
+    for length_name, array_names in schema.get('x-lengths-equal', {}).items():
+        if any(len(instance[array_name]) != instance[length_name] for array_name in array_names):
+            return True
+    # the order of datetimes with a UTC offset is checked by the datetime parser
+    expected_finish = instance['expected_finish']
+    if type(expected_finish[0]) is str and utc_offset_regex.search(expected_finish[0]) is not None:
+        return False
+    return any(not later > earlier for earlier, later in zip(expected_finish, expected_finish[1:]))
+
+
+def mutations(instance: dict, rng: random.Random, n_mutations: int):
+    """
+    Generates instances that differ from the given one by a few edge values, at the top level or in the arrays,
+    or by a missing property.
+    """
+    for _ in range(n_mutations):
+        mutated = copy.deepcopy(instance)
+        for _ in range(rng.randint(1, 2)):
+            name = rng.choice(list(json_schema['properties']) + ['unknown'])
+            choice = rng.random()
+            if choice < 0.15 and name in mutated:
+                del mutated[name]
+            elif choice < 0.6 and isinstance(mutated.get(name), list) and mutated[name]:
+                mutated[name][rng.randrange(len(mutated[name]))] = rng.choice(edge_values)
+            else:
+                mutated[name] = rng.choice(edge_values)
+        yield mutated
+
+
+@pytest.mark.parametrize('schema, instance', [
+    (json_schema, valid_instance),
+    (binary_json_schema, dict(valid_instance, expected_finish=[0, 8, 80])),
+])
+def test_validator_matches_the_schema(schema, instance):
+    validate = compile_validator(schema)
+    assert validate(instance) is None
+
+    for mutated in mutations(instance, random.Random(0), 3000):
+        expected_invalid = reference_issue(schema, mutated)
+        assert (validate(mutated) is not None) == expected_invalid, mutated
+
+
+def test_validator_rejects_non_objects():
+    validate = compile_validator(json_schema)
+    for instance in [None, [], 'x', 1, 1.5, True]:
+        assert validate(instance) is not None
+
+
+def test_issues_point_at_the_first_invalid_value():
+    validate = compile_validator(json_schema)
+    assert validate(dict(valid_instance, duration=[0, 1001, 1000])).pointer == '/duration/1'
+    assert validate(dict(valid_instance, duration=[0, True, 1000])).pointer == '/duration/1'
+    assert validate(dict(valid_instance, n_batches=4)).pointer == ''
+
+    issue = validate(dict(valid_instance, expected_finish=['2019-08-22 14:32', '2019-08-22 14:32',
+                                                           '2019-08-22 15:52']))
+    assert issue.pointer == '/expected_finish/1'
+
+
+def test_datetimes_with_utc_offsets_are_left_to_the_parser():
+    # the order of strings with different UTC offsets isn't their chronological order
+    validate = compile_validator(json_schema)
+    expected_finish = ['2019-08-22 14:32+02:00', '2019-08-22 13:40+00:00', '2019-08-22 15:52+02:00']
+    assert validate(dict(valid_instance, expected_finish=expected_finish)) is None
+
+
+def test_schedule_schemas_match():
+    for name in ('append', 'update'):
+        schema = dict(schedule_json_schemas[name], definitions=schedule_json_schemas['definitions'])
+        validate = compile_validator(schema)
+        for instance in [{}, {'duration': 1}, {'duration': 1001}, {'expected_finish': 1},
+                         {'duration': [1], 'expected_finish': ['2019-08-22 14:32'], 'n_batches': 1},
+                         {'duration': [1], 'expected_finish': ['2019-08-22 14:32'], 'n_batches': 2}]:
+            jsonschema_valid = jsonschema.Draft7Validator(schema).is_valid(instance)
+            lengths_valid = all(len(instance[array_name]) == instance[length_name]
+                                for length_name, array_names in schema.get('x-lengths-equal', {}).items()
+                                for array_name in array_names) if jsonschema_valid else False
+            assert (validate(instance) is None) == lengths_valid, (name, instance)
+
+
+def test_unsupported_keywords_are_rejected():
+    with pytest.raises(SchemaCompilationError):
+        compile_validator({'type': 'object', 'additionalProperties': False})